@@ -1,9 +1,11 @@
 from evographs.graph import Graph
+from evographs.history import PopulationHistory
 from evographs.moran_model import MoranModel, PayoffMatrixType
 from evographs.visualisation import evolution_simulation_animator
 import argparse
 import logging
 import os
+import numpy as np
 
 
 def setup_logging():
@@ -18,12 +20,17 @@ def run_simulation(
     n_genotypes: int,
     edge_probability: float,
     selection_intensity: float,
-) -> list[Graph]:
+    seed: int | None = None,
+) -> PopulationHistory:
+    rng = np.random.default_rng(seed)
     graph = Graph.generate_random_graph(
-        n_nodes=n_nodes, n_genotypes=n_genotypes, edge_probability=edge_probability
+        n_nodes=n_nodes,
+        n_genotypes=n_genotypes,
+        edge_probability=edge_probability,
+        rng=rng,
     )
-    payoff_matrix = MoranModel._generate_random_payoff_matrix(graph)
-    process = MoranModel(graph, payoff_matrix, selection_intensity)
+    payoff_matrix = MoranModel._generate_random_payoff_matrix(graph, rng)
+    process = MoranModel(graph, payoff_matrix, selection_intensity, rng=rng)
     process.run_simulation()
     return process.population_history
 
@@ -63,6 +70,12 @@ if __name__ == "__main__":
         required=False,
         default=1 / 2,
     )
+    parser.add_argument(
+        "-seed",
+        type=int,
+        help="Seed for the random graph, payoff matrix and simulation.",
+        default=None,
+    )
     parser.add_argument(
         "-output_file",
         type=str,
@@ -95,6 +108,7 @@ if __name__ == "__main__":
         args.n_genotypes,
         args.edge_probability,
         args.selection_intensity,
+        args.seed,
     )
     logging.info(
         f"Simulation completed after {len(population_history)} due to genotype fixation."
@@ -0,0 +1,255 @@
+from evographs.history import EventLog
+from copy import deepcopy
+import contextlib
+import os
+import pickle
+import secrets
+import threading
+import weakref
+import numpy as np
+
+# first bytes of every snapshot file, bumped whenever the layout changes
+_MAGIC = b"EVOCKPT2"
+
+# snapshot path, sidecar name and number of events of the checkpoint each model was loaded from
+_resumed_from: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+class Checkpointer:
+    """
+    Periodically saves the full state of a MoranModel so that a preempted run can be resumed.
+
+    A checkpoint consists of two files. The snapshot at `path` holds the model and its engine,
+    i.e. the genotypes, the incrementally maintained payoffs and samplers, the generator state and
+    position in the uniform buffer and the generation counters, and is replaced atomically by
+    writing a temporary file and renaming it. The event sidecar next to it holds the rows of the
+    event log as fixed-size binary records. It is only appended to, with the events logged since
+    the previous checkpoint, so checkpoints do not get slower as the log grows. The snapshot records
+    the name of its sidecar and how many events it covers, so events appended by a checkpoint that
+    did not complete are ignored and later overwritten.
+
+    A new run, or a run resumed from another checkpoint, starts a sidecar under a fresh name, and
+    the sidecar of the checkpoint it replaces is only deleted once the new snapshot is in place. A
+    run resumed from `path` keeps appending to its sidecar from the events the snapshot covers. So
+    whenever the process is killed, the snapshot at `path` and the events it refers to stay intact.
+
+    The static parts of the model, its topology and payoff matrix, are serialised once per run.
+    The simulation thread copies the remaining state, O(N), and a background thread writes the
+    files, so a checkpoint only stalls the simulation when the previous one is still being written.
+    Because the copied state is exact, `load_checkpoint` continues a run bit-identically.
+
+    The payoff matrix is pickled with the static parts, so a CallablePayoff must wrap a function
+    defined at module level, not a lambda or closure. This is checked when a run is started.
+
+    Attributes:
+        path: Path of the snapshot file.
+        interval: Number of events between two checkpoints in `MoranModel.run_simulation`.
+    """
+
+    def __init__(self, path: str | os.PathLike, interval: int = 1_000_000):
+        if interval < 1:
+            raise ValueError("Checkpoint interval must be positive.")
+
+        self.path = os.fspath(path)
+        self.interval = interval
+        self._model = None
+        self._static_blob = b""
+        self._static_index: dict[int, int] = {}
+        self._events_name: str | None = None
+        self._n_saved_events = 0
+        self._writer: threading.Thread | None = None
+        self._error: BaseException | None = None
+
+    @property
+    def events_path(self) -> str | None:
+        """Path of the event sidecar written to, None before the first checkpoint."""
+        if self._events_name is None:
+            return None
+        return os.path.join(os.path.dirname(self.path), self._events_name)
+
+    def attach(self, model):
+        """Prepare checkpoints of `model`, serialising its static parts.
+
+        Called by `MoranModel.run_simulation` before the run starts, so that a model that cannot be
+        checkpointed fails right away rather than at its first checkpoint. Waits for the previous
+        checkpoint to be written first.
+
+        Raises:
+            ValueError: If the payoff matrix of the model cannot be pickled, e.g. a CallablePayoff
+            wrapping a lambda or closure.
+        """
+        self.wait()
+        if model is self._model:
+            return
+
+        static = _static_objects(model)
+        try:
+            self._static_blob = pickle.dumps(static, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, AttributeError, TypeError) as error:
+            raise ValueError(
+                "The payoff matrix of a checkpointed model must be picklable, payoff callables "
+                "must be defined at module level rather than as lambdas or closures."
+            ) from error
+        self._static_index = {id(obj): index for index, obj in enumerate(static)}
+        self._model = model
+        resumed_path, events_name, n_events = _resumed_from.get(model, (None, None, 0))
+        if resumed_path == os.path.abspath(self.path):
+            self._events_name, self._n_saved_events = events_name, n_events
+        else:
+            self._events_name = (
+                f"{os.path.basename(self.path)}.{secrets.token_hex(4)}.events"
+            )
+            self._n_saved_events = 0
+
+    def save(self, model):
+        """Start writing a checkpoint of `model` in the background.
+
+        Waits for the previous checkpoint to be written first. The first checkpoint of a model
+        writes all of its events to a new sidecar, unless the model was resumed from `path`, later
+        ones append to the sidecar.
+        """
+        self.attach(model)
+
+        log = model.history
+        memo = {id(obj): obj for obj in _static_objects(model)}
+        # the events go to the sidecar, the snapshot only gets an empty log of the same layout
+        memo[id(log)] = EventLog(
+            log.initial_genotypes,
+            log.n_genotypes,
+            log.keyframe_interval,
+            record_times=log.times is not None,
+        )
+        state = deepcopy(model, memo)
+        start, stop = self._n_saved_events, len(log)
+        columns = {name: column[start:stop] for name, column in log.columns.items()}
+
+        self._writer = threading.Thread(
+            target=self._write,
+            args=(state, self.events_path, stop, start, columns),
+            daemon=True,
+        )
+        self._writer.start()
+        self._n_saved_events = stop
+
+    def wait(self):
+        """Block until the last checkpoint is on disk, re-raising any error it ran into."""
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+        if self._error is not None:
+            error, self._error = self._error, None
+            # the sidecar may be incomplete, so the next checkpoint starts a fresh one
+            _resumed_from.pop(self._model, None)
+            self._model = None
+            raise error
+
+    def _write(self, state, events_path: str, n_events: int, start: int, columns: dict):
+        try:
+            records = np.empty(
+                len(columns["steps"]), dtype=_record_dtype(state.history)
+            )
+            for name, column in columns.items():
+                records[name] = np.frombuffer(column, dtype=column.typecode)
+            # a fresh sidecar is not referenced by any snapshot yet, an existing one is only cut
+            # back to the events its snapshot covers
+            stale_events_path = None if start else _read_events_path(self.path)
+            with open(events_path, "r+b" if start else "wb") as file:
+                offset = start * records.dtype.itemsize
+                file.truncate(offset)
+                file.seek(offset)
+                file.write(records.tobytes())
+                file.flush()
+                os.fsync(file.fileno())
+
+            temporary_path = self.path + ".tmp"
+            with open(temporary_path, "wb") as file:
+                file.write(_MAGIC)
+                events_name = os.path.basename(events_path).encode()
+                file.write(len(events_name).to_bytes(8, "little"))
+                file.write(events_name)
+                file.write(len(self._static_blob).to_bytes(8, "little"))
+                file.write(self._static_blob)
+                pickler = pickle.Pickler(file, protocol=pickle.HIGHEST_PROTOCOL)
+                static_index = self._static_index
+                pickler.persistent_id = lambda obj: static_index.get(id(obj))
+                pickler.dump({"model": state, "n_events": n_events})
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary_path, self.path)
+            if stale_events_path is not None and stale_events_path != events_path:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(stale_events_path)
+        except BaseException as error:
+            self._error = error
+
+
+def load_checkpoint(path: str | os.PathLike):
+    """Restore a MoranModel from a checkpoint written by a Checkpointer.
+
+    Parameters:
+        path: Path of the snapshot file, the event sidecar it names is expected next to it.
+
+    Returns:
+        The model in the state it was checkpointed in, continuing it gives the same results as if
+        the original run had never stopped.
+    """
+    path = os.fspath(path)
+    with open(path, "rb") as file:
+        events_path = _read_header(file, path)
+        if events_path is None:
+            raise ValueError(f"{path} is not a checkpoint file.")
+        size = int.from_bytes(file.read(8), "little")
+        static = pickle.loads(file.read(size))
+        unpickler = pickle.Unpickler(file)
+        unpickler.persistent_load = lambda index: static[index]
+        snapshot = unpickler.load()
+
+    model = snapshot["model"]
+    n_events = snapshot["n_events"]
+    records = np.fromfile(
+        events_path, dtype=_record_dtype(model.history), count=n_events
+    )
+    if len(records) < n_events:
+        raise ValueError(f"The event sidecar of {path} is incomplete.")
+
+    model.history.extend(**{name: records[name] for name in records.dtype.names})
+    _resumed_from[model] = (
+        os.path.abspath(path),
+        os.path.basename(events_path),
+        n_events,
+    )
+    return model
+
+
+def _read_header(file, path: str) -> str | None:
+    """Path of the event sidecar named by an open snapshot, None if it is no snapshot."""
+    if file.read(len(_MAGIC)) != _MAGIC:
+        return None
+    size = int.from_bytes(file.read(8), "little")
+    return os.path.join(os.path.dirname(path), file.read(size).decode())
+
+
+def _read_events_path(path: str) -> str | None:
+    """Path of the event sidecar of the snapshot at `path`, None if there is none."""
+    try:
+        with open(path, "rb") as file:
+            return _read_header(file, path)
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def _static_objects(model) -> list:
+    """The parts of a model that never change during a run."""
+    objects = [
+        model._compiled_graph,
+        model._compiled_payoff_matrix,
+        model.payoff_matrix,
+    ]
+    if model._graph is not None:
+        objects += [model._graph.topology, model._index_of]
+    return objects
+
+
+def _record_dtype(log: EventLog) -> np.dtype:
+    """Packed record of one event in the sidecar, with a field per column of `log`."""
+    return np.dtype([(name, column.typecode) for name, column in log.columns.items()])
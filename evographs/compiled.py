@@ -0,0 +1,428 @@
+from evographs.graph import Graph, GraphTopology
+from evographs.fitness import CompiledPayoffType, PayoffFunction, PayoffMatrixType
+from scipy import sparse
+import copy
+import numpy as np
+
+
+def _smallest_uint_dtype(max_value: int) -> np.dtype:
+    """The smallest unsigned integer dtype that can hold `max_value`."""
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if max_value <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.uint64)
+
+
+class CompiledGraph:
+    """
+    Array-backed representation of a Graph for simulation.
+
+    The adjacency structure is stored in compressed sparse row (CSR) form: the neighbours of the
+    node with index i are `indices[indptr[i]:indptr[i + 1]]`. Genotypes are interned to integer
+    codes into `genotype_labels` and stored in the smallest unsigned dtype that fits them, so a node
+    costs a few bytes instead of a Node object, a dictionary entry and a list.
+
+    Attributes:
+        node_ids: Node ID of each node index.
+        indptr: Offsets into `indices` for each node, of length n_nodes + 1.
+        indices: Concatenated neighbour indices of all nodes.
+        genotypes: Genotype code of each node.
+        genotype_labels: Genotype label of each genotype code.
+    """
+
+    def __init__(
+        self,
+        node_ids: np.ndarray,
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        genotypes: np.ndarray,
+        genotype_labels: list[str],
+    ):
+        self.node_ids = node_ids
+        self.indptr = indptr
+        self.indices = indices
+        self.genotypes = genotypes
+        self.genotype_labels = genotype_labels
+        self._cached_topology = None
+        self._cached_adjacency = None
+
+    @classmethod
+    def from_graph(cls, graph: Graph) -> "CompiledGraph":
+        """Compile a Graph into CSR arrays and integer genotype codes."""
+        node_ids, genotypes, genotype_labels = _intern_genotypes(graph)
+        indptr, indices = graph.topology.csr()
+        indices = indices.astype(_smallest_uint_dtype(max(len(node_ids) - 1, 0)))
+        compiled = cls(node_ids, indptr, indices, genotypes, genotype_labels)
+        if graph.topology.frozen:
+            # already shared by snapshots, the graphs built from this one may share it as well
+            compiled._cached_topology = graph.topology
+        return compiled
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def degrees(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    @property
+    def adjacency(self) -> sparse.csr_array:
+        """N x N sparse adjacency matrix sharing the CSR arrays of the graph, built once."""
+        if self._cached_adjacency is None:
+            self._cached_adjacency = sparse.csr_array(
+                (
+                    np.ones(len(self.indices), dtype=np.int32),
+                    self.indices,
+                    self.indptr,
+                ),
+                shape=(self.n_nodes, self.n_nodes),
+            )
+        return self._cached_adjacency
+
+    def neighbors(self, index: int) -> np.ndarray:
+        return self.indices[self.indptr[index] : self.indptr[index + 1]]
+
+    def neighbor_pairs(self):
+        """Yield all (node, neighbour) index pairs, as one chunk of two arrays."""
+        yield np.repeat(np.arange(self.n_nodes), self.degrees), self.indices
+
+    def _graph_topology(self) -> GraphTopology:
+        """The topology as a GraphTopology, built once and shared by every `to_graph` call."""
+        if self._cached_topology is None:
+            self._cached_topology = GraphTopology.from_csr(
+                self.node_ids, self.indptr, self.indices
+            )
+        return self._cached_topology
+
+    def to_graph(self, genotypes: np.ndarray | None = None) -> Graph:
+        """Build a Graph with this topology, sharing one frozen GraphTopology between all calls.
+
+        Parameters:
+            genotypes: Genotype codes of the nodes, defaults to the compiled genotypes.
+        """
+        if genotypes is None:
+            genotypes = self.genotypes
+        return _graph_from_codes(
+            self._graph_topology(), genotypes, self.genotype_labels
+        )
+
+
+class GraphBatch:
+    """
+    Many graphs packed into one block-diagonal CSR structure.
+
+    Graph k owns the nodes `offsets[k]:offsets[k + 1]`, and since its neighbours are all inside its
+    own block, the batch as a whole is one large CSR graph that never connects two members. All
+    graphs share one set of genotype codes.
+
+    Attributes:
+        offsets: Index of the first node of each graph, followed by the total number of nodes.
+        node_ids: Node ID of each node index, IDs are only unique within a graph.
+        indptr: Offsets into `indices` for each node, of length n_nodes + 1.
+        indices: Concatenated neighbour indices of all nodes, in batch-wide node indices.
+        genotypes: Genotype code of each node.
+        genotype_labels: Genotype label of each genotype code, the union over all graphs.
+    """
+
+    def __init__(
+        self,
+        offsets: np.ndarray,
+        node_ids: np.ndarray,
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        genotypes: np.ndarray,
+        genotype_labels: list[str],
+    ):
+        self.offsets = offsets
+        self.node_ids = node_ids
+        self.indptr = indptr
+        self.indices = indices
+        self.genotypes = genotypes
+        self.genotype_labels = genotype_labels
+
+    @classmethod
+    def from_graphs(cls, graphs: list[Graph]) -> "GraphBatch":
+        """Compile each graph and stack them block-diagonally."""
+        compiled = [CompiledGraph.from_graph(graph) for graph in graphs]
+        genotype_labels = sorted(
+            {label for member in compiled for label in member.genotype_labels}
+        )
+        code_of = {label: code for code, label in enumerate(genotype_labels)}
+
+        sizes = [member.n_nodes for member in compiled]
+        offsets = np.zeros(len(compiled) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=offsets[1:])
+        n_edges = np.cumsum([0] + [len(member.indices) for member in compiled])
+        indptr = np.concatenate(
+            [member.indptr[:-1] + n_edges[k] for k, member in enumerate(compiled)]
+            + [n_edges[-1:]]
+        ).astype(np.int64)
+        indices = np.concatenate(
+            [np.zeros(0, dtype=np.int64)]
+            + [
+                member.indices.astype(np.int64) + offsets[k]
+                for k, member in enumerate(compiled)
+            ]
+        ).astype(_smallest_uint_dtype(max(int(offsets[-1]) - 1, 0)))
+        genotypes = np.concatenate(
+            [np.zeros(0, dtype=np.int64)]
+            + [
+                np.array(
+                    [code_of[label] for label in member.genotype_labels], dtype=np.int64
+                )[member.genotypes]
+                for member in compiled
+                if member.n_nodes
+            ]
+        ).astype(_smallest_uint_dtype(max(len(genotype_labels) - 1, 0)))
+        node_ids = np.concatenate(
+            [np.zeros(0, dtype=np.int64)] + [member.node_ids for member in compiled]
+        )
+        return cls(offsets, node_ids, indptr, indices, genotypes, genotype_labels)
+
+    @property
+    def n_graphs(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def n_nodes(self) -> int:
+        return int(self.offsets[-1])
+
+    def member(self, k: int, genotypes: np.ndarray | None = None) -> CompiledGraph:
+        """The k-th graph on its own, optionally with the given batch-wide genotype codes."""
+        start, stop = int(self.offsets[k]), int(self.offsets[k + 1])
+        if genotypes is None:
+            genotypes = self.genotypes
+        indptr = self.indptr[start : stop + 1]
+        return CompiledGraph(
+            self.node_ids[start:stop],
+            indptr - indptr[0],
+            (self.indices[indptr[0] : indptr[-1]].astype(np.int64) - start).astype(
+                _smallest_uint_dtype(max(stop - start - 1, 0))
+            ),
+            genotypes[start:stop],
+            self.genotype_labels,
+        )
+
+
+class CompleteTopology:
+    """
+    Complete graph, in which every node neighbours every other node, stored without adjacency.
+
+    A complete graph on N nodes has N * (N - 1) directed edges, so its CSR arrays outgrow the
+    genotypes long before the simulation becomes expensive. Neighbours are instead implied: the
+    neighbours of node i are all nodes but i. Only the node IDs and genotype codes are stored.
+
+    Attributes:
+        node_ids: Node ID of each node index.
+        genotypes: Genotype code of each node.
+        genotype_labels: Genotype label of each genotype code.
+    """
+
+    def __init__(
+        self, node_ids: np.ndarray, genotypes: np.ndarray, genotype_labels: list[str]
+    ):
+        self.node_ids = node_ids
+        self.genotypes = genotypes
+        self.genotype_labels = genotype_labels
+        self._cached_topology = None
+
+    @classmethod
+    def from_graph(cls, graph: Graph) -> "CompleteTopology":
+        """Intern the genotypes of a complete Graph, see `Graph.is_complete`."""
+        if not graph.is_complete():
+            raise ValueError("Graph is not complete.")
+        return cls(*_intern_genotypes(graph))
+
+    @classmethod
+    def from_genotype_counts(
+        cls, genotype_counts: dict[str, int]
+    ) -> "CompleteTopology":
+        """A complete graph with the given number of nodes of each genotype, numbered from 1.
+
+        This never builds a Graph, so it also works for populations whose adjacency lists would not
+        fit in memory.
+        """
+        genotype_labels = sorted(genotype_counts)
+        counts = [genotype_counts[label] for label in genotype_labels]
+        if min(counts, default=0) < 0:
+            raise ValueError("Genotype counts must be non-negative.")
+        genotypes = np.repeat(
+            np.arange(
+                len(genotype_labels),
+                dtype=_smallest_uint_dtype(max(len(genotype_labels) - 1, 0)),
+            ),
+            counts,
+        )
+        node_ids = np.arange(1, len(genotypes) + 1, dtype=np.int64)
+        return cls(node_ids, genotypes, genotype_labels)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def degrees(self) -> np.ndarray:
+        return np.full(self.n_nodes, max(self.n_nodes - 1, 0), dtype=np.int64)
+
+    def neighbors(self, index: int) -> np.ndarray:
+        return np.delete(np.arange(self.n_nodes), index)
+
+    def to_graph(self, genotypes: np.ndarray | None = None) -> Graph:
+        """Build a Graph with this topology, which takes O(N^2) time and memory.
+
+        Parameters:
+            genotypes: Genotype codes of the nodes, defaults to the stored genotypes.
+        """
+        if genotypes is None:
+            genotypes = self.genotypes
+
+        if self._cached_topology is None:
+            n_nodes = self.n_nodes
+            self._cached_topology = GraphTopology.from_csr(
+                self.node_ids,
+                np.arange(n_nodes + 1) * max(n_nodes - 1, 0),
+                np.nonzero(~np.eye(n_nodes, dtype=bool))[1],
+            )
+        return _graph_from_codes(self._cached_topology, genotypes, self.genotype_labels)
+
+
+def _graph_from_codes(
+    topology: GraphTopology, genotypes: np.ndarray, genotype_labels: list[str]
+) -> Graph:
+    """A Graph on a shared topology whose genotypes are given as integer codes."""
+    counts = np.bincount(genotypes, minlength=len(genotype_labels))
+    return Graph.from_topology(
+        topology,
+        genotypes,
+        genotype_labels,
+        dict(zip(genotype_labels, counts.tolist())),
+    )
+
+
+def _intern_genotypes(graph: Graph) -> tuple[np.ndarray, np.ndarray, list[str]]:
+    """Node IDs and integer genotype codes of the nodes of a Graph, with the genotype labels."""
+    graph_codes = graph._genotype_codes()
+    graph_labels = graph._genotype_labels
+    genotype_labels = sorted(
+        set(graph.genotype_valuecounts)
+        | {graph_labels[code] for code in np.unique(graph_codes).tolist()}
+    )
+    code_of = {label: code for code, label in enumerate(genotype_labels)}
+    recode = np.array([code_of.get(label, 0) for label in graph_labels], dtype=np.int64)
+    codes = recode[graph_codes].astype(
+        _smallest_uint_dtype(max(len(genotype_labels) - 1, 0))
+    )
+    node_ids = np.frombuffer(graph.topology.node_ids, dtype=np.int64).copy()
+    return node_ids, codes, genotype_labels
+
+
+def align_genotype_codes(
+    topology,
+    payoff_matrix: PayoffMatrixType | CompiledPayoffType,
+    genotype_labels: list[str] | None = None,
+):
+    """Recode a compiled topology to the genotype codes of a payoff matrix indexed by codes.
+
+    The codes a topology interns its genotypes to depend on which labels happen to be present, so
+    a G x G array or PayoffFunction has to bring its own code space: code i is the genotype
+    `genotype_labels[i]`, by default the i-th label of `Graph.generate_random_graph` with G
+    genotypes ("A", ..., "Z", "AA", ...). The payoff matrix may cover genotypes that are absent
+    from the population. A payoff matrix given as a dict leaves the topology as it is.
+
+    Parameters:
+        topology: A CompiledGraph, CompleteTopology, Lattice or GraphBatch.
+        payoff_matrix: The payoff matrix the topology is simulated with.
+        genotype_labels: Genotype label of each code of the payoff matrix.
+
+    Returns:
+        A shallow copy of the topology whose `genotype_labels` are the labels of the payoff matrix,
+        or the topology itself for a dict.
+
+    Raises:
+        ValueError: If the labels do not match the size of the payoff matrix or a genotype of the
+        population has no code in it.
+    """
+    if not isinstance(payoff_matrix, (np.ndarray, PayoffFunction)):
+        if genotype_labels is not None:
+            raise ValueError(
+                "Genotype labels only apply to payoff matrices indexed by codes."
+            )
+        return topology
+
+    if genotype_labels is None:
+        genotype_labels = Graph._label_n_genotypes(len(payoff_matrix))
+    if len(genotype_labels) != len(payoff_matrix):
+        raise ValueError(
+            f"Payoff matrix covers {len(payoff_matrix)} genotypes, "
+            f"but {len(genotype_labels)} genotype labels were given."
+        )
+    code_of = {label: code for code, label in enumerate(genotype_labels)}
+    if len(code_of) != len(genotype_labels):
+        raise ValueError("Genotype labels must be unique.")
+
+    present = [
+        topology.genotype_labels[code]
+        for code in np.unique(topology.genotypes).tolist()
+    ]
+    missing = [label for label in present if label not in code_of]
+    if missing:
+        raise ValueError(f"The genotypes {missing} have no code in the payoff matrix.")
+
+    recode = np.array(
+        [code_of.get(label, 0) for label in topology.genotype_labels], dtype=np.int64
+    )
+    aligned = copy.copy(topology)
+    aligned.genotypes = recode[topology.genotypes].astype(
+        _smallest_uint_dtype(max(len(genotype_labels) - 1, 0))
+    )
+    aligned.genotype_labels = list(genotype_labels)
+    return aligned
+
+
+def compile_payoff_matrix(
+    payoff_matrix: PayoffMatrixType | CompiledPayoffType, genotype_labels: list[str]
+) -> CompiledPayoffType:
+    """Convert a payoff matrix to a dense array indexed by genotype codes.
+
+    A payoff matrix that is already indexed by genotype codes, a G x G array or a PayoffFunction
+    such as a LowRankPayoff, is checked for its size and passed through as it is. Its codes must be
+    those of `genotype_labels`, see `align_genotype_codes`.
+
+    Raises:
+        ValueError: If an entry is missing or not a finite number, so that an incomplete matrix is
+        rejected before a simulation starts rather than failing somewhere during it.
+    """
+    n_genotypes = len(genotype_labels)
+    if isinstance(payoff_matrix, PayoffFunction):
+        if len(payoff_matrix) != n_genotypes:
+            raise ValueError(f"Payoff function must cover {n_genotypes} genotypes.")
+        return payoff_matrix
+    if isinstance(payoff_matrix, np.ndarray):
+        if payoff_matrix.shape != (n_genotypes, n_genotypes):
+            raise ValueError(
+                f"Payoff matrix must have shape {(n_genotypes, n_genotypes)}."
+            )
+        if not np.isfinite(payoff_matrix).all():
+            raise ValueError("Payoff matrix entries must be finite numbers.")
+        return payoff_matrix.astype(np.float64, copy=False)
+
+    missing = [
+        (genotype, opponent)
+        for genotype in genotype_labels
+        for opponent in genotype_labels
+        if opponent not in payoff_matrix.get(genotype, {})
+    ]
+    if missing:
+        raise ValueError(f"Payoff matrix is missing the entries {missing}.")
+
+    compiled = np.array(
+        [
+            [payoff_matrix[genotype][opponent] for opponent in genotype_labels]
+            for genotype in genotype_labels
+        ],
+        dtype=np.float64,
+    )
+    if not np.isfinite(compiled).all():
+        raise ValueError("Payoff matrix entries must be finite numbers.")
+    return compiled
@@ -0,0 +1,576 @@
+from evographs.compiled import CompiledGraph, CompleteTopology, _smallest_uint_dtype
+from evographs.fitness import (
+    SAMPLERS,
+    CompiledPayoffType,
+    fitness_upper_bound,
+    neighbor_genotype_counts,
+    payoff_against_counts,
+)
+from evographs.graph import Graph
+from evographs.lattice import Lattice
+from evographs.rng import SeedType, UniformBuffer, uniform_source
+from evographs.samplers import RejectionSampler, SumTreeSampler
+import math
+import numpy as np
+
+UPDATE_RULES = ("birth_death", "death_birth", "imitation", "fermi")
+
+
+class MoranEngine:
+    """
+    Moran process running entirely on the arrays of a CompiledGraph.
+
+    An event only changes the genotype of the replaced node, so only the fitness of that node and of
+    its neighbours can change. The engine therefore keeps the payoff of every node and the number of
+    its same-genotype neighbours, and patches the O(degree) affected entries after each replacement
+    instead of recomputing the fitness of the whole population.
+
+    The update rule decides who replaces whom:
+
+    - "birth_death": a node reproduces with probability proportional to its fitness and its
+      offspring replaces a uniformly random neighbour. The reproducing node is drawn from a sampler
+      over the fitness values, which is updated in place as well, so an event costs
+      O(degree + log N).
+    - "death_birth": a uniformly random node dies and its neighbours compete for the empty site
+      proportionally to their fitness.
+    - "imitation": a uniformly random node keeps its genotype or adopts that of a neighbour,
+      proportionally to the fitness of itself and its neighbours.
+    - "fermi": a uniformly random node picks a uniformly random neighbour and adopts its genotype
+      with probability `1 / (1 + exp(-beta * (f_neighbour - f_node)))` (pairwise comparison).
+
+    The last three only ever look at one node and its neighbours, so their events cost O(degree)
+    and need no sampler.
+
+    Attributes:
+        graph: The topology the process runs on, a CompiledGraph or an implicit Lattice, its
+        genotypes are left untouched.
+        payoff_matrix: Payoff matrix indexed by genotype codes, a dense array or a PayoffFunction.
+        selection_intensity: Weight of the payoff in the fitness `1 - s + s * payoff`.
+        genotypes: Current genotype code of each node.
+        genotype_counts: Number of nodes with each genotype code.
+        n_alive_genotypes: Number of genotype codes with a positive count.
+        n_heterogeneous_edges: Number of edges between nodes of different genotypes. The process
+        can no longer change once it reaches zero.
+        same_genotype_neighbors: Number of neighbours of each node that share its genotype.
+        payoffs: Accumulated payoff of each node against its neighbours.
+        sampler: Sampler over the node fitness values, a SumTreeSampler ("tree") or a
+        RejectionSampler ("rejection") bounded by the largest fitness the payoff matrix and node
+        degrees allow. None for the update rules that pick nodes uniformly.
+        rng: UniformBuffer the engine draws its random numbers from, built from the seed or
+        generator given on construction.
+        update_rule: One of UPDATE_RULES.
+        fermi_beta: Inverse temperature of the "fermi" rule, how strongly the fitness difference
+        decides whether a genotype is adopted.
+    """
+
+    def __init__(
+        self,
+        graph: CompiledGraph | Lattice,
+        payoff_matrix: CompiledPayoffType,
+        selection_intensity: float,
+        sampler: str = "tree",
+        rng: SeedType | UniformBuffer = None,
+        update_rule: str = "birth_death",
+        fermi_beta: float = 1.0,
+    ):
+        if sampler not in SAMPLERS:
+            raise ValueError(f"Invalid sampler {sampler!r}. Use one of {SAMPLERS}.")
+        if update_rule not in UPDATE_RULES:
+            raise ValueError(
+                f"Invalid update rule {update_rule!r}. Use one of {UPDATE_RULES}."
+            )
+
+        self.graph = graph
+        self.payoff_matrix = payoff_matrix
+        self.selection_intensity = selection_intensity
+        self.rng = uniform_source(rng)
+        self.update_rule = update_rule
+        self.fermi_beta = fermi_beta
+
+        n_genotypes = len(graph.genotype_labels)
+        degrees = graph.degrees
+        self.genotypes = graph.genotypes.copy()
+        self.genotype_counts = np.bincount(self.genotypes, minlength=n_genotypes)
+        self.n_alive_genotypes = int(np.count_nonzero(self.genotype_counts))
+
+        # accumulated over the (node, neighbour) pairs in chunks, so neither memory nor the cost
+        # of an event depends on the number of genotypes
+        self.payoffs = np.zeros(graph.n_nodes)
+        same_genotype_neighbors = np.zeros(graph.n_nodes, dtype=np.int64)
+        for nodes, neighbors in graph.neighbor_pairs():
+            genotypes = self.genotypes[nodes]
+            neighbor_genotypes = self.genotypes[neighbors]
+            self.payoffs += np.bincount(
+                nodes,
+                weights=payoff_matrix[genotypes, neighbor_genotypes],
+                minlength=graph.n_nodes,
+            )
+            same_genotype_neighbors += np.bincount(
+                nodes[genotypes == neighbor_genotypes], minlength=graph.n_nodes
+            )
+        self.same_genotype_neighbors = same_genotype_neighbors.astype(
+            _smallest_uint_dtype(int(degrees.max(initial=0)))
+        )
+        self.n_heterogeneous_edges = (
+            int(degrees.sum()) - int(same_genotype_neighbors.sum())
+        ) // 2
+
+        if update_rule != "birth_death":
+            self.sampler = None
+        elif sampler == "rejection":
+            upper_bound = fitness_upper_bound(
+                payoff_matrix, degrees, selection_intensity
+            )
+            self.sampler = RejectionSampler(self.fitness, upper_bound)
+        else:
+            self.sampler = SumTreeSampler(self.fitness)
+
+    @property
+    def fitness(self) -> np.ndarray:
+        return 1 - self.selection_intensity + self.selection_intensity * self.payoffs
+
+    @property
+    def neighbor_genotype_counts(self):
+        """Number of neighbours of each genotype per node, as a sparse N x G matrix.
+
+        Built from the current genotypes on access, the engine itself only keeps
+        `same_genotype_neighbors`.
+        """
+        return neighbor_genotype_counts(
+            self.graph.adjacency, self.genotypes, len(self.graph.genotype_labels)
+        )
+
+    def draw_waiting_generations(self) -> float:
+        """The number of generations until the next call to `step`, always 1 for this engine."""
+        return 1
+
+    def step(self) -> tuple[int, int, int, int] | None:
+        """Carry out one event of the update rule.
+
+        Returns:
+            The indices of the node whose genotype is copied and of the replaced node together with
+            the old and new genotype code of the replaced node, or None if the chosen node has no
+            neighbours. Old and new genotype are equal when the event did not change anything.
+        """
+        if self.update_rule == "death_birth":
+            return self._death_birth()
+        if self.update_rule == "imitation":
+            return self._imitation()
+        if self.update_rule == "fermi":
+            return self._pairwise_comparison()
+        return self._birth_death()
+
+    def _birth_death(self) -> tuple[int, int, int, int] | None:
+        parent = self.sampler.sample(self.rng)
+        neighbors = self.graph.neighbors(parent)
+        degree = len(neighbors)
+        if not degree:
+            return None
+
+        offset = min(int(self.rng.random() * degree), degree - 1)
+        replaced = int(neighbors[offset])
+        old_genotype = int(self.genotypes[replaced])
+        new_genotype = int(self.genotypes[parent])
+        self.replace(replaced, new_genotype)
+        return parent, replaced, old_genotype, new_genotype
+
+    def _death_birth(self) -> tuple[int, int, int, int] | None:
+        replaced = self._uniform_node()
+        neighbors = self.graph.neighbors(replaced)
+        if not len(neighbors):
+            return None
+
+        parent = int(neighbors[self._proportional_choice(neighbors)])
+        return self._copy(parent, replaced)
+
+    def _imitation(self) -> tuple[int, int, int, int] | None:
+        replaced = self._uniform_node()
+        neighbors = self.graph.neighbors(replaced)
+        if not len(neighbors):
+            return None
+
+        # the node itself competes with its neighbours, choosing it keeps its genotype
+        candidates = np.append(neighbors, replaced)
+        parent = int(candidates[self._proportional_choice(candidates)])
+        return self._copy(parent, replaced)
+
+    def _pairwise_comparison(self) -> tuple[int, int, int, int] | None:
+        replaced = self._uniform_node()
+        neighbors = self.graph.neighbors(replaced)
+        degree = len(neighbors)
+        if not degree:
+            return None
+
+        parent = int(neighbors[min(int(self.rng.random() * degree), degree - 1)])
+        s = self.selection_intensity
+        difference = s * float(self.payoffs[parent] - self.payoffs[replaced])
+        # the logistic function written with tanh, which does not overflow
+        adoption_probability = 0.5 * (1 + math.tanh(0.5 * self.fermi_beta * difference))
+        if self.rng.random() >= adoption_probability:
+            genotype = int(self.genotypes[replaced])
+            return parent, replaced, genotype, genotype
+        return self._copy(parent, replaced)
+
+    def _uniform_node(self) -> int:
+        n_nodes = self.graph.n_nodes
+        return min(int(self.rng.random() * n_nodes), n_nodes - 1)
+
+    def _proportional_choice(self, nodes: np.ndarray) -> int:
+        """Draw a position in `nodes` with probability proportional to the fitness of the node."""
+        s = self.selection_intensity
+        cumulative_fitness = np.cumsum(1 - s + s * self.payoffs[nodes])
+        position = int(
+            np.searchsorted(
+                cumulative_fitness,
+                self.rng.random() * cumulative_fitness[-1],
+                side="right",
+            )
+        )
+        return min(position, len(nodes) - 1)
+
+    def _copy(self, parent: int, replaced: int) -> tuple[int, int, int, int]:
+        """Give the replaced node the genotype of the parent."""
+        old_genotype = int(self.genotypes[replaced])
+        new_genotype = int(self.genotypes[parent])
+        self.replace(replaced, new_genotype)
+        return parent, replaced, old_genotype, new_genotype
+
+    def replace(self, index: int, genotype: int):
+        """Set the genotype code of a node and patch the fitness of it and its neighbours."""
+        old_genotype = int(self.genotypes[index])
+        if old_genotype == genotype:
+            return
+
+        self.genotypes[index] = genotype
+        self.genotype_counts[old_genotype] -= 1
+        self.genotype_counts[genotype] += 1
+        if not self.genotype_counts[old_genotype]:
+            self.n_alive_genotypes -= 1
+        if self.genotype_counts[genotype] == 1:
+            self.n_alive_genotypes += 1
+        neighbors = self.graph.neighbors(index)
+        neighbor_genotypes = self.genotypes[neighbors]
+        was_same = neighbor_genotypes == old_genotype
+        is_same = neighbor_genotypes == genotype
+        n_was_same = int(np.count_nonzero(was_same))
+        n_is_same = int(np.count_nonzero(is_same))
+        # edges to neighbours of the new genotype become homogeneous and edges to
+        # neighbours of the old genotype heterogeneous
+        self.n_heterogeneous_edges += n_was_same - n_is_same
+        self.same_genotype_neighbors[neighbors[was_same]] -= 1
+        self.same_genotype_neighbors[neighbors[is_same]] += 1
+        self.same_genotype_neighbors[index] = n_is_same
+
+        self.payoffs[neighbors] += (
+            self.payoff_matrix[neighbor_genotypes, genotype]
+            - self.payoff_matrix[neighbor_genotypes, old_genotype]
+        )
+        self.payoffs[index] = self.payoff_matrix[genotype, neighbor_genotypes].sum()
+
+        if self.sampler is None:
+            return
+        # patched payoffs pick up rounding error, so a fitness that should be exactly zero can
+        # come out slightly negative
+        s = self.selection_intensity
+        for neighbor, payoff in zip(
+            neighbors.tolist(), self.payoffs[neighbors].tolist()
+        ):
+            self.sampler.update(neighbor, max(0.0, 1 - s + s * payoff))
+        self.sampler.update(index, max(0.0, 1 - s + s * float(self.payoffs[index])))
+
+    def has_fixated(self) -> bool:
+        return self.n_alive_genotypes == 1
+
+    def has_absorbed(self) -> bool:
+        """Whether no replacement can change the population any more."""
+        return self.n_heterogeneous_edges == 0
+
+    def fixed_genotype(self) -> int | None:
+        """The genotype code that has fixated, or None if there is none."""
+        if not self.has_fixated():
+            return None
+        return int(np.flatnonzero(self.genotype_counts)[0])
+
+    def to_graph(self) -> Graph:
+        """Build a Graph holding the current state of the process."""
+        return self.graph.to_graph(self.genotypes)
+
+
+class ContinuousTimeEngine(MoranEngine):
+    """
+    Continuous-time birth-death Moran process simulated with the Gillespie algorithm.
+
+    Every node reproduces at a rate equal to its fitness, so the time to the next reproduction is
+    exponentially distributed with the total fitness F as rate and the reproducing node is drawn
+    proportionally to its fitness from the sum tree, whose root holds F. Rates are updated
+    incrementally after each replacement like the fitness of MoranEngine, so an event costs
+    O(degree + log N).
+
+    Attributes:
+        time: The time of the last reproduction event.
+    """
+
+    def __init__(
+        self,
+        graph: CompiledGraph | Lattice,
+        payoff_matrix: CompiledPayoffType,
+        selection_intensity: float,
+        rng: SeedType | UniformBuffer = None,
+    ):
+        super().__init__(graph, payoff_matrix, selection_intensity, "tree", rng)
+        self.time = 0.0
+
+    def step(self) -> tuple[int, int, int, int] | None:
+        """Advance the clock to the next reproduction event and carry it out.
+
+        Returns:
+            The indices of the reproducing and the replaced node together with the old and new
+            genotype code of the replaced node, or None if the reproducing node has no neighbours.
+        """
+        self.time -= math.log(1 - self.rng.random()) / self.sampler.total
+        return super().step()
+
+
+class ActiveInterfaceEngine(MoranEngine):
+    """
+    Rejection-free birth-death Moran process that only samples events that change the population.
+
+    An event is a null event when the chosen neighbour already carries the genotype of the
+    reproducing node. Node i starts a genotype-changing event with probability
+    f_i / F * h_i / d_i per generation, where F is the total fitness, d_i the degree of i and h_i the
+    number of its neighbours with a different genotype, i.e. its share of the active interface of
+    heterogeneous edges. These weights are kept in a second sum tree, updated alongside the
+    fitness. Each step draws the number of generations until the next genotype-changing event from
+    a geometric distribution with success probability W / F, W being the total active weight, and
+    then samples the event itself from the active weights. Generation numbers therefore have the
+    same distribution as when simulating every null event, which near fixation are the vast
+    majority.
+
+    Attributes:
+        active_sampler: Sum tree over the active weight f_i * h_i / d_i of each node.
+    """
+
+    def __init__(
+        self,
+        graph: CompiledGraph | Lattice,
+        payoff_matrix: CompiledPayoffType,
+        selection_intensity: float,
+        rng: SeedType | UniformBuffer = None,
+    ):
+        super().__init__(graph, payoff_matrix, selection_intensity, "tree", rng)
+        self._degrees = graph.degrees
+        self.active_sampler = SumTreeSampler(
+            self._active_weights(np.arange(graph.n_nodes))
+        )
+
+    @property
+    def active_probability(self) -> float:
+        """Probability that a generation changes the population."""
+        return self.active_sampler.total / self.sampler.total
+
+    def draw_waiting_generations(self) -> float:
+        """Draw the number of generations up to and including the next genotype-changing event.
+
+        Returns infinity when no event can change the population any more.
+        """
+        probability = self.active_probability
+        if probability <= 0:
+            return math.inf
+        if probability >= 1:
+            return 1
+        # inverse transform of a geometric distribution on {1, 2, ...}
+        uniform = 1 - self.rng.random()
+        return 1 + math.floor(math.log(uniform) / math.log1p(-probability))
+
+    def step(self) -> tuple[int, int, int, int] | None:
+        """Carry out one genotype-changing birth-death event.
+
+        Returns:
+            The indices of the reproducing and the replaced node together with the old and new
+            genotype code of the replaced node, or None if no event can change the population.
+        """
+        if self.active_sampler.total <= 0:
+            return None
+
+        parent = self.active_sampler.sample(self.rng)
+        new_genotype = int(self.genotypes[parent])
+        neighbors = self.graph.neighbors(parent)
+        candidates = neighbors[self.genotypes[neighbors] != new_genotype]
+        offset = min(int(self.rng.random() * len(candidates)), len(candidates) - 1)
+        replaced = int(candidates[offset])
+        old_genotype = int(self.genotypes[replaced])
+        self.replace(replaced, new_genotype)
+        return parent, replaced, old_genotype, new_genotype
+
+    def replace(self, index: int, genotype: int):
+        """Set the genotype code of a node and patch the fitness and active weights around it."""
+        super().replace(index, genotype)
+
+        nodes = np.append(self.graph.neighbors(index), index)
+        for node, weight in zip(nodes.tolist(), self._active_weights(nodes).tolist()):
+            self.active_sampler.update(node, weight)
+
+    def _active_weights(self, nodes: np.ndarray) -> np.ndarray:
+        degrees = self._degrees[nodes]
+        heterogeneous = degrees - self.same_genotype_neighbors[nodes]
+        # isolated nodes have no heterogeneous neighbours, avoid dividing by zero
+        return (
+            np.maximum(
+                1
+                - self.selection_intensity
+                + self.selection_intensity * self.payoffs[nodes],
+                0.0,
+            )
+            * heterogeneous
+            / np.maximum(degrees, 1)
+        )
+
+
+class WellMixedEngine:
+    """
+    Birth-death Moran process on a complete graph, driven by the genotype counts alone.
+
+    On a complete graph the neighbours of a node are everyone else, so a node of genotype i with
+    n_i - 1 other nodes of its own genotype has payoff `(P @ n)_i - P_ii`, identical for all nodes of
+    genotype i. The reproducing genotype is drawn with weight `n_i * f_i` and the reproducing node
+    uniformly among the nodes of that genotype, the replaced node uniformly among the N - 1 others.
+    This is exactly the law of the spatial process, but an event costs O(G) and no adjacency is
+    stored. Nodes are grouped per genotype so that the events still name concrete nodes and the
+    history can be replayed at node level.
+
+    Attributes:
+        graph: The complete topology the process runs on, its genotypes are left untouched.
+        payoff_matrix: Payoff matrix indexed by genotype codes, a dense array or a PayoffFunction.
+        selection_intensity: Weight of the payoff in the fitness `1 - s + s * payoff`.
+        genotypes: Current genotype code of each node.
+        genotype_counts: Number of nodes with each genotype code.
+        n_alive_genotypes: Number of genotype codes with a positive count.
+        genotype_payoffs: Payoff `(P @ n)_i - P_ii` of a node of each genotype code.
+        rng: UniformBuffer the engine draws its random numbers from.
+    """
+
+    def __init__(
+        self,
+        graph: CompleteTopology,
+        payoff_matrix: CompiledPayoffType,
+        selection_intensity: float,
+        rng: SeedType | UniformBuffer = None,
+    ):
+        self.graph = graph
+        self.payoff_matrix = payoff_matrix
+        self.selection_intensity = selection_intensity
+        self.rng = uniform_source(rng)
+
+        n_genotypes = len(graph.genotype_labels)
+        self.genotypes = graph.genotypes.copy()
+        self.genotype_counts = np.bincount(self.genotypes, minlength=n_genotypes)
+        self.n_alive_genotypes = int(np.count_nonzero(self.genotype_counts))
+        genotype_codes = np.arange(n_genotypes)
+        self.genotype_payoffs = (
+            payoff_against_counts(payoff_matrix, self.genotype_counts)
+            - payoff_matrix[genotype_codes, genotype_codes]
+        )
+
+        # the nodes of each genotype and the position of each node in its group, so a node is
+        # drawn from and moved between groups in O(1)
+        self._members = [[] for _ in range(n_genotypes)]
+        self._positions = []
+        for node, genotype in enumerate(self.genotypes.tolist()):
+            self._positions.append(len(self._members[genotype]))
+            self._members[genotype].append(node)
+
+    @property
+    def fitness(self) -> np.ndarray:
+        """Fitness of each node."""
+        return self.genotype_fitness[self.genotypes]
+
+    @property
+    def genotype_fitness(self) -> np.ndarray:
+        """Fitness of a node of each genotype code."""
+        return (
+            1
+            - self.selection_intensity
+            + self.selection_intensity * self.genotype_payoffs
+        )
+
+    def draw_waiting_generations(self) -> float:
+        """The number of generations until the next call to `step`, always 1 for this engine."""
+        return 1
+
+    def step(self) -> tuple[int, int, int, int] | None:
+        """Carry out one birth-death event.
+
+        Returns:
+            The indices of the reproducing and the replaced node together with the old and new
+            genotype code of the replaced node, or None if the population has a single node.
+        """
+        n_nodes = self.graph.n_nodes
+        if n_nodes < 2:
+            return None
+
+        weights = self.genotype_counts * self.genotype_fitness
+        cumulative_weights = np.cumsum(weights)
+        new_genotype = int(
+            np.searchsorted(
+                cumulative_weights,
+                self.rng.random() * cumulative_weights[-1],
+                side="right",
+            )
+        )
+        # rounding can land on the total, which belongs to the last genotype of non-zero weight
+        if new_genotype == len(cumulative_weights):
+            new_genotype = int(np.flatnonzero(weights)[-1])
+        members = self._members[new_genotype]
+        parent = members[min(int(self.rng.random() * len(members)), len(members) - 1)]
+
+        # uniform over the other n_nodes - 1 nodes by skipping over the parent
+        replaced = min(int(self.rng.random() * (n_nodes - 1)), n_nodes - 2)
+        replaced += replaced >= parent
+        old_genotype = int(self.genotypes[replaced])
+        self.replace(replaced, new_genotype)
+        return parent, replaced, old_genotype, new_genotype
+
+    def replace(self, index: int, genotype: int):
+        """Set the genotype code of a node and update the genotype counts and payoffs."""
+        old_genotype = int(self.genotypes[index])
+        if old_genotype == genotype:
+            return
+
+        # move the node to its new group, filling its old slot with the last member
+        old_members = self._members[old_genotype]
+        last = old_members.pop()
+        if last != index:
+            old_members[self._positions[index]] = last
+            self._positions[last] = self._positions[index]
+        self._positions[index] = len(self._members[genotype])
+        self._members[genotype].append(index)
+
+        self.genotypes[index] = genotype
+        self.genotype_counts[old_genotype] -= 1
+        self.genotype_counts[genotype] += 1
+        if not self.genotype_counts[old_genotype]:
+            self.n_alive_genotypes -= 1
+        if self.genotype_counts[genotype] == 1:
+            self.n_alive_genotypes += 1
+        genotype_codes = np.arange(len(self.genotype_counts))
+        self.genotype_payoffs += (
+            self.payoff_matrix[genotype_codes, genotype]
+            - self.payoff_matrix[genotype_codes, old_genotype]
+        )
+
+    def has_fixated(self) -> bool:
+        return self.n_alive_genotypes == 1
+
+    def has_absorbed(self) -> bool:
+        """Whether no replacement can change the population any more."""
+        return self.n_alive_genotypes <= 1
+
+    def fixed_genotype(self) -> int | None:
+        """The genotype code that has fixated, or None if there is none."""
+        if not self.has_fixated():
+            return None
+        return int(np.flatnonzero(self.genotype_counts)[0])
+
+    def to_graph(self) -> Graph:
+        """Build a Graph holding the current state of the process, in O(N^2)."""
+        return self.graph.to_graph(self.genotypes)
@@ -0,0 +1,499 @@
+from evographs.compiled import (
+    CompiledGraph,
+    GraphBatch,
+    align_genotype_codes,
+    compile_payoff_matrix,
+)
+from evographs.fitness import CompiledPayoffType, PayoffMatrixType
+from evographs.graph import Graph
+from evographs.lattice import Lattice
+from evographs.results import SimulationResult, StopReason
+from evographs.rng import SeedType
+import numpy as np
+
+
+class LockstepEngine:
+    """
+    Advances many independent birth-death Moran processes together, one event each per step.
+
+    The populations share a single flat state: population p owns the `n_nodes[p]` entries starting
+    at `node_offsets[p]` of the genotype and payoff arrays, and takes its topology and initial
+    genotypes from the nodes starting at `template_offsets[p]` of a template graph in CSR form.
+    Every step draws the reproducing node of each active population by vectorised rejection
+    sampling, proposing nodes in proportion to a static upper bound on their fitness given their
+    degree, then its neighbour to replace, and then patches the payoffs around all replaced nodes
+    at once by gathering their CSR segments, so both the interpreter overhead per step and the
+    memory stay proportional to the populations and edges rather than to the largest degree.
+    Populations that can no longer change drop out of the active set.
+
+    Attributes:
+        payoff_matrix: Payoff matrix indexed by genotype codes, a dense array or a PayoffFunction.
+        selection_intensity: Weight of the payoff in the fitness `1 - s + s * payoff`.
+        genotype_labels: Genotype label of each genotype code.
+        genotype_counts: Number of nodes with each genotype code, one row per population.
+        n_alive_genotypes: Number of genotype codes with a positive count in each population.
+        n_heterogeneous_edges: Number of edges between nodes of different genotypes per population.
+        generation: Number of events each population has carried out.
+        n_events: Number of events that changed a genotype in each population.
+        active: Indices of the populations that can still change.
+        stop_reasons: Why each population stopped, None while it is active.
+        rng: The NumPy generator all populations draw from.
+    """
+
+    # rounds of rejection sampling before the remaining draws fall back to inverse transform
+    max_rejection_rounds: int = 8
+
+    def __init__(
+        self,
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        genotypes: np.ndarray,
+        genotype_labels: list[str],
+        payoff_matrix: CompiledPayoffType,
+        selection_intensity: float,
+        n_nodes: np.ndarray,
+        node_offsets: np.ndarray,
+        template_offsets: np.ndarray,
+        rng: SeedType = None,
+    ):
+        """
+        Parameters:
+            indptr: CSR row pointers of the template graph.
+            indices: CSR column indices of the template graph.
+            genotypes: Genotype code of each template node, the initial state of every population
+            that starts from it.
+            genotype_labels: Genotype label of each genotype code.
+            payoff_matrix: Payoff matrix indexed by genotype codes.
+            selection_intensity: Weight of the payoff in the fitness `1 - s + s * payoff`.
+            n_nodes: Number of nodes of each population.
+            node_offsets: Start of each population in the flat state.
+            template_offsets: Start of the template nodes of each population.
+            rng: Seed or NumPy generator.
+        """
+        self.payoff_matrix = payoff_matrix
+        self.selection_intensity = selection_intensity
+        self.genotype_labels = genotype_labels
+        self.rng = np.random.default_rng(rng)
+
+        self._indptr = indptr.astype(np.int64)
+        self._indices = indices.astype(np.int64)
+        self._degrees = np.diff(self._indptr)
+        self._n_nodes = np.asarray(n_nodes, dtype=np.int64)
+        self._node_offsets = np.asarray(node_offsets, dtype=np.int64)
+        self._template_offsets = np.asarray(template_offsets, dtype=np.int64)
+        n_populations = len(self._n_nodes)
+        n_templates = len(self._degrees)
+
+        self._population_of = np.repeat(np.arange(n_populations), self._n_nodes)
+        self._template_of = (
+            np.arange(len(self._population_of))
+            - self._node_offsets[self._population_of]
+            + self._template_offsets[self._population_of]
+        )
+
+        # payoffs and heterogeneous edges are computed once over the edges of the template and
+        # gathered for every population that starts from it
+        template_genotypes = genotypes.astype(np.int64)
+        rows = np.repeat(np.arange(n_templates), self._degrees)
+        own_genotypes = template_genotypes[rows]
+        neighbor_genotypes = template_genotypes[self._indices]
+        template_payoffs = np.bincount(
+            rows,
+            weights=payoff_matrix[own_genotypes, neighbor_genotypes],
+            minlength=n_templates,
+        )
+        cumulative_heterogeneous = np.zeros(n_templates + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(
+                rows[own_genotypes != neighbor_genotypes], minlength=n_templates
+            ),
+            out=cumulative_heterogeneous[1:],
+        )
+        self._genotypes = template_genotypes[self._template_of]
+        self._payoffs = template_payoffs[self._template_of]
+        self.n_heterogeneous_edges = (
+            cumulative_heterogeneous[self._template_offsets + self._n_nodes]
+            - cumulative_heterogeneous[self._template_offsets]
+        ) // 2
+
+        self.genotype_counts = np.zeros(
+            (n_populations, len(genotype_labels)), dtype=np.int64
+        )
+        np.add.at(self.genotype_counts, (self._population_of, self._genotypes), 1)
+        self.n_alive_genotypes = np.count_nonzero(self.genotype_counts, axis=1)
+
+        # fitness is linear in the payoff, which lies between degree times the smallest and the
+        # largest entry, so each template node has a static upper bound on its fitness
+        s = selection_intensity
+        entries = np.array([float(payoff_matrix.min()), float(payoff_matrix.max())])
+        self._fitness_bounds = (
+            1 - s + s * self._degrees[:, None] * entries[None, :]
+        ).max(axis=1)
+        self._cumulative_bounds = np.cumsum(self._fitness_bounds)
+
+        self.generation = np.zeros(n_populations, dtype=np.int64)
+        self.n_events = np.zeros(n_populations, dtype=np.int64)
+        self.stop_reasons: list[StopReason | None] = [None] * n_populations
+        self.active = np.arange(n_populations)
+        self._retire()
+
+    @property
+    def fitness(self) -> np.ndarray:
+        """Fitness of every node, flat over all populations."""
+        return 1 - self.selection_intensity + self.selection_intensity * self._payoffs
+
+    def step(self):
+        """Carry out one birth-death event in every active population."""
+        active = self.active
+        if not len(active):
+            return
+
+        parents = self._draw_parents(active)
+        parent_templates = self._template_of[parents]
+        degrees = self._degrees[parent_templates]
+        has_neighbors = degrees > 0
+        offsets = np.minimum(
+            (self.rng.random(len(active)) * degrees).astype(np.int64),
+            np.maximum(degrees - 1, 0),
+        )
+        replaced_templates = self._indices[
+            np.minimum(self._indptr[parent_templates] + offsets, len(self._indices) - 1)
+        ]
+        replaced = (
+            replaced_templates
+            - self._template_offsets[active]
+            + self._node_offsets[active]
+        )
+        old_genotypes = self._genotypes[replaced]
+        new_genotypes = self._genotypes[parents]
+        self.generation[active] += 1
+
+        changed = has_neighbors & (old_genotypes != new_genotypes)
+        if changed.any():
+            self._replace(
+                active[changed],
+                replaced[changed],
+                replaced_templates[changed],
+                old_genotypes[changed],
+                new_genotypes[changed],
+            )
+        self._retire()
+
+    def run(self, num_generations: int = 1_000_000):
+        """Step until every population has absorbed or carried out `num_generations` events."""
+        end = self.generation.copy()
+        end[self.active] += num_generations
+        while len(self.active):
+            limited = self.generation[self.active] >= end[self.active]
+            if limited.any():
+                for population in self.active[limited].tolist():
+                    self.stop_reasons[population] = StopReason.MAX_GENERATIONS
+                self.active = self.active[~limited]
+                continue
+            self.step()
+        return self
+
+    def results(self) -> list[SimulationResult]:
+        """The result of each population, in order."""
+        results = []
+        for population, stop_reason in enumerate(self.stop_reasons):
+            generation = int(self.generation[population])
+            n_events = int(self.n_events[population])
+            if stop_reason is StopReason.FIXATION:
+                code = int(np.flatnonzero(self.genotype_counts[population])[0])
+                results.append(
+                    SimulationResult(
+                        stop_reason,
+                        generation,
+                        n_events,
+                        fixed_genotype=self.genotype_labels[code],
+                        fixation_generation=generation,
+                    )
+                )
+            else:
+                results.append(
+                    SimulationResult(
+                        stop_reason or StopReason.MAX_EVENTS, generation, n_events
+                    )
+                )
+        return results
+
+    def _draw_parents(self, populations: np.ndarray) -> np.ndarray:
+        """Draw a node of each population with probability proportional to its fitness."""
+        s = self.selection_intensity
+        parents = np.empty(len(populations), dtype=np.int64)
+        pending = np.arange(len(populations))
+        for _ in range(self.max_rejection_rounds):
+            candidate_populations = populations[pending]
+            starts = self._template_offsets[candidate_populations]
+            templates = _search_segments(
+                self._cumulative_bounds,
+                starts,
+                starts + self._n_nodes[candidate_populations],
+                self.rng.random(len(pending)),
+            )
+            candidates = templates - starts + self._node_offsets[candidate_populations]
+            fitness = 1 - s + s * self._payoffs[candidates]
+            accepted = (
+                self.rng.random(len(pending)) * self._fitness_bounds[templates]
+                <= fitness
+            )
+            parents[pending[accepted]] = candidates[accepted]
+            pending = pending[~accepted]
+            if not len(pending):
+                return parents
+
+        # inverse transform on running sums over the nodes of the remaining populations only
+        n_nodes = self._n_nodes[populations[pending]]
+        segment_starts = np.cumsum(n_nodes) - n_nodes
+        nodes = np.repeat(
+            self._node_offsets[populations[pending]] - segment_starts, n_nodes
+        ) + np.arange(int(n_nodes.sum()))
+        positions = _search_segments(
+            np.cumsum(1 - s + s * self._payoffs[nodes]),
+            segment_starts,
+            segment_starts + n_nodes,
+            self.rng.random(len(pending)),
+        )
+        parents[pending] = nodes[positions]
+        return parents
+
+    def _replace(
+        self,
+        populations: np.ndarray,
+        replaced: np.ndarray,
+        replaced_templates: np.ndarray,
+        old_genotypes: np.ndarray,
+        new_genotypes: np.ndarray,
+    ):
+        """Change the genotype of one node in each of `populations` and patch the payoffs."""
+        # the CSR segments of all replaced nodes, concatenated, with the event each edge belongs to
+        degrees = self._degrees[replaced_templates]
+        events = np.repeat(np.arange(len(populations)), degrees)
+        edges = np.repeat(
+            self._indptr[replaced_templates] - (np.cumsum(degrees) - degrees), degrees
+        ) + np.arange(len(events))
+        neighbors = self._indices[edges] + np.repeat(
+            self._node_offsets[populations] - self._template_offsets[populations],
+            degrees,
+        )
+        neighbor_genotypes = self._genotypes[neighbors]
+        old = np.repeat(old_genotypes, degrees)
+        new = np.repeat(new_genotypes, degrees)
+
+        matrix = self.payoff_matrix
+        self._payoffs[neighbors] += (
+            matrix[neighbor_genotypes, new] - matrix[neighbor_genotypes, old]
+        )
+        self._payoffs[replaced] = np.bincount(
+            events,
+            weights=matrix[new, neighbor_genotypes],
+            minlength=len(populations),
+        )
+        self._genotypes[replaced] = new_genotypes
+
+        self.n_heterogeneous_edges[populations] += np.bincount(
+            events,
+            weights=(neighbor_genotypes == old).view(np.int8)
+            - (neighbor_genotypes == new).view(np.int8),
+            minlength=len(populations),
+        ).astype(np.int64)
+        self.genotype_counts[populations, old_genotypes] -= 1
+        self.genotype_counts[populations, new_genotypes] += 1
+        self.n_alive_genotypes[populations] += (
+            self.genotype_counts[populations, new_genotypes] == 1
+        ).astype(np.int64) - (self.genotype_counts[populations, old_genotypes] == 0)
+        self.n_events[populations] += 1
+
+    def _retire(self):
+        """Drop the populations that can no longer change from the active set."""
+        absorbed = self.n_heterogeneous_edges[self.active] == 0
+        if not absorbed.any():
+            return
+        for population in self.active[absorbed].tolist():
+            self.stop_reasons[population] = (
+                StopReason.FIXATION
+                if self.n_alive_genotypes[population] == 1
+                else StopReason.ABSORBING
+            )
+        self.active = self.active[~absorbed]
+
+
+def _search_segments(
+    cumulative: np.ndarray, starts: np.ndarray, ends: np.ndarray, uniforms: np.ndarray
+) -> np.ndarray:
+    """Draw a position in each [start, end) with probability proportional to its increment of the
+    running sum `cumulative`, by inverse transform."""
+    low = np.where(starts > 0, cumulative[np.maximum(starts - 1, 0)], 0.0)
+    high = cumulative[ends - 1]
+    targets = low + uniforms * (high - low)
+    return np.clip(np.searchsorted(cumulative, targets, side="right"), starts, ends - 1)
+
+
+class EnsembleEngine(LockstepEngine):
+    """
+    R independent replicates of a birth-death Moran process on one shared graph.
+
+    The state is an R x N genotype matrix, whose rows all start from the genotypes of the graph and
+    are advanced in lockstep, one event per replicate per step. This turns the Python overhead of
+    estimating a fixation probability from per replicate into per ensemble.
+
+    Attributes:
+        graph: The topology shared by all replicates, a CompiledGraph or a Lattice.
+        n_replicates: Number of replicates.
+    """
+
+    def __init__(
+        self,
+        graph: CompiledGraph | Lattice,
+        payoff_matrix: CompiledPayoffType,
+        selection_intensity: float,
+        n_replicates: int,
+        rng: SeedType = None,
+    ):
+        if n_replicates < 1:
+            raise ValueError("Number of replicates must be positive.")
+
+        self.graph = graph
+        self.n_replicates = n_replicates
+        adjacency = graph.adjacency
+        n_nodes = graph.n_nodes
+        super().__init__(
+            adjacency.indptr,
+            adjacency.indices,
+            graph.genotypes,
+            graph.genotype_labels,
+            payoff_matrix,
+            selection_intensity,
+            np.full(n_replicates, n_nodes),
+            np.arange(n_replicates) * n_nodes,
+            np.zeros(n_replicates, dtype=np.int64),
+            rng,
+        )
+
+    @property
+    def genotypes(self) -> np.ndarray:
+        """R x N matrix of the current genotype codes."""
+        return self._genotypes.reshape(self.n_replicates, self.graph.n_nodes)
+
+
+class BatchEngine(LockstepEngine):
+    """
+    Birth-death Moran processes on every graph of a GraphBatch, run simultaneously.
+
+    Each step carries out one event in every graph that can still change, with one vectorised
+    selection and replacement for the whole batch, so sweeps over many small graphs are bound by
+    NumPy rather than by the interpreter.
+
+    Attributes:
+        batch: The graphs being simulated.
+    """
+
+    def __init__(
+        self,
+        batch: GraphBatch,
+        payoff_matrix: CompiledPayoffType,
+        selection_intensity: float,
+        rng: SeedType = None,
+    ):
+        self.batch = batch
+        starts = batch.offsets[:-1]
+        super().__init__(
+            batch.indptr,
+            batch.indices,
+            batch.genotypes,
+            batch.genotype_labels,
+            payoff_matrix,
+            selection_intensity,
+            np.diff(batch.offsets),
+            starts,
+            starts,
+            rng,
+        )
+
+    @property
+    def genotypes(self) -> np.ndarray:
+        """Current genotype codes of all nodes of the batch."""
+        return self._genotypes
+
+    def to_graph(self, k: int) -> Graph:
+        """Build a Graph holding the current state of the k-th graph."""
+        return self.batch.member(k, self.genotypes).to_graph()
+
+
+def run_batch(
+    graphs: list[Graph],
+    payoff_matrix: PayoffMatrixType | CompiledPayoffType,
+    selection_intensity: float = 0.5,
+    num_generations: int = 1_000_000,
+    rng: SeedType = None,
+    genotype_labels: list[str] | None = None,
+) -> list[SimulationResult]:
+    """
+    Simulate a birth-death Moran process on each of many graphs at once.
+
+    Parameters:
+        graphs: The initial populations.
+        payoff_matrix: Payoff matrix of the game, covering the genotypes of all graphs.
+        selection_intensity: Weight of the payoff in the fitness `1 - s + s * payoff`.
+        num_generations: Generation limit of each graph.
+        rng: Seed or NumPy generator.
+        genotype_labels: Genotype label of each code of a payoff matrix indexed by codes, see
+        `align_genotype_codes`.
+
+    Returns:
+        The result of each graph, in order.
+    """
+    if not graphs:
+        return []
+    batch = align_genotype_codes(
+        GraphBatch.from_graphs(graphs), payoff_matrix, genotype_labels
+    )
+    engine = BatchEngine(
+        batch,
+        compile_payoff_matrix(payoff_matrix, batch.genotype_labels),
+        selection_intensity,
+        rng,
+    )
+    return engine.run(num_generations).results()
+
+
+def run_replicates(
+    graph: Graph | Lattice,
+    payoff_matrix: PayoffMatrixType | CompiledPayoffType,
+    n_replicates: int,
+    selection_intensity: float = 0.5,
+    num_generations: int = 1_000_000,
+    rng: SeedType = None,
+    genotype_labels: list[str] | None = None,
+) -> list[SimulationResult]:
+    """
+    Simulate independent replicates of the same population in lockstep, e.g. to estimate fixation
+    probabilities.
+
+    Parameters:
+        graph: The initial population of every replicate.
+        payoff_matrix: Payoff matrix of the game.
+        n_replicates: Number of replicates.
+        selection_intensity: Weight of the payoff in the fitness `1 - s + s * payoff`.
+        num_generations: Generation limit of each replicate.
+        rng: Seed or NumPy generator.
+        genotype_labels: Genotype label of each code of a payoff matrix indexed by codes, see
+        `align_genotype_codes`.
+
+    Returns:
+        The result of each replicate, in order.
+    """
+    topology = align_genotype_codes(
+        graph if isinstance(graph, Lattice) else CompiledGraph.from_graph(graph),
+        payoff_matrix,
+        genotype_labels,
+    )
+    engine = EnsembleEngine(
+        topology,
+        compile_payoff_matrix(payoff_matrix, topology.genotype_labels),
+        selection_intensity,
+        n_replicates,
+        rng,
+    )
+    return engine.run(num_generations).results()
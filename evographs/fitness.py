@@ -0,0 +1,199 @@
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+from scipy import sparse
+import numpy as np
+
+PayoffMatrixType = dict[str, dict[str, float]]
+
+SAMPLERS = ("tree", "rejection")
+
+
+class PayoffFunction(ABC):
+    """
+    G x G payoff matrix that is never stored densely, indexed like a NumPy array.
+
+    `payoff[a, b]` broadcasts the genotype code arrays a and b against each other and returns the
+    payoffs of a against b elementwise, which is the only way the engines read a payoff matrix.
+    With thousands of genotypes this keeps both memory and the cost of an event independent of G.
+
+    Attributes:
+        n_genotypes: Number of genotype codes.
+    """
+
+    # rows of the matrix evaluated at a time when computing its bounds
+    _block_size: int = 256
+
+    def __init__(self, n_genotypes: int):
+        self.n_genotypes = n_genotypes
+        self._bounds: tuple[float, float] | None = None
+
+    @abstractmethod
+    def pairs(self, genotypes: np.ndarray, opponents: np.ndarray) -> np.ndarray:
+        """Payoff of each genotype against the corresponding opponent."""
+
+    def __getitem__(self, key) -> np.ndarray:
+        genotypes, opponents = np.broadcast_arrays(
+            np.asarray(key[0], dtype=np.int64), np.asarray(key[1], dtype=np.int64)
+        )
+        return self.pairs(genotypes, opponents)
+
+    def __len__(self) -> int:
+        return self.n_genotypes
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.n_genotypes, self.n_genotypes
+
+    def min(self) -> float:
+        return self.bounds()[0]
+
+    def max(self) -> float:
+        return self.bounds()[1]
+
+    def bounds(self) -> tuple[float, float]:
+        """Smallest and largest entry, evaluated block by block on first use."""
+        if self._bounds is None:
+            low, high = np.inf, -np.inf
+            opponents = np.arange(self.n_genotypes)
+            for start in range(0, self.n_genotypes, self._block_size):
+                rows = np.arange(start, min(start + self._block_size, self.n_genotypes))
+                block = self[rows[:, None], opponents[None, :]]
+                low, high = min(low, float(block.min())), max(high, float(block.max()))
+            self._bounds = low, high
+        return self._bounds
+
+
+class LowRankPayoff(PayoffFunction):
+    """
+    Payoff matrix of rank k given by its factors, `payoff[a, b] = left[a] . right[b]`.
+
+    Attributes:
+        left: G x k factor of the playing genotypes.
+        right: G x k factor of the opponents.
+    """
+
+    def __init__(self, left: np.ndarray, right: np.ndarray):
+        if left.shape != right.shape or left.ndim != 2:
+            raise ValueError("Both factors must be G x k matrices of the same shape.")
+        super().__init__(len(left))
+        self.left = np.asarray(left, dtype=np.float64)
+        self.right = np.asarray(right, dtype=np.float64)
+
+    def pairs(self, genotypes: np.ndarray, opponents: np.ndarray) -> np.ndarray:
+        return np.einsum("...k,...k->...", self.left[genotypes], self.right[opponents])
+
+
+class CallablePayoff(PayoffFunction):
+    """
+    Payoff matrix computed on demand by a vectorised function of two genotype code arrays.
+
+    Attributes:
+        function: Maps broadcast arrays of genotype and opponent codes to their payoffs.
+    """
+
+    def __init__(
+        self,
+        function: Callable[[np.ndarray, np.ndarray], np.ndarray],
+        n_genotypes: int,
+        bounds: tuple[float, float] | None = None,
+    ):
+        """
+        Parameters:
+            function: Maps broadcast arrays of genotype and opponent codes to their payoffs.
+            n_genotypes: Number of genotype codes.
+            bounds: Smallest and largest payoff if known, otherwise they are computed by evaluating
+            the function on all G^2 pairs when first needed.
+        """
+        super().__init__(n_genotypes)
+        self.function = function
+        self._bounds = bounds
+
+    def pairs(self, genotypes: np.ndarray, opponents: np.ndarray) -> np.ndarray:
+        return np.asarray(self.function(genotypes, opponents), dtype=np.float64)
+
+
+CompiledPayoffType = np.ndarray | PayoffFunction
+
+
+def payoff_against_counts(
+    payoff_matrix: CompiledPayoffType, genotype_counts: np.ndarray
+) -> np.ndarray:
+    """`payoff_matrix @ genotype_counts`, only reading the columns of genotypes that are present."""
+    present = np.flatnonzero(genotype_counts)
+    genotypes = np.arange(len(payoff_matrix))
+    return (
+        payoff_matrix[genotypes[:, None], present[None, :]] @ genotype_counts[present]
+    )
+
+
+def fitness_upper_bound(
+    payoff_matrix: CompiledPayoffType,
+    degrees: np.ndarray,
+    selection_intensity: float,
+) -> float:
+    """Upper bound on `1 - s + s * payoff` over every node and genotype configuration.
+
+    The payoff of a node of degree d lies between d times the smallest and d times the largest
+    payoff matrix entry, and fitness is linear in both the payoff and the degree, so the maximum is
+    attained at one of the corners of that range.
+    """
+    return max(
+        1 - selection_intensity + selection_intensity * degree * entry
+        for degree in (int(np.min(degrees)), int(np.max(degrees)))
+        for entry in (float(payoff_matrix.min()), float(payoff_matrix.max()))
+    )
+
+
+def neighbor_genotype_counts(
+    adjacency: sparse.csr_array, genotypes: np.ndarray, n_genotypes: int
+) -> sparse.csr_array:
+    """Number of neighbours of each genotype per node, as the product of the adjacency matrix and
+    the N x G one-hot matrix of the genotype codes."""
+    n_nodes = len(genotypes)
+    one_hot = sparse.csr_array(
+        (
+            np.ones(n_nodes, dtype=adjacency.dtype),
+            genotypes.astype(np.int64),
+            np.arange(n_nodes + 1),
+        ),
+        shape=(n_nodes, n_genotypes),
+    )
+    return adjacency @ one_hot
+
+
+def population_payoffs(
+    adjacency: sparse.csr_array,
+    genotypes: np.ndarray,
+    payoff_matrix: CompiledPayoffType,
+) -> np.ndarray:
+    """Payoff of every node against its neighbours, computed for the whole population at once.
+
+    Parameters:
+        adjacency: N x N sparse adjacency matrix.
+        genotypes: Genotype code of each node.
+        payoff_matrix: G x G payoff matrix indexed by genotype codes.
+
+    Returns:
+        The row-wise dot product of the neighbour genotype counts with the payoff matrix row of
+        the genotype of each node. Only the non-zero counts are visited, so the cost does not grow
+        with the number of genotypes.
+    """
+    counts = neighbor_genotype_counts(adjacency, genotypes, len(payoff_matrix)).tocoo()
+    weights = counts.data * payoff_matrix[genotypes[counts.row], counts.col]
+    return np.bincount(counts.row, weights=weights, minlength=len(genotypes))
+
+
+def well_mixed_payoffs(
+    genotypes: np.ndarray, payoff_matrix: CompiledPayoffType
+) -> np.ndarray:
+    """Payoff of every node of a complete graph, in which a node meets every node but itself."""
+    counts = np.bincount(genotypes, minlength=len(payoff_matrix))
+    against_counts = payoff_against_counts(payoff_matrix, counts)
+    return against_counts[genotypes] - payoff_matrix[genotypes, genotypes]
+
+
+def genotype_payoffs(
+    payoffs: np.ndarray, genotypes: np.ndarray, n_genotypes: int
+) -> np.ndarray:
+    """Total payoff of the nodes of each genotype code."""
+    return np.bincount(genotypes, weights=payoffs, minlength=n_genotypes)
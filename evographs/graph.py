@@ -1,6 +1,12 @@
-import random
+from evographs.rng import SeedType
+from array import array
+from collections.abc import Iterator, Mapping, Set
+import operator
 import string
 from typing import Self
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+import numpy as np
 
 
 class NodeNotInGraphError(Exception):
@@ -19,24 +25,49 @@ def _display_node(self, indent=2):
 
 
 class Node:
-    """Represents a node with a genotype and a unique integer ID."""
+    """Represents a node with a genotype and a unique integer ID.
 
-    _next_id: int = 1
+    A Node created without an ID gets the next free ID of the graph it is added to.
 
-    def __init__(self, genotype: str, node_id: int | None = None):
-        if node_id is None:
-            node_id = Node._next_id
-            Node._next_id += 1
+    A Node added to a Graph becomes a view of that graph: its genotype is read from and written to
+    the genotype state of the graph, so snapshots of the graph never share a mutable Node. Nodes of
+    a graph that were not passed in by the user are created as views only when they are accessed,
+    and are kept small with `__slots__`.
+    """
+
+    __slots__ = ("_genotype", "_graph", "_index", "node_id")
 
+    def __init__(self, genotype: str, node_id: int | None = None):
         if node_id is not None and not isinstance(node_id, int):
             raise ValueError("Node ID must be an integer.")
 
-        self.genotype = genotype
+        self._genotype = genotype
+        self._graph = None
+        self._index = None
         self.node_id = node_id
 
     @classmethod
-    def _reset_next_id(cls):
-        cls._next_id = 1
+    def _view(cls, graph: "Graph", index: int) -> "Node":
+        """A Node bound to the node with `index` in `graph`."""
+        node = cls.__new__(cls)
+        node._genotype = None
+        node._graph = graph
+        node._index = index
+        node.node_id = graph.topology.node_ids[index]
+        return node
+
+    @property
+    def genotype(self) -> str:
+        if self._graph is None:
+            return self._genotype
+        return self._graph._genotype_of(self._index)
+
+    @genotype.setter
+    def genotype(self, genotype: str):
+        if self._graph is None:
+            self._genotype = genotype
+        else:
+            self._graph._set_genotype(self._index, genotype)
 
     def display(self, indent=2):
         """Display information about the node with indentation."""
@@ -47,22 +78,284 @@ class Node:
         return Node(self.genotype, self.node_id)
 
 
+class GraphTopology:
+    """
+    Node IDs and adjacency of a Graph as integer node indices, without the genotypes.
+
+    Node i has the ID `node_ids[i]`. Topologies built in bulk store the neighbours of all nodes in
+    compressed sparse row (CSR) form, a few bytes per edge, and node IDs numbered consecutively are
+    looked up arithmetically rather than through a dictionary. The first structural change
+    converts the neighbours to one typed array per node and builds a set of the edges, after which
+    an edge is inserted, including the check for duplicates, in O(1).
+
+    Snapshots of a graph all share one topology, which is frozen as soon as it is shared: a graph
+    that changes the structure of a frozen topology first takes its own copy of it.
+
+    Attributes:
+        node_ids: Node ID of each node index.
+        frozen: Whether the topology is shared and must no longer be modified.
+    """
+
+    def __init__(
+        self,
+        node_ids: array | None = None,
+        indptr: array | None = None,
+        indices: array | None = None,
+    ):
+        """
+        Parameters:
+            node_ids: Node ID of each node index, an empty topology if None.
+            indptr: Offsets into `indices` for each node, of length n_nodes + 1.
+            indices: Concatenated neighbour indices of all nodes, no neighbours if None.
+        """
+        self.node_ids = node_ids if node_ids is not None else array("q")
+        n_nodes = len(self.node_ids)
+        if indices is None:
+            indptr, indices = array("Q", [0]) * (n_nodes + 1), array("I")
+        self._indptr = indptr
+        self._indices = indices
+        self._adjacency: list[array] | None = None
+        self._edges: set[int] | None = None
+        self.frozen = False
+
+        # consecutive node IDs are looked up arithmetically, others through a dictionary
+        ids = np.frombuffer(self.node_ids, dtype=np.int64)
+        self._max_id = int(ids.max()) if n_nodes else None
+        if n_nodes and np.array_equal(ids, np.arange(ids[0], ids[0] + n_nodes)):
+            self._first_id = int(ids[0])
+            self._index_of = None
+        else:
+            self._first_id = None
+            self._index_of = {
+                node_id: index for index, node_id in enumerate(ids.tolist())
+            }
+
+    @classmethod
+    def from_csr(
+        cls, node_ids: np.ndarray, indptr: np.ndarray, indices: np.ndarray
+    ) -> "GraphTopology":
+        """A topology from the CSR arrays of e.g. a CompiledGraph, copied into compact arrays."""
+        return cls(
+            array("q", np.asarray(node_ids, dtype=np.int64).tobytes()),
+            array("Q", np.asarray(indptr, dtype=np.uint64).tobytes()),
+            array("I", np.asarray(indices, dtype=np.uint32).tobytes()),
+        )
+
+    @classmethod
+    def from_edges(
+        cls, node_ids: np.ndarray, sources: np.ndarray, targets: np.ndarray
+    ) -> "GraphTopology":
+        """A topology with the undirected edges between the node indices `sources` and `targets`.
+
+        The neighbours of each node are sorted by index.
+        """
+        n_nodes = len(node_ids)
+        rows = np.concatenate([sources, targets]).astype(np.int64)
+        cols = np.concatenate([targets, sources]).astype(np.int64)
+        order = np.lexsort((cols, rows))
+        indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n_nodes), out=indptr[1:])
+        return cls.from_csr(node_ids, indptr, cols[order])
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def __contains__(self, node_id) -> bool:
+        try:
+            self.index(node_id)
+        except KeyError:
+            return False
+        return True
+
+    def index(self, node_id: int) -> int:
+        """The node index of a node ID, raises KeyError if there is no such node."""
+        if self._first_id is None:
+            return self._index_of[node_id]
+        try:
+            index = operator.index(node_id) - self._first_id
+        except TypeError:
+            raise KeyError(node_id) from None
+        if 0 <= index < len(self.node_ids):
+            return index
+        raise KeyError(node_id)
+
+    def neighbors(self, index: int) -> array:
+        """Neighbour indices of a node index, not to be modified."""
+        if self._adjacency is not None:
+            return self._adjacency[index]
+        return self._indices[self._indptr[index] : self._indptr[index + 1]]
+
+    def csr(self) -> tuple[np.ndarray, np.ndarray]:
+        """The neighbours of all nodes as CSR arrays `indptr` and `indices`."""
+        if self._adjacency is None:
+            return (
+                np.frombuffer(self._indptr, dtype=np.uint64).astype(np.int64),
+                np.frombuffer(self._indices, dtype=np.uint32),
+            )
+        degrees = np.fromiter(
+            (len(neighbors) for neighbors in self._adjacency),
+            dtype=np.int64,
+            count=len(self._adjacency),
+        )
+        indptr = np.zeros(len(degrees) + 1, dtype=np.int64)
+        np.cumsum(degrees, out=indptr[1:])
+        indices = np.frombuffer(
+            b"".join(neighbors.tobytes() for neighbors in self._adjacency),
+            dtype=np.uint32,
+        )
+        return indptr, indices
+
+    def next_node_id(self) -> int:
+        """One more than the largest node ID, 1 for a topology without nodes."""
+        return 1 if self._max_id is None else self._max_id + 1
+
+    def has_edge(self, index1: int, index2: int) -> bool:
+        return self._edge_key(index1, index2) in self._edge_set()
+
+    def add_node(self, node_id: int) -> int:
+        """Append a node without neighbours and return its index."""
+        adjacency = self._mutable_adjacency()
+        index = len(self.node_ids)
+        try:
+            node_id = operator.index(node_id)
+        except TypeError:
+            pass
+        if self._first_id is not None and node_id != self._first_id + index:
+            self._index_of = dict(zip(self.node_ids.tolist(), range(index)))
+            self._first_id = None
+        if self._first_id is None:
+            if not self._index_of and isinstance(node_id, int):
+                self._first_id = node_id
+                self._index_of = None
+            else:
+                self._index_of[node_id] = index
+        self._max_id = node_id if self._max_id is None else max(self._max_id, node_id)
+        self.node_ids.append(node_id)
+        adjacency.append(array("I"))
+        return index
+
+    def add_edge(self, index1: int, index2: int):
+        """Connect two node indices, which must not be connected yet."""
+        adjacency = self._mutable_adjacency()
+        self._edge_set().add(self._edge_key(index1, index2))
+        adjacency[index1].append(index2)
+        adjacency[index2].append(index1)
+
+    def copy(self) -> "GraphTopology":
+        """An unfrozen copy that can be modified."""
+        indptr, indices = self.csr()
+        return GraphTopology.from_csr(
+            np.frombuffer(self.node_ids, dtype=np.int64), indptr, indices
+        )
+
+    def _mutable_adjacency(self) -> list[array]:
+        if self.frozen:
+            raise ValueError("A frozen topology cannot be modified.")
+        if self._adjacency is None:
+            indptr, indices = self._indptr, self._indices
+            self._adjacency = [
+                indices[indptr[index] : indptr[index + 1]]
+                for index in range(len(self.node_ids))
+            ]
+            self._indptr = self._indices = None
+        return self._adjacency
+
+    def _edge_set(self) -> set[int]:
+        """Keys of all edges, built on first use."""
+        if self._edges is None:
+            self._edges = {
+                self._edge_key(index, neighbor)
+                for index in range(len(self.node_ids))
+                for neighbor in self.neighbors(index)
+                if index < neighbor
+            }
+        return self._edges
+
+    @staticmethod
+    def _edge_key(index1: int, index2: int) -> int:
+        if index1 > index2:
+            index1, index2 = index2, index1
+        return index1 << 32 | index2
+
+
+class _AdjacencyView(Mapping):
+    """Read-only `dict[Node, list[Node]]` view of the adjacency lists of a Graph."""
+
+    def __init__(self, graph: "Graph"):
+        self._graph = graph
+
+    def __len__(self) -> int:
+        return len(self._graph.topology)
+
+    def __iter__(self) -> Iterator[Node]:
+        graph = self._graph
+        return (graph._node(index) for index in range(len(graph.topology)))
+
+    def __getitem__(self, node: Node) -> list[Node]:
+        graph = self._graph
+        if not isinstance(node, Node) or node._graph is not graph:
+            raise KeyError(node)
+        return [graph._node(index) for index in graph.topology.neighbors(node._index)]
+
+
+class _NodeIdView(Mapping):
+    """Read-only `dict[int, Node]` view mapping the node IDs of a Graph to its nodes."""
+
+    def __init__(self, graph: "Graph"):
+        self._graph = graph
+
+    def __len__(self) -> int:
+        return len(self._graph.topology)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._graph.topology.node_ids)
+
+    def __getitem__(self, node_id: int) -> Node:
+        return self._graph._node(self._graph.topology.index(node_id))
+
+
+class _NodeIdSet(Set):
+    """Read-only set of the node IDs of a Graph."""
+
+    def __init__(self, graph: "Graph"):
+        self._graph = graph
+
+    def __len__(self) -> int:
+        return len(self._graph.topology)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._graph.topology.node_ids)
+
+    def __contains__(self, node_id) -> bool:
+        return node_id in self._graph.topology
+
+
 class Graph:
     """
     Represents an undirected graph using an adjacency list representation.
 
+    The structure lives in a GraphTopology of integer node indices and the genotypes in a typed
+    array of codes into the interned genotype labels, indexed like the nodes. Node objects are
+    created only when accessed. Copies share both the topology, which is frozen, and the genotype
+    array: each graph records the genotypes it changes on top of the shared array until it has
+    changed enough of them to be better off with its own array. A copy therefore costs
+    O(changed nodes) instead of O(N + E), which makes keeping a snapshot of every generation cheap.
+
+    A graph never modifies state it shares with other graphs, the shared topology and genotypes
+    are copied before they are written to, so separate graphs and models can be used from separate
+    threads.
+
     Attributes:
-        generation_id: An identifier for the generation of the graph. Starts at 1 and increments with each new instance.
-        nodes: Adjacency list where keys are Node objects and values are lists of adjacent Node objects.
-        node_ids: Set containing the IDs of all nodes in the graph.
+        generation_id: An identifier for the generation of the graph. Starts at 1 for a new graph and
+        is one more than that of the graph it was copied from.
+        topology: The node IDs and adjacency lists, shared with the copies of the graph.
+        nodes: Adjacency list where keys are Node objects and values are lists of adjacent Node objects,
+        a read-only view whose Node objects are created when accessed.
+        node_ids: Set-like view of the IDs of all nodes in the graph.
         node_id_to_node: Maps node IDs to their respective Node objects.
-
-    Class Attributes:
-        _generation_id: Class-level variable to keep track of the generation_id for new instances.
+        genotype_valuecounts: Maps genotypes to the number of nodes carrying them.
     """
 
-    _generation_id: int = 1
-
     def __init__(self, nodes: list[Node], edges: list[tuple[int, int]]):
         """
         Initializes a new Graph object and constructs the adjacency list.
@@ -77,50 +370,125 @@ class Graph:
             edges = [(1, 2), (2, 3)]
             g = Graph(nodes, edges)
         """
-        self.generation_id = Graph._generation_id
-        self.nodes = {node: [] for node in nodes}  # adjacency list
-        self.node_ids = set()  # set to track used node IDs
-        self.node_id_to_node = {}  # dictionary to map node IDs to Node objects
-        self._genotype_valuecounts()
+        self.generation_id = 1
+        self.topology = GraphTopology()
+        # genotype labels interned to codes, possibly shared with copies of the graph
+        self._genotype_labels: list[str] = []
+        self._genotype_code_of: dict[str, int] = {}
+        self._owns_genotype_labels = True
+        # genotype code of each node index, possibly shared with copies of the graph, in which
+        # case changed codes are recorded in _changed_genotypes (itself possibly shared) instead
+        self._genotypes = array("I")
+        self._changed_genotypes: dict[int, int] = {}
+        self._owns_genotypes = True
+        self._owns_changed_genotypes = True
+        self._node_views: list[Node | None] | None = None
 
         for node in nodes:
             self.add_node(node)
+        self._genotype_valuecounts()
 
         for node_id1, node_id2 in edges:
             self.add_edge(node_id1, node_id2)
 
-        # reset the _next_id for each new graph instance
-        Node._reset_next_id()
+    @classmethod
+    def from_topology(
+        cls,
+        topology: GraphTopology,
+        genotypes: np.ndarray,
+        genotype_labels: list[str],
+        genotype_valuecounts: dict[str, int] | None = None,
+    ) -> Self:
+        """Build a graph on an existing topology, which is frozen so that other graphs can share it.
+
+        Parameters:
+            topology: The node IDs and adjacency lists.
+            genotypes: Genotype code of each node index.
+            genotype_labels: Genotype label of each genotype code.
+            genotype_valuecounts: Number of nodes of each genotype, counted from `genotypes` if None.
+        """
+        topology.frozen = True
+        return cls._from_arrays(
+            topology, genotypes, genotype_labels, genotype_valuecounts
+        )
 
     @classmethod
-    def reset_generation_id(cls):
-        cls._generation_id = 1
+    def _from_arrays(
+        cls,
+        topology: GraphTopology,
+        genotypes: np.ndarray,
+        genotype_labels: list[str],
+        genotype_valuecounts: dict[str, int] | None = None,
+    ) -> Self:
+        if len(genotypes) != len(topology):
+            raise ValueError("There must be one genotype per node.")
+
+        graph = cls([], [])
+        graph.topology = topology
+        graph._genotype_labels = list(genotype_labels)
+        graph._genotype_code_of = {
+            label: code for code, label in enumerate(genotype_labels)
+        }
+        graph._genotypes = array("I", np.asarray(genotypes, dtype=np.uint32).tobytes())
+        if genotype_valuecounts is None:
+            graph._genotype_valuecounts()
+        else:
+            graph.genotype_valuecounts = genotype_valuecounts
+        return graph
+
+    @property
+    def nodes(self) -> Mapping[Node, list[Node]]:
+        return _AdjacencyView(self)
+
+    @property
+    def node_ids(self) -> Set[int]:
+        return _NodeIdSet(self)
+
+    @property
+    def node_id_to_node(self) -> Mapping[int, Node]:
+        return _NodeIdView(self)
 
     def add_node(self, node: Node):
-        """Adds a node if not present and checks for unique node IDs."""
-        if node.node_id in self.node_ids:
+        """Adds a node if not present and checks for unique node IDs.
+
+        The node becomes a view of this graph. A node that is a view of another graph is rebound:
+        the other graph keeps its genotype and creates a new view for it when it is next accessed.
+        A node without an ID gets the next free ID of this graph.
+        """
+        if node.node_id is None:
+            node.node_id = self.topology.next_node_id()
+        if node.node_id in self.topology:
             raise ValueError(f"Node ID {node.node_id} already exists in graph.")
 
-        self.node_ids.add(node.node_id)
-        self.nodes[node] = []  # empty adjacency list
-        self.node_id_to_node[node.node_id] = node
+        code = self._genotype_code(node.genotype)
+        index = self._own_topology().add_node(node.node_id)
+        self._own_genotypes()
+        self._genotypes.append(code)
+        if self._node_views is not None:
+            self._node_views.append(None)
+        if node._graph is not None:
+            node._graph._node_views[node._index] = None
+        node._graph = self
+        node._index = index
+        self._node_views_list()[index] = node
 
     def add_edge(self, node_id1: int, node_id2: int):
-        """Adds an undirected edge between nodes identified by their IDs."""
+        """Adds an undirected edge between nodes identified by their IDs, in O(1)."""
         if node_id1 == node_id2:
             raise ValueError("Self-loops are not allowed.")
 
-        if not (node_id1 in self.node_ids and node_id2 in self.node_ids):
+        topology = self.topology
+        if not (node_id1 in topology and node_id2 in topology):
             raise NodeNotInGraphError(node_id1, node_id2)
 
-        node1 = self.node_id_to_node[node_id1]
-        node2 = self.node_id_to_node[node_id2]
+        index1 = topology.index(node_id1)
+        index2 = topology.index(node_id2)
 
-        if node_id1 in self.nodes[node2]:
+        topology = self._own_topology()
+        if topology.has_edge(index1, index2):
             raise ValueError(f"Edge between {node_id1} and {node_id2} already exists.")
 
-        self.nodes[node1].append(node2)
-        self.nodes[node2].append(node1)
+        topology.add_edge(index1, index2)
 
     @classmethod
     def generate_random_graph(
@@ -130,6 +498,7 @@ class Graph:
         edge_probability: float,
         is_complete: bool = True,
         max_attempts: int = 1000,
+        rng: SeedType = None,
     ) -> Self:
         """Generate a random graph based on the specified parameters.
 
@@ -142,6 +511,7 @@ class Graph:
             n_nodes: The number of nodes to create in the graph.
             n_genotypes: The number of possible genotypes to choose from when assigning genotypes to nodes.
             edge_probability: The probability of an edge existing between two nodes, ranging from 0 to 1.
+            rng: Seed or NumPy generator used to draw the genotypes and edges.
 
         Returns:
             Graph: A randomly generated Graph object with the specified parameters.
@@ -150,19 +520,15 @@ class Graph:
             # Generate a random graph with 10 nodes, 5 possible genotypes, and an edge probability of 0.3
             random_graph = Graph.generate_random_graph(10, 5, 0.3)
         """
+        rng = np.random.default_rng(rng)
+        genotype_labels = Graph._label_n_genotypes(n_genotypes)
+        node_ids = np.arange(1, n_nodes + 1)
         attempts = 0
         while attempts < max_attempts:
-            graph = cls([], [])
-            for _ in range(n_nodes):
-                node = Node(random.choice(Graph._label_n_genotypes(n_genotypes)))
-                graph.add_node(node)
-
-            for i in range(1, n_nodes + 1):
-                for j in range(i + 1, n_nodes + 1):
-                    if random.uniform(0, 1) <= edge_probability:
-                        graph.add_edge(i, j)
-
-            graph._genotype_valuecounts()
+            genotypes = rng.integers(n_genotypes, size=n_nodes)
+            sources, targets = Graph._random_edges(n_nodes, edge_probability, rng)
+            topology = GraphTopology.from_edges(node_ids, sources, targets)
+            graph = cls._from_arrays(topology, genotypes, genotype_labels)
             if not is_complete or graph.is_connected():
                 return graph
             attempts += 1
@@ -173,28 +539,109 @@ class Graph:
         )
 
     def copy(self):
-        """Create a deep copy of the graph."""
-        copied_graph = Graph([], [])
-        # increment generation id
-        Graph._generation_id += 1
-        copied_graph.generation_id = Graph._generation_id
-
-        copied_graph.nodes = {
-            node.copy(): [neighbor.copy() for neighbor in adj_list]
-            for node, adj_list in self.nodes.items()
-        }
-
-        copied_graph.node_ids = {node_id for node_id in self.node_ids}
+        """Create a snapshot of the graph that can be changed independently of it.
 
-        copied_graph.node_id_to_node = {
-            node.node_id: node for node in copied_graph.nodes.keys()
-        }
+        The copy shares the frozen topology and the genotypes with this graph, so it costs
+        O(changed nodes) rather than O(N + E). Whichever graph is changed afterwards records its
+        own changes, and only a structural change copies the topology.
+        """
+        self.topology.frozen = True
+        self._owns_genotypes = False
+        self._owns_changed_genotypes = False
+        self._owns_genotype_labels = False
 
-        copied_graph.genotype_valuecounts = {
-            genotype: count for genotype, count in self.genotype_valuecounts.items()
-        }
+        copied_graph = Graph([], [])
+        copied_graph.generation_id = self.generation_id + 1
+        copied_graph.topology = self.topology
+        copied_graph._genotype_labels = self._genotype_labels
+        copied_graph._genotype_code_of = self._genotype_code_of
+        copied_graph._owns_genotype_labels = False
+        copied_graph._genotypes = self._genotypes
+        copied_graph._changed_genotypes = self._changed_genotypes
+        copied_graph._owns_genotypes = False
+        copied_graph._owns_changed_genotypes = False
+        copied_graph.genotype_valuecounts = dict(self.genotype_valuecounts)
         return copied_graph
 
+    def _own_topology(self) -> GraphTopology:
+        """The topology of the graph, copied first if it is shared."""
+        if self.topology.frozen:
+            self.topology = self.topology.copy()
+        return self.topology
+
+    def _own_genotypes(self):
+        """Replace shared genotypes by an array owned by this graph."""
+        if self._owns_genotypes:
+            return
+        genotypes = array("I", self._genotypes)
+        for index, code in self._changed_genotypes.items():
+            genotypes[index] = code
+        self._genotypes = genotypes
+        self._changed_genotypes = {}
+        self._owns_genotypes = True
+        self._owns_changed_genotypes = True
+
+    def _genotype_codes(self) -> np.ndarray:
+        """Genotype code of each node index, see `_genotype_labels`."""
+        codes = np.frombuffer(self._genotypes, dtype=np.uint32).astype(np.int64)
+        if self._changed_genotypes:
+            changed = np.fromiter(self._changed_genotypes.items(), dtype=(np.int64, 2))
+            codes[changed[:, 0]] = changed[:, 1]
+        return codes
+
+    def _genotype_code(self, genotype: str) -> int:
+        """The code of a genotype label, interning labels not seen before."""
+        code = self._genotype_code_of.get(genotype)
+        if code is None:
+            if not self._owns_genotype_labels:
+                self._genotype_labels = list(self._genotype_labels)
+                self._genotype_code_of = dict(self._genotype_code_of)
+                self._owns_genotype_labels = True
+            code = self._genotype_code_of[genotype] = len(self._genotype_labels)
+            self._genotype_labels.append(genotype)
+        return code
+
+    def _genotype_of(self, index: int) -> str:
+        code = self._changed_genotypes.get(index)
+        if code is None:
+            code = self._genotypes[index]
+        return self._genotype_labels[code]
+
+    def _set_genotype(self, index: int, genotype: str):
+        code = self._genotype_code(genotype)
+        if self._owns_genotypes:
+            self._genotypes[index] = code
+            return
+
+        if not self._owns_changed_genotypes:
+            self._changed_genotypes = dict(self._changed_genotypes)
+            self._owns_changed_genotypes = True
+        self._changed_genotypes[index] = code
+        # copies and reads get slower with every change, past about sqrt(N) changes an own array
+        # is cheaper overall
+        n_changed = len(self._changed_genotypes)
+        if n_changed * n_changed > len(self._genotypes):
+            self._own_genotypes()
+
+    def _replace_genotype(self, index: int, genotype: str):
+        """Set the genotype of a node index and update the genotype counts."""
+        self._update_genotype_valuecounts(self._genotype_of(index), -1)
+        self._update_genotype_valuecounts(genotype, 1)
+        self._set_genotype(index, genotype)
+
+    def _node(self, index: int) -> Node:
+        """The Node of a node index, created on first access."""
+        node_views = self._node_views_list()
+        node = node_views[index]
+        if node is None:
+            node = node_views[index] = Node._view(self, index)
+        return node
+
+    def _node_views_list(self) -> list[Node | None]:
+        if self._node_views is None:
+            self._node_views = [None] * len(self.topology)
+        return self._node_views
+
     def _display_edge(self, node_id1: int, node_id2: int, indent=2):
         """Display information about a specific edge by the IDs of the connected nodes with indentation."""
         if node_id1 not in self.node_ids or node_id2 not in self.node_ids:
@@ -223,17 +670,30 @@ class Graph:
     def get_adjacent_nodes(self, node: Node) -> list[Node]:
         return self.nodes[node]
 
+    @property
+    def genotype_valuecounts(self) -> dict[str, int]:
+        return self._genotype_counts
+
+    @genotype_valuecounts.setter
+    def genotype_valuecounts(self, genotype_valuecounts: dict[str, int]):
+        self._genotype_counts = genotype_valuecounts
+        # number of genotypes with a positive count, kept up to date by
+        # _update_genotype_valuecounts so fixation can be checked in O(1)
+        self._n_alive_genotypes = sum(
+            1 for count in genotype_valuecounts.values() if count > 0
+        )
+
     def _genotype_valuecounts(self):
         """Used to initialise the count of each genotype for a Graph."""
-        genotype_valuecounts = {}
-        for node in self.nodes:
-            genotype = node.genotype
-            if genotype in genotype_valuecounts:
-                genotype_valuecounts[genotype] += 1
-            else:
-                genotype_valuecounts[genotype] = 1
-
-        self.genotype_valuecounts = genotype_valuecounts
+        codes, first_index, counts = np.unique(
+            self._genotype_codes(), return_index=True, return_counts=True
+        )
+        # in the order in which the genotypes first appear
+        order = np.argsort(first_index)
+        self.genotype_valuecounts = {
+            self._genotype_labels[code]: count
+            for code, count in zip(codes[order].tolist(), counts[order].tolist())
+        }
 
     def _update_genotype_valuecounts(self, genotype: str, count_change: int):
         """Update the genotype value count for a given genotype as the population evolves.
@@ -242,38 +702,86 @@ class Graph:
             genotype: The genotype to update the value count for.
             count_change: The change in count.
         """
-        if self.genotype_valuecounts[genotype] + count_change < 0:
+        # newly introduced genotypes start from a count of zero
+        count = self._genotype_counts.get(genotype, 0)
+        updated_count = count + count_change
+        if updated_count < 0:
             raise ValueError("Genotype count must be non-negative.")
 
-        if genotype in self.genotype_valuecounts.keys():
-            self.genotype_valuecounts[genotype] += count_change
-        else:  # for tracking newly introduced genotypes
-            self.genotype_valuecounts[genotype] = count_change
+        self._genotype_counts[genotype] = updated_count
+        if count == 0 and updated_count > 0:
+            self._n_alive_genotypes += 1
+        elif count > 0 and updated_count == 0:
+            self._n_alive_genotypes -= 1
+
+    @staticmethod
+    def _random_edges(
+        n_nodes: int, edge_probability: float, rng: np.random.Generator
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Node indices of the edges of a G(n, p) random graph, each pair with i < j.
+
+        The candidate pairs are numbered row by row of the upper triangle and the gaps between
+        consecutive edges are drawn from a geometric distribution, so memory and time are
+        O(N + E) rather than O(N^2).
+        """
+        n_pairs = n_nodes * (n_nodes - 1) // 2
+        edge_probability = min(edge_probability, 1.0)
+        if n_pairs == 0 or edge_probability <= 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+
+        chunks = []
+        position = -1
+        while position < n_pairs:
+            # enough gaps to usually cover the remaining pairs at once
+            size = int(edge_probability * (n_pairs - position)) + 1024
+            positions = position + np.cumsum(rng.geometric(edge_probability, size))
+            chunks.append(positions[positions < n_pairs])
+            position = int(positions[-1])
+        pairs = np.concatenate(chunks)
+
+        rows = np.arange(n_nodes, dtype=np.int64)
+        row_starts = rows * (2 * n_nodes - rows - 1) // 2
+        sources = np.searchsorted(row_starts, pairs, side="right") - 1
+        targets = pairs - row_starts[sources] + sources + 1
+        return sources, targets
 
     @staticmethod
     def _label_n_genotypes(n: int) -> list[str]:
-        """Returns a list ['A', 'B', ...,] to the n;ths letter."""
-        if n > 26:
-            raise ValueError("No support for n>26.")
+        """Returns a list ['A', 'B', ..., 'Z', 'AA', 'AB', ...] of n labels, like spreadsheet columns."""
         if n < 1:
             raise ValueError("At least one genotype is required.")
-        return list(string.ascii_uppercase[:n])
+        labels = []
+        for i in range(n):
+            label = ""
+            i += 1
+            while i:
+                i, remainder = divmod(i - 1, 26)
+                label = string.ascii_uppercase[remainder] + label
+            labels.append(label)
+        return labels
 
     def is_connected(self) -> bool:
-        """Depth First Search (DFS) algorithm to check if a Graph is connected."""
-        visited_nodes = set()
-        start_node_id = next(iter(self.nodes.keys())).node_id
-        stack = [start_node_id]
-        while stack:
-            current_node_id = stack.pop()
-            visited_nodes.add(current_node_id)
-
-            for adj_node in self.nodes[self.node_id_to_node[current_node_id]]:
-                adj_node_id = adj_node.node_id
-                if adj_node_id not in visited_nodes:
-                    stack.append(adj_node_id)
-
-        return len(visited_nodes) == len(self.nodes)
+        """Whether every node can be reached from every other node, from the CSR arrays."""
+        n_nodes = len(self.topology)
+        if not n_nodes:
+            return True
+        indptr, indices = self.topology.csr()
+        adjacency = sparse.csr_array(
+            (np.ones(len(indices), dtype=np.int8), indices, indptr),
+            shape=(n_nodes, n_nodes),
+        )
+        return connected_components(adjacency, directed=False, return_labels=False) == 1
+
+    def is_complete(self) -> bool:
+        """Whether every node is adjacent to every other node."""
+        n_nodes = len(self.topology)
+        indptr, indices = self.topology.csr()
+        if not (np.diff(indptr) == n_nodes - 1).all():
+            return False
+        rows = np.repeat(np.arange(n_nodes, dtype=np.int64), np.diff(indptr))
+        edges = rows * n_nodes + indices
+        return bool((rows != indices).all()) and len(np.unique(edges)) == len(edges)
 
     def _genotype_has_fixated(self) -> bool:
-        return len([n for n in self.genotype_valuecounts.values() if n > 0]) == 1
+        return self._n_alive_genotypes == 1
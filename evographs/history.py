@@ -0,0 +1,297 @@
+from evographs.compiled import CompiledGraph, CompleteTopology
+from evographs.graph import Graph
+from array import array
+from collections.abc import Iterator, Sequence
+import numpy as np
+
+
+def _smallest_typecode(max_value: int) -> str:
+    """The smallest unsigned array typecode that can hold `max_value`."""
+    for typecode in ("B", "H", "I"):
+        if max_value < 1 << (8 * array(typecode).itemsize):
+            return typecode
+    return "Q"
+
+
+class EventLog:
+    """
+    Append-only log of the replacements carried out in a simulation.
+
+    Instead of storing a copy of the population for every generation, the initial genotypes are
+    stored once together with one row per replacement that changed a genotype. Each column is a
+    typed array, so an event costs a handful of bytes. Every `keyframe_interval` events a full copy
+    of the state is stored as a keyframe, so the state at any generation is reconstructed from the
+    closest keyframe before it in O(N + keyframe_interval) instead of replaying the whole log.
+
+    Attributes:
+        initial_genotypes: Genotype codes of the nodes at generation 0.
+        steps: Generation in which each event happened, the event turns that generation into the next.
+        parents: Index of the reproducing node of each event.
+        replaced: Index of the replaced node of each event.
+        old_genotypes: Genotype code of the replaced node before each event.
+        new_genotypes: Genotype code of the replaced node after each event.
+        keyframe_interval: Number of events between two keyframes, defaults to the number of nodes
+        (but at least 1024) so keyframes take about as much memory as the events themselves.
+        keyframes: State after every `keyframe_interval` events, the first one is the initial state.
+        n_genotypes: Number of genotype codes.
+        times: Time at which each event happened, for continuous-time simulations, otherwise None.
+    """
+
+    def __init__(
+        self,
+        initial_genotypes: np.ndarray,
+        n_genotypes: int,
+        keyframe_interval: int | None = None,
+        record_times: bool = False,
+    ):
+        if keyframe_interval is None:
+            keyframe_interval = max(1024, len(initial_genotypes))
+        if keyframe_interval < 1:
+            raise ValueError("Keyframe interval must be positive.")
+
+        self.initial_genotypes = initial_genotypes.copy()
+        self.n_genotypes = n_genotypes
+        self.keyframe_interval = keyframe_interval
+        self.keyframes = [self.initial_genotypes]
+        node_typecode = _smallest_typecode(max(len(initial_genotypes) - 1, 0))
+        genotype_typecode = _smallest_typecode(max(n_genotypes - 1, 0))
+        self.steps = array("Q")
+        self.parents = array(node_typecode)
+        self.replaced = array(node_typecode)
+        self.old_genotypes = array(genotype_typecode)
+        self.new_genotypes = array(genotype_typecode)
+        self.times = array("d") if record_times else None
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+    @property
+    def columns(self) -> dict[str, array]:
+        """The per-event columns by name, including the times if they are recorded."""
+        columns = {
+            "steps": self.steps,
+            "parents": self.parents,
+            "replaced": self.replaced,
+            "old_genotypes": self.old_genotypes,
+            "new_genotypes": self.new_genotypes,
+        }
+        if self.times is not None:
+            columns["times"] = self.times
+        return columns
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the initial state and the logged events."""
+        return sum(keyframe.nbytes for keyframe in self.keyframes) + sum(
+            column.itemsize * len(column) for column in self.columns.values()
+        )
+
+    def append(
+        self,
+        step: int,
+        parent: int,
+        replaced: int,
+        old_genotype: int,
+        new_genotype: int,
+        time: float | None = None,
+    ):
+        """Record that in generation `step` the node `parent` replaced the node `replaced`."""
+        if self.times is not None:
+            if time is None:
+                raise ValueError("This log records event times, `time` is required.")
+            self.times.append(time)
+        self.steps.append(step)
+        self.parents.append(parent)
+        self.replaced.append(replaced)
+        self.old_genotypes.append(old_genotype)
+        self.new_genotypes.append(new_genotype)
+
+        if len(self.steps) % self.keyframe_interval == 0:
+            self.keyframes.append(
+                self._replay(
+                    self.keyframes[-1],
+                    len(self.steps) - self.keyframe_interval,
+                    len(self.steps),
+                )
+            )
+
+    def extend(self, **columns: np.ndarray):
+        """Append many events at once, given as one array per column (see `columns`).
+
+        Produces the same log, keyframes included, as appending the events one by one.
+        """
+        own_columns = self.columns
+        if columns.keys() != own_columns.keys():
+            raise ValueError(f"Expected the columns {list(own_columns)}.")
+        if len({len(values) for values in columns.values()}) > 1:
+            raise ValueError("All columns must have the same length.")
+
+        for name, column in own_columns.items():
+            column.frombytes(
+                np.ascontiguousarray(columns[name], dtype=column.typecode).tobytes()
+            )
+        while len(self.keyframes) * self.keyframe_interval <= len(self.steps):
+            stop = len(self.keyframes) * self.keyframe_interval
+            self.keyframes.append(
+                self._replay(self.keyframes[-1], stop - self.keyframe_interval, stop)
+            )
+
+    def n_events_before(self, generation: int) -> int:
+        """The number of events that happened before `generation`."""
+        return int(
+            np.searchsorted(np.frombuffer(self.steps, dtype=np.uint64), generation)
+        )
+
+    def genotypes_at(self, generation: int) -> np.ndarray:
+        """Reconstruct the genotype codes of the nodes at a generation."""
+        if generation < 0:
+            raise IndexError("Generation must be non-negative.")
+        return self.genotypes_after(self.n_events_before(generation))
+
+    def genotype_counts_at(self, generation: int) -> np.ndarray:
+        """Number of nodes of each genotype code at a generation, without rebuilding the nodes.
+
+        Starts from the counts of the closest keyframe and adds the count changes of the events
+        since, so it costs O(N + keyframe_interval) independent of the topology.
+        """
+        if generation < 0:
+            raise IndexError("Generation must be non-negative.")
+        n_events = self.n_events_before(generation)
+        keyframe = min(n_events // self.keyframe_interval, len(self.keyframes) - 1)
+        start = keyframe * self.keyframe_interval
+        old_genotypes = np.frombuffer(
+            self.old_genotypes, dtype=self.old_genotypes.typecode
+        )[start:n_events]
+        new_genotypes = np.frombuffer(
+            self.new_genotypes, dtype=self.new_genotypes.typecode
+        )[start:n_events]
+        n_genotypes = self.n_genotypes
+        return (
+            np.bincount(self.keyframes[keyframe], minlength=n_genotypes)
+            + np.bincount(new_genotypes, minlength=n_genotypes)
+            - np.bincount(old_genotypes, minlength=n_genotypes)
+        )
+
+    def genotypes_after(self, n_events: int) -> np.ndarray:
+        """Reconstruct the genotype codes of the nodes after the first `n_events` events."""
+        keyframe = min(n_events // self.keyframe_interval, len(self.keyframes) - 1)
+        return self._replay(
+            self.keyframes[keyframe], keyframe * self.keyframe_interval, n_events
+        )
+
+    def _replay(self, genotypes: np.ndarray, start: int, stop: int) -> np.ndarray:
+        """Apply the events in [start, stop) to a copy of `genotypes`."""
+        genotypes = genotypes.copy()
+        if start >= stop:
+            return genotypes
+
+        # a node may be replaced several times, only its last replacement counts
+        replaced = np.frombuffer(self.replaced, dtype=self.replaced.typecode)[
+            start:stop
+        ][::-1]
+        new_genotypes = np.frombuffer(
+            self.new_genotypes, dtype=self.new_genotypes.typecode
+        )[start:stop][::-1]
+        nodes, last = np.unique(replaced, return_index=True)
+        genotypes[nodes] = new_genotypes[last]
+        return genotypes
+
+
+class PopulationHistory(Sequence):
+    """
+    Lazy, read-only sequence of the population at each generation of a simulation.
+
+    Behaves like the list of Graph objects that used to be stored per generation: it supports
+    `len()`, indexing (including negative indices and slices) and iteration. Graph objects are only
+    built from the event log when accessed, all of them sharing one frozen GraphTopology. Random
+    access starts from the closest keyframe of the log, while iterating, in either direction,
+    copies the previous Graph and applies or undoes the events of one generation on the copy, so
+    each further generation costs O(changed nodes) rather than O(N + E).
+
+    Attributes:
+        log: The event log of the simulation.
+        graph: The compiled topology of the population.
+    """
+
+    def __init__(
+        self,
+        log: EventLog,
+        graph: CompiledGraph | CompleteTopology,
+        n_generations: int,
+    ):
+        self.log = log
+        self.graph = graph
+        self._n_generations = n_generations
+
+    def __len__(self) -> int:
+        return self._n_generations
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        return self.graph.to_graph(self.log.genotypes_at(self._check_index(index)))
+
+    def genotype_counts(self, index: int) -> dict[str, int]:
+        """Number of nodes of each genotype at a generation, without building a Graph.
+
+        This is the cheap way to follow a well-mixed population, whose Graph takes O(N^2) to build.
+        """
+        counts = self.log.genotype_counts_at(self._check_index(index))
+        return dict(zip(self.graph.genotype_labels, counts.tolist()))
+
+    def __iter__(self) -> Iterator[Graph]:
+        return self.replay()
+
+    def __reversed__(self) -> Iterator[Graph]:
+        return self.replay(len(self) - 1, reverse=True)
+
+    def replay(self, start: int = 0, reverse: bool = False) -> Iterator[Graph]:
+        """Iterate over the generations from `start`, forwards or backwards.
+
+        The state at `start` is looked up through the keyframes, after which each step copies the
+        previous Graph and only applies (or, when scrubbing backwards, undoes) the events of a
+        single generation. The yielded graphs are independent snapshots.
+
+        Parameters:
+            start: The first generation to yield, negative values count from the end.
+            reverse: Whether to move towards generation 0 instead of towards the last generation.
+        """
+        if not len(self):
+            return
+
+        log = self.log
+        labels = self.graph.genotype_labels
+        generation = self._check_index(start)
+        event = log.n_events_before(generation)
+        graph = self.graph.to_graph(log.genotypes_after(event))
+        while True:
+            yield graph
+
+            if reverse:
+                if generation == 0:
+                    return
+                generation -= 1
+                graph = graph.copy()
+                while event > 0 and log.steps[event - 1] >= generation:
+                    event -= 1
+                    graph._replace_genotype(
+                        log.replaced[event], labels[log.old_genotypes[event]]
+                    )
+            else:
+                if generation == len(self) - 1:
+                    return
+                generation += 1
+                graph = graph.copy()
+                while event < len(log) and log.steps[event] < generation:
+                    graph._replace_genotype(
+                        log.replaced[event], labels[log.new_genotypes[event]]
+                    )
+                    event += 1
+
+    def _check_index(self, index: int) -> int:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Generation index out of range.")
+        return index
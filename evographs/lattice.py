@@ -0,0 +1,193 @@
+from evographs.compiled import _graph_from_codes, _smallest_uint_dtype
+from evographs.graph import Graph, GraphTopology
+from evographs.rng import SeedType
+from scipy import sparse
+import numpy as np
+
+LATTICE_KINDS = ("square", "triangular", "hexagonal")
+
+# (row, column) offsets of the neighbours on each kind of lattice, in a hexagonal (honeycomb)
+# lattice the vertical neighbour lies above or below depending on the parity of row + column
+_OFFSETS = {
+    "square": [(-1, 0), (1, 0), (0, -1), (0, 1)],
+    "triangular": [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (1, 1)],
+    "hexagonal": [(0, -1), (0, 1), None],
+}
+
+
+class Lattice:
+    """
+    Regular two-dimensional lattice whose neighbours are computed from the node index.
+
+    Node i sits in row `i // n_cols` and column `i % n_cols`. A square lattice connects each node
+    to the 4 nodes above, below, left and right of it, a triangular lattice additionally to its
+    upper-left and lower-right diagonal neighbours (6 in total, a sheared triangular grid) and a
+    hexagonal (honeycomb) lattice to its left and right neighbour and to the node above or below it
+    depending on the parity of row + column (3 in total, a brick-wall layout). Periodic lattices
+    wrap around at the edges and form a torus, bounded lattices leave the edge nodes with fewer
+    neighbours. Nothing but the genotypes is stored per node, so lattices far too large for
+    adjacency lists can be simulated.
+
+    Attributes:
+        n_rows: Number of rows.
+        n_cols: Number of columns.
+        kind: "square", "triangular" or "hexagonal".
+        periodic: Whether the lattice wraps around at its edges.
+        genotypes: Genotype code of each node.
+        genotype_labels: Genotype label of each genotype code.
+    """
+
+    def __init__(
+        self,
+        n_rows: int,
+        n_cols: int,
+        genotypes: np.ndarray,
+        genotype_labels: list[str],
+        kind: str = "square",
+        periodic: bool = True,
+    ):
+        if kind not in LATTICE_KINDS:
+            raise ValueError(
+                f"Invalid lattice kind {kind!r}. Use one of {LATTICE_KINDS}."
+            )
+        if n_rows < 1 or n_cols < 1:
+            raise ValueError("A lattice needs at least one row and one column.")
+        if periodic and (n_rows < 3 or n_cols < 3):
+            # smaller tori would connect nodes to themselves or twice to the same node
+            raise ValueError("A periodic lattice needs at least 3 rows and columns.")
+        if periodic and kind == "hexagonal" and (n_rows % 2 or n_cols % 2):
+            raise ValueError("A periodic hexagonal lattice needs even dimensions.")
+        if len(genotypes) != n_rows * n_cols:
+            raise ValueError("There must be one genotype per lattice node.")
+
+        self.n_rows = n_rows
+        self.n_cols = n_cols
+        self.kind = kind
+        self.periodic = periodic
+        self.genotypes = genotypes
+        self.genotype_labels = genotype_labels
+        self._cached_topology = None
+
+    @classmethod
+    def generate_random_lattice(
+        cls,
+        n_rows: int,
+        n_cols: int,
+        n_genotypes: int,
+        kind: str = "square",
+        periodic: bool = True,
+        rng: SeedType = None,
+    ) -> "Lattice":
+        """Generate a lattice whose nodes are assigned uniformly random genotypes.
+
+        Parameters:
+            n_rows: Number of rows.
+            n_cols: Number of columns.
+            n_genotypes: Number of possible genotypes, labelled like `Graph.generate_random_graph`.
+            kind: "square", "triangular" or "hexagonal".
+            periodic: Whether the lattice wraps around at its edges.
+            rng: Seed or NumPy generator used to draw the genotypes.
+        """
+        rng = np.random.default_rng(rng)
+        genotype_labels = Graph._label_n_genotypes(n_genotypes)
+        genotypes = rng.integers(
+            n_genotypes,
+            size=n_rows * n_cols,
+            dtype=_smallest_uint_dtype(n_genotypes - 1),
+        )
+        return cls(n_rows, n_cols, genotypes, genotype_labels, kind, periodic)
+
+    @property
+    def n_nodes(self) -> int:
+        return self.n_rows * self.n_cols
+
+    @property
+    def node_ids(self) -> np.ndarray:
+        """Node IDs, numbered from 1 in row-major order."""
+        return np.arange(1, self.n_nodes + 1, dtype=np.int64)
+
+    @property
+    def degrees(self) -> np.ndarray:
+        degrees = np.zeros((self.n_rows, self.n_cols), dtype=np.int64)
+        for _, is_valid in self._directions():
+            degrees += is_valid
+        return degrees.ravel()
+
+    def neighbors(self, index: int) -> np.ndarray:
+        row, col = divmod(index, self.n_cols)
+        neighbors = []
+        for offset in _OFFSETS[self.kind]:
+            d_row, d_col = offset if offset else (1 if (row + col) % 2 == 0 else -1, 0)
+            neighbor_row, neighbor_col = row + d_row, col + d_col
+            if self.periodic:
+                neighbor_row %= self.n_rows
+                neighbor_col %= self.n_cols
+            elif not (
+                0 <= neighbor_row < self.n_rows and 0 <= neighbor_col < self.n_cols
+            ):
+                continue
+            neighbors.append(neighbor_row * self.n_cols + neighbor_col)
+        return np.array(neighbors, dtype=np.int64)
+
+    def neighbor_pairs(self):
+        """Yield all (node, neighbour) index pairs in chunks of two arrays, one per direction.
+
+        Only one direction is held in memory at a time, so no adjacency is ever materialised.
+        """
+        for neighbor_index, is_valid in self._directions():
+            nodes = np.flatnonzero(is_valid)
+            yield nodes, neighbor_index.ravel()[nodes]
+
+    @property
+    def adjacency(self) -> sparse.csr_array:
+        """N x N sparse adjacency matrix, built on every access in O(edges) memory."""
+        rows, cols = zip(*self.neighbor_pairs())
+        rows, cols = np.concatenate(rows), np.concatenate(cols)
+        return sparse.csr_array(
+            (np.ones(len(rows), dtype=np.int32), (rows, cols)),
+            shape=(self.n_nodes, self.n_nodes),
+        )
+
+    def to_graph(self, genotypes: np.ndarray | None = None) -> Graph:
+        """Build a Graph with this topology, sharing one frozen GraphTopology between all calls.
+
+        Parameters:
+            genotypes: Genotype codes of the nodes, defaults to the stored genotypes.
+        """
+        if genotypes is None:
+            genotypes = self.genotypes
+
+        if self._cached_topology is None:
+            adjacency = self.adjacency
+            self._cached_topology = GraphTopology.from_csr(
+                self.node_ids, adjacency.indptr, adjacency.indices
+            )
+        return _graph_from_codes(self._cached_topology, genotypes, self.genotype_labels)
+
+    def _directions(self):
+        """Yield, per neighbour direction, the neighbour index of each node and whether it exists.
+
+        Both are n_rows x n_cols arrays, the neighbour index of a missing neighbour is arbitrary.
+        """
+        rows = np.arange(self.n_rows)[:, None]
+        cols = np.arange(self.n_cols)[None, :]
+        for offset in _OFFSETS[self.kind]:
+            if offset:
+                neighbor_rows, neighbor_cols = rows + offset[0], cols + offset[1]
+            else:
+                neighbor_rows = rows + np.where((rows + cols) % 2 == 0, 1, -1)
+                neighbor_cols = cols
+            is_valid = (
+                (0 <= neighbor_rows)
+                & (neighbor_rows < self.n_rows)
+                & (0 <= neighbor_cols)
+                & (neighbor_cols < self.n_cols)
+            )
+            if self.periodic:
+                is_valid = np.ones_like(is_valid)
+            neighbor_index = (neighbor_rows % self.n_rows) * self.n_cols + (
+                neighbor_cols % self.n_cols
+            )
+            yield np.broadcast_to(neighbor_index, (self.n_rows, self.n_cols)), (
+                np.broadcast_to(is_valid, (self.n_rows, self.n_cols))
+            )
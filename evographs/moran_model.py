@@ -1,8 +1,36 @@
+from evographs.checkpoint import Checkpointer, load_checkpoint
 from evographs.graph import Graph
-import random
-from collections import Counter
+from evographs.compiled import (
+    CompiledGraph,
+    CompleteTopology,
+    align_genotype_codes,
+    compile_payoff_matrix,
+)
+from evographs.engine import (
+    UPDATE_RULES,
+    ActiveInterfaceEngine,
+    ContinuousTimeEngine,
+    MoranEngine,
+    WellMixedEngine,
+)
+from evographs.fitness import (
+    CompiledPayoffType,
+    PayoffMatrixType,
+    genotype_payoffs,
+    population_payoffs,
+    well_mixed_payoffs,
+)
+from evographs.history import EventLog, PopulationHistory
+from evographs.lattice import Lattice
+from evographs.results import SimulationResult, StopReason
+from evographs.rng import SeedType, UniformBuffer
+from bisect import bisect
+from itertools import accumulate
+import math
+import time
+import numpy as np
 
-PayoffMatrixType = dict[str, dict[str, float]]
+ENGINES = ("naive", "incremental", "rejection_free", "continuous", "well_mixed", "auto")
 
 
 class MoranModel:
@@ -11,118 +39,474 @@ class MoranModel:
 
     Attributes:
         generation: The current generation number.
-        graph: The initial population graph representing individuals in a structured population with
+        graph: The current population graph representing individuals in a structured population with
         different strategies.
         payoff_matrix: A dictionary representing the payoff matrix for interactions between strategies.
+        For many genotypes it may instead be indexed by genotype codes (the positions of the sorted
+        genotype labels), as a G x G array or a PayoffFunction such as a LowRankPayoff or a
+        CallablePayoff. Code i of such a matrix is the genotype `genotype_labels[i]`.
+        genotype_labels: Genotype label of each code of a payoff matrix indexed by codes. Defaults to
+        the labels Graph.generate_random_graph gives G genotypes ("A", ..., "Z", "AA", ...), which
+        need not all be present in the population.
         selection_intensity: The selection intensity parameter that influences the extent to which
         fitness leads the reproduction process.
-        population_history: A list of Graph objects representing the state of the population at each
-        generation.
+        history: An EventLog holding the initial population and every replacement since, including
+        the event times for the continuous engine.
+        result: A SimulationResult describing why and in which state the last call to
+        `run_simulation` stopped, None before the first call.
+        population_history: A lazy sequence of Graph objects representing the state of the population
+        at each generation, reconstructed from `history` when accessed.
+        engine: How fitness is evaluated. "naive" recomputes the fitness of every node for every event,
+        "incremental" compiles the graph to arrays and runs a MoranEngine, which maintains per-node
+        fitness and only updates the nodes affected by a replacement. "rejection_free" runs an
+        ActiveInterfaceEngine, which only samples replacements that change a genotype and skips the
+        null events in between with a geometrically distributed jump of the generation counter.
+        "continuous" runs a ContinuousTimeEngine in which every node reproduces at a rate equal to its
+        fitness, each generation being one reproduction event at an exponentially distributed time.
+        "well_mixed" runs a WellMixedEngine on a complete graph, which draws events from the genotype
+        counts in O(G) without storing adjacency. "auto" picks "well_mixed" for complete graphs and
+        "incremental" otherwise. Instead of a Graph the model also accepts a Lattice, whose
+        neighbours are computed arithmetically, for every engine but "naive" and "well_mixed".
+        sampler: How the incremental engine draws nodes, "tree" for an exact sum tree or "rejection"
+        for O(1) rejection sampling under weak selection that falls back to the tree when too many
+        draws are rejected.
+        update_rule: Who replaces whom, one of UPDATE_RULES. "birth_death" (the default) runs on every
+        engine. "death_birth", "imitation" and the "fermi" pairwise comparison pick the updated node
+        uniformly and run on the incremental engine, which "auto" then always selects. All rules
+        record their events in the same `history` and report the same `result`.
+        fermi_beta: Inverse temperature of the "fermi" update rule.
+        keyframe_interval: Number of logged events between two full copies of the state in `history`,
+        which bounds the cost of jumping to an arbitrary generation.
+        rng: Seed or NumPy generator for all randomness of the model, including a default payoff
+        matrix. The engines draw their uniforms from it in blocks through a UniformBuffer.
     """
 
     def __init__(
         self,
-        graph: Graph,
-        payoff_matrix: PayoffMatrixType | None = None,
+        graph: Graph | CompleteTopology | Lattice,
+        payoff_matrix: PayoffMatrixType | CompiledPayoffType | None = None,
         selection_intensity: float = 0.5,
+        engine: str = "naive",
+        sampler: str = "tree",
+        keyframe_interval: int | None = None,
+        rng: SeedType = None,
+        update_rule: str = "birth_death",
+        fermi_beta: float = 1.0,
+        genotype_labels: list[str] | None = None,
     ):
-        self.graph = graph
-        self.payoff_matrix = (
-            payoff_matrix
-            if payoff_matrix
-            else self._generate_random_payoff_matrix(graph)
-        )
+        if engine not in ENGINES:
+            raise ValueError(f"Invalid engine {engine!r}. Use one of {ENGINES}.")
+        if update_rule not in UPDATE_RULES:
+            raise ValueError(
+                f"Invalid update rule {update_rule!r}. Use one of {UPDATE_RULES}."
+            )
+        if update_rule != "birth_death":
+            if engine == "auto":
+                engine = "incremental"
+            if engine != "incremental":
+                raise ValueError(
+                    f"The {update_rule} update rule requires the incremental engine."
+                )
+        if isinstance(graph, Graph):
+            is_complete = graph.is_complete()
+        else:
+            is_complete = isinstance(graph, CompleteTopology)
+        if engine == "auto":
+            engine = (
+                "well_mixed" if is_complete and sampler == "tree" else "incremental"
+            )
+        if (
+            engine in ("rejection_free", "continuous", "well_mixed")
+            and sampler != "tree"
+        ):
+            raise ValueError(f"The {engine} engine only supports the tree sampler.")
+        if engine == "well_mixed" and not is_complete:
+            raise ValueError("The well_mixed engine requires a complete graph.")
+        if isinstance(graph, CompleteTopology) and engine != "well_mixed":
+            raise ValueError(
+                "A CompleteTopology can only run on the well_mixed engine."
+            )
+        if isinstance(graph, Lattice) and engine == "naive":
+            raise ValueError("The naive engine requires a Graph.")
+
+        self._rng = np.random.default_rng(rng)
+        if payoff_matrix is None or (
+            isinstance(payoff_matrix, dict) and not payoff_matrix
+        ):
+            payoff_matrix = self._generate_random_payoff_matrix(graph, self._rng)
+        self.payoff_matrix = payoff_matrix
         self.selection_intensity = selection_intensity
-        self.population_history = []
+        self.engine = engine
+        self.update_rule = update_rule
+        self.generation = 0
+        self.result: SimulationResult | None = None
+        self._n_recorded_generations = 0
+
+        if not isinstance(graph, Graph):
+            self._compiled_graph = graph
+        elif engine == "well_mixed":
+            self._compiled_graph = CompleteTopology.from_graph(graph)
+        else:
+            self._compiled_graph = CompiledGraph.from_graph(graph)
+        self._compiled_graph = align_genotype_codes(
+            self._compiled_graph, self.payoff_matrix, genotype_labels
+        )
+        self._genotype_code_of = {
+            label: code
+            for code, label in enumerate(self._compiled_graph.genotype_labels)
+        }
+        self.history = EventLog(
+            self._compiled_graph.genotypes,
+            len(self._compiled_graph.genotype_labels),
+            keyframe_interval,
+            record_times=engine == "continuous",
+        )
+
+        # validated here so a missing entry fails now instead of in the middle of a run
+        self._compiled_payoff_matrix = compile_payoff_matrix(
+            self.payoff_matrix, self._compiled_graph.genotype_labels
+        )
+
+        self._engine = None
+        self._graph = None
+        self._uniforms = UniformBuffer(self._rng)
+        if engine == "naive":
+            # the naive engine evolves its own copy so the given graph stays the initial state
+            self._graph = graph.copy()
+            self._index_of = {
+                node_id: index
+                for index, node_id in enumerate(self._compiled_graph.node_ids.tolist())
+            }
+        else:
+            compiled_payoff_matrix = self._compiled_payoff_matrix
+            if engine == "rejection_free":
+                self._engine = ActiveInterfaceEngine(
+                    self._compiled_graph,
+                    compiled_payoff_matrix,
+                    selection_intensity,
+                    self._uniforms,
+                )
+            elif engine == "well_mixed":
+                self._engine = WellMixedEngine(
+                    self._compiled_graph,
+                    compiled_payoff_matrix,
+                    selection_intensity,
+                    self._uniforms,
+                )
+            elif engine == "continuous":
+                self._engine = ContinuousTimeEngine(
+                    self._compiled_graph,
+                    compiled_payoff_matrix,
+                    selection_intensity,
+                    self._uniforms,
+                )
+            else:
+                self._engine = MoranEngine(
+                    self._compiled_graph,
+                    compiled_payoff_matrix,
+                    selection_intensity,
+                    sampler,
+                    self._uniforms,
+                    update_rule,
+                    fermi_beta,
+                )
+
+    @property
+    def graph(self) -> Graph:
+        if self._engine is not None:
+            return self._engine.to_graph()
+        return self._graph
 
-    def run_simulation(self, num_generations: int = 1_000_000):
+    @property
+    def time(self) -> float | None:
+        """The time of the last event for the continuous engine, otherwise None."""
+        return getattr(self._engine, "time", None)
+
+    @property
+    def population_history(self) -> PopulationHistory:
+        return PopulationHistory(
+            self.history, self._compiled_graph, self._n_recorded_generations
+        )
+
+    def get_generation(self, generation: int) -> Graph:
+        """Reconstruct the population at a generation from the event log."""
+        return self._compiled_graph.to_graph(self.history.genotypes_at(generation))
+
+    def run_simulation(
+        self,
+        num_generations: int = 1_000_000,
+        checkpoint: Checkpointer | None = None,
+        max_events: int | None = None,
+        max_wall_time: float | None = None,
+        max_history_bytes: int | None = None,
+        budget_check_interval: int = 1024,
+    ):
         """Simulate selected number of generations ahead.
         If `num_generations` is not specified then run until simulation is finished.
+
+        The run can further be bounded by budgets. When one is used up the run stops gracefully,
+        with the state, history and `result` of the generation it got to, and the budget as the
+        `result.stop_reason`. A stopped run can be continued with another call. The wall time and
+        history budgets are checked every `budget_check_interval` events, so they are overrun by at
+        most that many events. None of this changes the course of the simulation.
+
+        With a `checkpoint`, the state is saved every `checkpoint.interval` events and once more
+        when the run stops, and the run can be continued with `MoranModel.resume`.
+
+        Parameters:
+            num_generations: Number of generations to simulate.
+            checkpoint: Where and how often to save the state, None to not checkpoint.
+            max_events: Maximum number of events (see `step`) carried out by this call, stopping
+            with StopReason.MAX_EVENTS.
+            max_wall_time: Maximum number of seconds this call runs for, stopping with
+            StopReason.MAX_WALL_TIME.
+            max_history_bytes: Maximum size of the event log in bytes (see `EventLog.nbytes`),
+            stopping with StopReason.MAX_HISTORY_BYTES.
+            budget_check_interval: Number of events between two checks of the wall time and
+            history budgets.
         """
-        for _ in range(num_generations):
-            current_population = self.graph
-            self.population_history.append(current_population)
+        if budget_check_interval < 1:
+            raise ValueError("Budget check interval must be positive.")
+        if checkpoint is not None:
+            checkpoint.attach(self)
+
+        end = self.generation + num_generations
+        remaining_events = math.inf if max_events is None else max_events
+        deadline = (
+            math.inf if max_wall_time is None else time.monotonic() + max_wall_time
+        )
+        check_budgets = max_wall_time is not None or max_history_bytes is not None
+        n_uncheckpointed = 0
+        while True:
+            n_events = remaining_events
+            if check_budgets:
+                n_events = min(n_events, budget_check_interval)
+            if checkpoint is not None:
+                n_events = min(n_events, checkpoint.interval - n_uncheckpointed)
+
+            self._run(end - self.generation, n_events)
+            # anything but MAX_EVENTS means the run ended before using up this chunk
+            if self.result.stop_reason is not StopReason.MAX_EVENTS:
+                break
+            remaining_events -= n_events
+            n_uncheckpointed += n_events
+            if remaining_events <= 0:
+                break
+            if time.monotonic() >= deadline:
+                self.result = self._simulation_result(StopReason.MAX_WALL_TIME)
+                break
+            if (
+                max_history_bytes is not None
+                and self.history.nbytes > max_history_bytes
+            ):
+                self.result = self._simulation_result(StopReason.MAX_HISTORY_BYTES)
+                break
+            if checkpoint is not None and n_uncheckpointed >= checkpoint.interval:
+                checkpoint.save(self)
+                n_uncheckpointed = 0
+
+        if checkpoint is not None:
+            checkpoint.save(self)
+            checkpoint.wait()
+        return self
+
+    @classmethod
+    def resume(cls, path: str) -> "MoranModel":
+        """Restore a model from a checkpoint written by `run_simulation`.
+
+        The restored model continues exactly as the checkpointed run would have, including its
+        random stream, and its history covers the generations before the checkpoint.
+        """
+        model = load_checkpoint(path)
+        if not isinstance(model, cls):
+            raise TypeError(f"{path} does not hold a {cls.__name__}.")
+        return model
+
+    def step(self, k: int = 1):
+        """Carry out `k` events in a single call, stopping early if the population can no longer change.
 
-            if current_population._genotype_has_fixated():
+        An event is one step of the engine: a generation, or for the rejection_free engine one
+        genotype-changing replacement. The engines draw their random numbers from pre-drawn blocks,
+        so `step(k)` gives the same result as k calls to `step()`.
+        """
+        return self._run(math.inf, k)
+
+    def _run(self, max_generations: float, max_events: float):
+        end = self.generation + max_generations
+        n_events = 0
+        while self.generation < end and n_events < max_events:
+            if self._has_absorbed():
+                self._n_recorded_generations = self.generation + 1
+                self.result = self._simulation_result(
+                    StopReason.FIXATION if self._has_fixated() else StopReason.ABSORBING
+                )
                 return self
 
-            self._next_generation()
+            # a wait cut short by the generation limit is not an event
+            n_events += self._next_generation(end - self.generation)
 
+        self._n_recorded_generations = self.generation
+        self.result = self._simulation_result(
+            StopReason.MAX_GENERATIONS
+            if self.generation >= end
+            else StopReason.MAX_EVENTS
+        )
         return self
 
-    def _next_generation(self):
-        """Advance process to next generation."""
+    def _has_fixated(self) -> bool:
+        if self._engine is not None:
+            return self._engine.has_fixated()
+        return self._graph._genotype_has_fixated()
+
+    def _has_absorbed(self) -> bool:
+        """Whether the population can no longer change, checked in constant time."""
+        if self._engine is not None:
+            return self._engine.has_absorbed()
+        return self._graph._genotype_has_fixated()
+
+    def _simulation_result(self, stop_reason: StopReason) -> SimulationResult:
+        if stop_reason is not StopReason.FIXATION:
+            return SimulationResult(stop_reason, self.generation, len(self.history))
+
+        if self._engine is not None:
+            fixed_genotype = self._compiled_graph.genotype_labels[
+                self._engine.fixed_genotype()
+            ]
+        else:
+            fixed_genotype = next(
+                genotype
+                for genotype, count in self._graph.genotype_valuecounts.items()
+                if count > 0
+            )
+        return SimulationResult(
+            stop_reason,
+            self.generation,
+            len(self.history),
+            fixed_genotype=fixed_genotype,
+            fixation_generation=self.generation,
+            fixation_time=self.time,
+        )
+
+    def _next_generation(self, max_generations: int = 1) -> bool:
+        """Advance process to next generation.
+
+        Engines that skip null events may advance several generations at once, but never more than
+        `max_generations`. Because the waiting time is memoryless, an event that would fall beyond
+        that limit is simply not carried out.
+
+        Returns:
+            Whether an event was carried out, False if the generation limit cut the wait short.
+        """
+        if self._engine is not None:
+            waiting_generations = self._engine.draw_waiting_generations()
+            if waiting_generations > max_generations:
+                self.generation += max_generations
+                return False
+
+            self.generation += waiting_generations
+            event = self._engine.step()
+            if event is not None and event[2] != event[3]:
+                self.history.append(self.generation - 1, *event, time=self.time)
+            return True
+
+        self.generation += 1
+
         selected_node = self._select_node()
-        neighbor_candidates = self.graph.nodes[selected_node]
-        next_generation = self.graph.copy()
+        neighbor_candidates = self._graph.nodes[selected_node]
         if neighbor_candidates:
-            replaced_neighbor_node_id = random.choice(neighbor_candidates).node_id
-            replaced_neighbor = next_generation.node_id_to_node[
-                replaced_neighbor_node_id
+            replaced_neighbor = neighbor_candidates[
+                min(
+                    int(self._uniforms.random() * len(neighbor_candidates)),
+                    len(neighbor_candidates) - 1,
+                )
             ]
-            next_generation._update_genotype_valuecounts(replaced_neighbor.genotype, -1)
-            next_generation._update_genotype_valuecounts(selected_node.genotype, 1)
-            replaced_neighbor.genotype = selected_node.genotype
+            if replaced_neighbor.genotype == selected_node.genotype:
+                return True
 
-            self.graph = next_generation
+            self.history.append(
+                self.generation - 1,
+                self._index_of[selected_node.node_id],
+                self._index_of[replaced_neighbor.node_id],
+                self._genotype_code_of[replaced_neighbor.genotype],
+                self._genotype_code_of[selected_node.genotype],
+            )
+            self._graph._update_genotype_valuecounts(replaced_neighbor.genotype, -1)
+            self._graph._update_genotype_valuecounts(selected_node.genotype, 1)
+            replaced_neighbor.genotype = selected_node.genotype
+        return True
 
     def _select_node(self):
         """Select an node probabilistically (probabilities proportional to fitness) for reproduction."""
         node_fitness_values = self._calculate_fitness_per_node().values()
-        total_fitness = sum(node_fitness_values)
-        selection_probabilities = [
-            fitness / total_fitness for fitness in node_fitness_values
-        ]
-        selected_node = random.choices(list(self.graph.nodes), selection_probabilities)[
-            0
+        cumulative_fitness = list(accumulate(node_fitness_values))
+        selected_index = bisect(
+            cumulative_fitness, self._uniforms.random() * cumulative_fitness[-1]
+        )
+        selected_node = list(self._graph.nodes)[
+            min(selected_index, len(cumulative_fitness) - 1)
         ]
         return selected_node
 
     def _calculate_fitness_per_node(self) -> dict[str, float]:
-        node_fitnesses = {}
-        for node in self.graph.nodes:
-            node_fitnesses[node] = 0
-            adj_genotype_valuecounts = dict(
-                Counter([node.genotype for node in self.graph.get_adjacent_nodes(node)])
-            )
-
-            for neighbor_genotype in adj_genotype_valuecounts.keys():
-                node_fitnesses[node] += (
-                    self.payoff_matrix[node.genotype][neighbor_genotype]
-                    * adj_genotype_valuecounts[neighbor_genotype]
-                )
+        graph = self.graph
+        fitness = self._fitness(self._calculate_payoffs(graph))
+        return dict(zip(graph.nodes, fitness.tolist()))
 
+    def _calculate_fitness_per_genotype(self) -> dict[str, float]:
+        genotypes = self._genotype_codes()
+        labels = self._compiled_graph.genotype_labels
+        fitness = self._fitness(
+            genotype_payoffs(self._calculate_payoffs(), genotypes, len(labels))
+        )
+        alive = np.bincount(genotypes, minlength=len(labels)) > 0
         return {
-            node: 1 - self.selection_intensity + self.selection_intensity * fitness
-            for node, fitness in node_fitnesses.items()
+            label: value
+            for label, value, is_alive in zip(labels, fitness.tolist(), alive)
+            if is_alive
         }
 
-    def _calculate_fitness_per_genotype(self) -> dict[str, float]:
-        genotype_fitnesses = {}
-        for node in self.graph.nodes:
-            genotype_fitnesses[node.genotype] = genotype_fitnesses.get(node.genotype, 0)
-            adj_genotype_valuecounts = dict(
-                Counter([node.genotype for node in self.graph.get_adjacent_nodes(node)])
+    def _calculate_payoffs(self, graph: Graph | None = None) -> np.ndarray:
+        """Payoff of every node, vectorised over the whole population with sparse products."""
+        if isinstance(self._compiled_graph, CompleteTopology):
+            return well_mixed_payoffs(
+                self._genotype_codes(graph), self._compiled_payoff_matrix
             )
+        return population_payoffs(
+            self._compiled_graph.adjacency,
+            self._genotype_codes(graph),
+            self._compiled_payoff_matrix,
+        )
 
-            for neighbor_genotype in adj_genotype_valuecounts.keys():
-                genotype_fitnesses[node.genotype] += (
-                    self.payoff_matrix[node.genotype][neighbor_genotype]
-                    * adj_genotype_valuecounts[neighbor_genotype]
-                )
+    def _genotype_codes(self, graph: Graph | None = None) -> np.ndarray:
+        """Current genotype code of each node, in the order of the compiled graph."""
+        if self._engine is not None and graph is None:
+            return self._engine.genotypes
+        graph = graph if graph is not None else self._graph
+        code_of = self._genotype_code_of
+        return np.fromiter(
+            (code_of[node.genotype] for node in graph.nodes),
+            dtype=np.int64,
+            count=len(graph.nodes),
+        )
 
-        return {
-            genotype: 1 - self.selection_intensity + self.selection_intensity * fitness
-            for genotype, fitness in genotype_fitnesses.items()
-        }
+    def _fitness(self, payoffs: np.ndarray) -> np.ndarray:
+        return 1 - self.selection_intensity + self.selection_intensity * payoffs
 
     @staticmethod
-    def _generate_random_payoff_matrix(graph: Graph) -> PayoffMatrixType:
+    def _generate_random_payoff_matrix(
+        graph: Graph | CompleteTopology | Lattice, rng: SeedType = None
+    ) -> PayoffMatrixType:
         """Generate a random payoff matrix based strategies in Graph."""
+        rng = np.random.default_rng(rng)
         payoff_matrix = {}
-        strategies = set(graph.genotype_valuecounts.keys())
+        # sorted so the same seed gives the same matrix regardless of string hashing
+        strategies = (
+            sorted(graph.genotype_valuecounts.keys())
+            if isinstance(graph, Graph)
+            else graph.genotype_labels
+        )
         for strategy in strategies:
             payoff_matrix[strategy] = {}
             for opponent_strategy in strategies:
-                payoff_matrix[strategy][opponent_strategy] = random.uniform(0, 1)
+                payoff_matrix[strategy][opponent_strategy] = float(rng.uniform(0, 1))
         return payoff_matrix
@@ -0,0 +1,83 @@
+from evographs.fitness import CompiledPayoffType, PayoffMatrixType
+from evographs.graph import Graph
+from evographs.moran_model import MoranModel
+from evographs.results import SimulationResult
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+
+EXECUTORS = ("process", "thread")
+
+
+def spawn_seeds(
+    seed: int | np.random.SeedSequence | None, n_runs: int
+) -> list[np.random.SeedSequence]:
+    """Independent seed sequences for `n_runs` runs, derived from one root seed."""
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return seed.spawn(n_runs)
+
+
+def run_ensemble(
+    graph: Graph,
+    payoff_matrix: PayoffMatrixType | CompiledPayoffType,
+    n_runs: int,
+    seed: int | np.random.SeedSequence | None = None,
+    n_workers: int = 1,
+    num_generations: int = 1_000_000,
+    executor: str = "process",
+    **model_kwargs,
+) -> list[SimulationResult]:
+    """
+    Run independent simulations of the same population and collect their results.
+
+    Every run gets its own random stream spawned from `seed`, and the streams depend only on the
+    position of the run in the ensemble. The results are therefore bit-identical whether the
+    ensemble runs serially, on any number of worker processes or on any number of threads.
+
+    Parameters:
+        graph: The initial population of every run.
+        payoff_matrix: Payoff matrix of the game.
+        n_runs: Number of runs.
+        seed: Root seed of the ensemble, None draws fresh entropy from the OS.
+        n_workers: Number of worker processes, 1 runs the ensemble in the calling process.
+        num_generations: Generation limit of each run.
+        executor: "process" to run on worker processes, or "thread" to run on threads of this
+        process, which avoids copying the graph to every worker and overlaps the runs wherever
+        NumPy releases the GIL.
+        model_kwargs: Further keyword arguments for MoranModel, e.g. the engine.
+
+    Returns:
+        The result of each run, in the order of the runs.
+    """
+    if n_workers < 1:
+        raise ValueError("Number of workers must be positive.")
+    if executor not in EXECUTORS:
+        raise ValueError(f"Invalid executor {executor!r}. Use one of {EXECUTORS}.")
+
+    tasks = [
+        (graph, payoff_matrix, run_seed, num_generations, model_kwargs)
+        for run_seed in spawn_seeds(seed, n_runs)
+    ]
+    if n_workers == 1:
+        return [_run_single(*task) for task in tasks]
+
+    pool = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+    with pool(max_workers=n_workers) as workers:
+        return list(
+            workers.map(
+                _run_single,
+                *zip(*tasks),
+                chunksize=max(1, n_runs // (4 * n_workers)),
+            )
+        )
+
+
+def _run_single(
+    graph: Graph,
+    payoff_matrix: PayoffMatrixType | CompiledPayoffType,
+    seed: np.random.SeedSequence,
+    num_generations: int,
+    model_kwargs: dict,
+) -> SimulationResult:
+    model = MoranModel(graph, payoff_matrix, rng=seed, **model_kwargs)
+    return model.run_simulation(num_generations).result
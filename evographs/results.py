@@ -0,0 +1,39 @@
+from dataclasses import dataclass
+from enum import Enum
+
+
+class StopReason(Enum):
+    """Why a simulation stopped."""
+
+    FIXATION = "fixation"
+    ABSORBING = "absorbing"
+    MAX_GENERATIONS = "max_generations"
+    MAX_EVENTS = "max_events"
+    MAX_WALL_TIME = "max_wall_time"
+    MAX_HISTORY_BYTES = "max_history_bytes"
+
+
+@dataclass(frozen=True)
+class SimulationResult:
+    """
+    Outcome of running a simulation.
+
+    Attributes:
+        stop_reason: Why the simulation stopped.
+        generation: The generation the population was in when the simulation stopped.
+        n_events: Number of replacements that changed the population.
+        fixed_genotype: The genotype that took over the population, if any.
+        fixation_generation: The generation in which the population fixated, if it did.
+        fixation_time: The time at which the population fixated for continuous-time simulations.
+    """
+
+    stop_reason: StopReason
+    generation: int
+    n_events: int
+    fixed_genotype: str | None = None
+    fixation_generation: int | None = None
+    fixation_time: float | None = None
+
+    @property
+    def fixated(self) -> bool:
+        return self.stop_reason is StopReason.FIXATION
@@ -0,0 +1,42 @@
+import numpy as np
+
+SeedType = int | np.random.SeedSequence | np.random.Generator | None
+
+
+class UniformBuffer:
+    """
+    Serves uniform random numbers in [0, 1) that are drawn from a NumPy generator in large blocks.
+
+    Drawing a single number from a generator costs far more interpreter overhead than indexing a
+    list, so the engines draw their randomness through this buffer, one `random()` call per number.
+    Because numbers are always consumed in the same order, advancing a simulation k events in one
+    call or in k calls gives identical results for the same generator state.
+
+    Attributes:
+        generator: The generator the blocks are drawn from.
+        block_size: Number of uniforms drawn at a time.
+    """
+
+    def __init__(self, generator: np.random.Generator, block_size: int = 4096):
+        if block_size < 1:
+            raise ValueError("Block size must be positive.")
+
+        self.generator = generator
+        self.block_size = block_size
+        self._block: list[float] = []
+        self._position = 0
+
+    def random(self) -> float:
+        if self._position == len(self._block):
+            self._block = self.generator.random(self.block_size).tolist()
+            self._position = 0
+        value = self._block[self._position]
+        self._position += 1
+        return value
+
+
+def uniform_source(rng: "SeedType | UniformBuffer") -> UniformBuffer:
+    """Wrap a seed or generator in a UniformBuffer, passing existing buffers through."""
+    if isinstance(rng, UniformBuffer):
+        return rng
+    return UniformBuffer(np.random.default_rng(rng))
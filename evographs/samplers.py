@@ -0,0 +1,194 @@
+import random
+from array import array
+from typing import Sequence
+import numpy as np
+
+
+class SumTreeSampler:
+    """
+    Samples indices with probability proportional to their weights using a binary sum tree.
+
+    Leaves hold the weights and every internal node holds the sum of its two children, so both
+    changing a single weight and drawing a weighted index cost O(log n).
+
+    Attributes:
+        capacity: Number of leaves in the tree, the smallest power of two that fits all weights.
+        tree: Flat array representation of the tree, the root is stored at position 1 and the
+        children of position p at 2p and 2p + 1.
+    """
+
+    def __init__(self, weights: Sequence[float] | np.ndarray):
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.size == 0:
+            raise ValueError("At least one weight is required.")
+        if np.any(weights < 0):
+            raise ValueError("Weights must be non-negative.")
+
+        self._size = len(weights)
+        self.capacity = 1
+        while self.capacity < self._size:
+            self.capacity *= 2
+
+        # build the partial sums level by level, then keep them in a compact
+        # array that is cheap to index from Python
+        tree = np.zeros(2 * self.capacity, dtype=np.float64)
+        tree[self.capacity : self.capacity + self._size] = weights
+        level = self.capacity // 2
+        while level:
+            tree[level : 2 * level] = (
+                tree[2 * level : 4 * level : 2] + tree[2 * level + 1 : 4 * level : 2]
+            )
+            level //= 2
+        self.tree = array("d", tree.tobytes())
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def total(self) -> float:
+        """The sum of all weights."""
+        return self.tree[1]
+
+    def weight(self, index: int) -> float:
+        return self.tree[self.capacity + index]
+
+    def update(self, index: int, weight: float):
+        """Set the weight of an index and update the partial sums above it."""
+        if not 0 <= index < self._size:
+            raise IndexError(f"Index {index} out of range for {self._size} weights.")
+        self._check_weight(weight)
+
+        tree = self.tree
+        position = self.capacity + index
+        tree[position] = weight
+        position //= 2
+        while position:
+            # recompute rather than add the difference so rounding errors do not accumulate
+            tree[position] = tree[2 * position] + tree[2 * position + 1]
+            position //= 2
+
+    def sample(self, rng=random) -> int:
+        """Draw an index with probability proportional to its weight.
+
+        Parameters:
+            rng: Source of randomness providing `random()`, e.g. the `random` module.
+        """
+        tree = self.tree
+        if tree[1] <= 0:
+            raise ValueError("Cannot sample when all weights are zero.")
+
+        target = rng.random() * tree[1]
+        position = 1
+        while position < self.capacity:
+            left = 2 * position
+            # never descend into an empty subtree, even if rounding pushes the target past it
+            if target < tree[left] or tree[left + 1] <= 0:
+                position = left
+            else:
+                target -= tree[left]
+                position = left + 1
+        return position - self.capacity
+
+    @staticmethod
+    def _check_weight(weight: float):
+        if weight < 0:
+            raise ValueError("Weights must be non-negative.")
+
+
+class RejectionSampler:
+    """
+    Samples indices proportionally to their weights by rejection from a uniform draw.
+
+    An index is drawn uniformly and accepted with probability weight / upper_bound. When all
+    weights are close to the upper bound, as under weak selection, this costs O(1) per draw and
+    needs no cumulative weights at all; a weight equal to the bound is accepted without a second
+    draw, so equal weights reduce to a plain uniform draw. The acceptance rate is monitored over
+    windows of trials and once it drops below `min_acceptance_rate` the sampler permanently
+    switches to an exact SumTreeSampler.
+
+    Attributes:
+        upper_bound: Upper bound on every weight.
+        weights: Current weight of each index.
+        fallback: The SumTreeSampler used once the acceptance rate has dropped, otherwise None.
+    """
+
+    def __init__(
+        self,
+        weights: Sequence[float] | np.ndarray,
+        upper_bound: float,
+        min_acceptance_rate: float = 0.25,
+        window: int = 1000,
+    ):
+        if len(weights) == 0:
+            raise ValueError("At least one weight is required.")
+        if upper_bound <= 0:
+            raise ValueError("Upper bound must be positive.")
+
+        self.upper_bound = upper_bound
+        self.min_acceptance_rate = min_acceptance_rate
+        self.window = window
+        self.weights = array("d", np.asarray(weights, dtype=np.float64).tobytes())
+        for weight in self.weights:
+            self._check_weight(weight)
+        self.fallback: SumTreeSampler | None = None
+        self._trials = 0
+        self._accepted = 0
+
+    def __len__(self) -> int:
+        return len(self.weights)
+
+    @property
+    def total(self) -> float:
+        """The sum of all weights."""
+        if self.fallback is not None:
+            return self.fallback.total
+        return sum(self.weights)
+
+    def weight(self, index: int) -> float:
+        return self.weights[index]
+
+    def update(self, index: int, weight: float):
+        """Set the weight of an index."""
+        if not 0 <= index < len(self.weights):
+            raise IndexError(f"Index {index} out of range for {len(self)} weights.")
+        self._check_weight(weight)
+
+        self.weights[index] = weight
+        if self.fallback is not None:
+            self.fallback.update(index, weight)
+
+    def sample(self, rng=random) -> int:
+        """Draw an index with probability proportional to its weight.
+
+        Parameters:
+            rng: Source of randomness providing `random()`, e.g. the `random` module.
+        """
+        weights = self.weights
+        n = len(weights)
+        while self.fallback is None:
+            index = min(int(rng.random() * n), n - 1)
+            weight = weights[index]
+            self._trials += 1
+            if weight >= self.upper_bound or rng.random() * self.upper_bound < weight:
+                self._accepted += 1
+                self._check_acceptance_rate()
+                return index
+            self._check_acceptance_rate()
+        return self.fallback.sample(rng)
+
+    def _check_acceptance_rate(self):
+        if self._trials < self.window:
+            return
+        if self._accepted < self.min_acceptance_rate * self._trials:
+            self.fallback = SumTreeSampler(self.weights)
+        self._trials = 0
+        self._accepted = 0
+
+    def _check_weight(self, weight: float):
+        if weight < 0:
+            raise ValueError("Weights must be non-negative.")
+        # allow for rounding in incrementally maintained weights
+        if weight > self.upper_bound * (1 + 1e-9):
+            raise ValueError(
+                f"Weight {weight} exceeds the upper bound {self.upper_bound}."
+            )
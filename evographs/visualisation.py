@@ -1,11 +1,12 @@
 from evographs.graph import Graph
+from collections.abc import Sequence
 import networkx as nx
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 
 
 def evolution_simulation_animator(
-    population_history: list[Graph],
+    population_history: Sequence[Graph],
     save_path: str,
     fps: int = 10,
     layout_type: str = "kamada_kawai",
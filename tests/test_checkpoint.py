@@ -0,0 +1,158 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from evographs.checkpoint import Checkpointer, load_checkpoint
+from evographs.fitness import CallablePayoff
+from evographs.graph import Graph
+from evographs.moran_model import MoranModel
+
+
+class _Killed(Exception):
+    """Stands in for the process being killed while a checkpoint is written."""
+
+
+def _state(model: MoranModel):
+    return (
+        model.generation,
+        model.result,
+        model.time,
+        model.graph.genotype_valuecounts,
+        model.history.columns,
+        [keyframe.tolist() for keyframe in model.history.keyframes],
+        model._rng.bit_generator.state,
+    )
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "run.ckpt")
+        self.graph = Graph.generate_random_graph(
+            n_nodes=40, n_genotypes=3, edge_probability=0.2, rng=3
+        )
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _model(self, **kwargs) -> MoranModel:
+        return MoranModel(
+            self.graph, selection_intensity=0.5, rng=7, keyframe_interval=16, **kwargs
+        )
+
+    def test_resume_is_bit_identical(self):
+        configurations = [
+            {"engine": "naive"},
+            {"engine": "incremental"},
+            {"engine": "incremental", "sampler": "rejection"},
+            {"engine": "incremental", "update_rule": "fermi"},
+            {"engine": "rejection_free"},
+            {"engine": "continuous"},
+        ]
+        for kwargs in configurations:
+            with self.subTest(**kwargs):
+                expected = self._model(**kwargs)
+                expected.run_simulation(120)
+                expected.run_simulation(300)
+
+                model = self._model(**kwargs)
+                model.run_simulation(120, checkpoint=Checkpointer(self.path, 25))
+                resumed = MoranModel.resume(self.path)
+                self.assertEqual(_state(resumed), _state(model))
+                resumed.run_simulation(300)
+                self.assertEqual(_state(resumed), _state(expected))
+
+    def test_checkpointing_does_not_change_the_run(self):
+        expected = self._model().run_simulation(200)
+        model = self._model().run_simulation(200, checkpoint=Checkpointer(self.path, 7))
+        self.assertEqual(_state(model), _state(expected))
+
+    def test_resumed_run_keeps_checkpointing(self):
+        expected = self._model().run_simulation(300)
+
+        self._model().run_simulation(100, checkpoint=Checkpointer(self.path, 30))
+        resumed = MoranModel.resume(self.path)
+        resumed.run_simulation(200, checkpoint=Checkpointer(self.path, 30))
+        self.assertEqual(_state(MoranModel.resume(self.path)), _state(expected))
+
+    def test_ignores_events_of_an_incomplete_checkpoint(self):
+        checkpoint = Checkpointer(self.path)
+        model = self._model().run_simulation(100, checkpoint=checkpoint)
+        with open(checkpoint.events_path, "ab") as file:
+            file.write(b"\xff" * 100)
+        self.assertEqual(_state(load_checkpoint(self.path)), _state(model))
+
+    def _assert_kills_keep_the_checkpoint(self, continue_from):
+        """Kill the first save of `continue_from(model)` right after it opens the event sidecar
+        and right before it renames the snapshot, the earlier checkpoint must survive both.
+        """
+
+        def open_then_kill(file, *args, **kwargs):
+            handle = open(file, *args, **kwargs)
+            if str(file).endswith(".events"):
+                handle.close()
+                raise _Killed
+            return handle
+
+        kills = [
+            mock.patch("evographs.checkpoint.open", open_then_kill, create=True),
+            mock.patch("evographs.checkpoint.os.replace", side_effect=_Killed),
+        ]
+        for kill in kills:
+            model = self._model().run_simulation(
+                100, checkpoint=Checkpointer(self.path, 30)
+            )
+            continued = continue_from(model)
+            with kill, self.assertRaises(_Killed):
+                continued.run_simulation(200, checkpoint=Checkpointer(self.path, 30))
+            self.assertEqual(_state(load_checkpoint(self.path)), _state(model))
+
+    def test_killed_save_of_a_resumed_run_keeps_the_checkpoint(self):
+        self._assert_kills_keep_the_checkpoint(
+            lambda model: MoranModel.resume(self.path)
+        )
+
+    def test_killed_save_of_a_new_run_keeps_the_checkpoint(self):
+        self._assert_kills_keep_the_checkpoint(
+            lambda model: self._model(engine="rejection_free")
+        )
+
+    def test_new_run_replaces_the_old_sidecar(self):
+        self._model().run_simulation(100, checkpoint=Checkpointer(self.path))
+        checkpoint = Checkpointer(self.path)
+        self._model(engine="rejection_free").run_simulation(100, checkpoint=checkpoint)
+        sidecars = [
+            name for name in os.listdir(self.directory.name) if name.endswith(".events")
+        ]
+        self.assertEqual(sidecars, [os.path.basename(checkpoint.events_path)])
+
+    def test_rejects_truncated_sidecar(self):
+        checkpoint = Checkpointer(self.path)
+        self._model().run_simulation(100, checkpoint=checkpoint)
+        size = os.path.getsize(checkpoint.events_path)
+        self.assertGreater(size, 0)
+        with open(checkpoint.events_path, "r+b") as file:
+            file.truncate(size // 2)
+        with self.assertRaises(ValueError):
+            load_checkpoint(self.path)
+
+    def test_rejects_other_files(self):
+        with open(self.path, "wb") as file:
+            file.write(b"not a checkpoint")
+        with self.assertRaises(ValueError):
+            load_checkpoint(self.path)
+
+    def test_payoff_callable_must_be_picklable(self):
+        model = self._model(payoff_matrix=CallablePayoff(lambda a, b: a * b + 1, 3))
+        with self.assertRaisesRegex(ValueError, "module level"):
+            model.run_simulation(100, checkpoint=Checkpointer(self.path, 25))
+        self.assertEqual(model.generation, 0)
+
+        model = self._model(payoff_matrix=CallablePayoff(np.hypot, 3))
+        model.run_simulation(100, checkpoint=Checkpointer(self.path, 25))
+        self.assertEqual(_state(MoranModel.resume(self.path)), _state(model))
+
+    def test_invalid_interval(self):
+        with self.assertRaises(ValueError):
+            Checkpointer(self.path, interval=0)
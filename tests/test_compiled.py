@@ -0,0 +1,228 @@
+import unittest
+import numpy as np
+from evographs.compiled import CompiledGraph, CompleteTopology, compile_payoff_matrix
+from evographs.engine import ActiveInterfaceEngine, MoranEngine
+from evographs.fitness import (
+    CallablePayoff,
+    LowRankPayoff,
+    PayoffFunction,
+    genotype_payoffs,
+    population_payoffs,
+)
+from evographs.graph import Graph, Node
+
+
+class TestCompiledGraph(unittest.TestCase):
+    def setUp(self):
+        nodes = [Node("B", 1), Node("A", 2), Node("B", 3)]
+        self.graph = Graph(nodes, [(1, 2), (2, 3)])
+
+    def test_csr_arrays(self):
+        compiled = CompiledGraph.from_graph(self.graph)
+        self.assertEqual(compiled.genotype_labels, ["A", "B"])
+        self.assertEqual(compiled.genotypes.tolist(), [1, 0, 1])
+        self.assertEqual(compiled.genotypes.dtype, np.uint8)
+        self.assertEqual(compiled.indptr.tolist(), [0, 1, 3, 4])
+        self.assertEqual(compiled.neighbors(1).tolist(), [0, 2])
+        self.assertEqual(compiled.degrees.tolist(), [1, 2, 1])
+
+    def test_round_trip_to_graph(self):
+        compiled = CompiledGraph.from_graph(self.graph)
+        graph = compiled.to_graph(np.array([0, 0, 1], dtype=np.uint8))
+        genotypes = {node.node_id: node.genotype for node in graph.nodes}
+        self.assertEqual(genotypes, {1: "A", 2: "A", 3: "B"})
+        self.assertEqual(graph.genotype_valuecounts, {"A": 2, "B": 1})
+        middle = graph.node_id_to_node[2]
+        self.assertEqual(
+            sorted(neighbor.node_id for neighbor in graph.nodes[middle]), [1, 3]
+        )
+
+    def test_compile_payoff_matrix(self):
+        payoff_matrix = {"A": {"A": 1.0, "B": 2.0}, "B": {"A": 3.0, "B": 4.0}}
+        compiled = compile_payoff_matrix(payoff_matrix, ["A", "B"])
+        self.assertEqual(compiled.tolist(), [[1.0, 2.0], [3.0, 4.0]])
+
+    def test_compile_payoff_matrix_rejects_missing_entries(self):
+        payoff_matrix = {"A": {"A": 1.0, "B": 2.0}, "B": {"A": 3.0}}
+        with self.assertRaisesRegex(ValueError, "'B', 'B'"):
+            compile_payoff_matrix(payoff_matrix, ["A", "B"])
+        with self.assertRaises(ValueError):
+            compile_payoff_matrix({"A": {"A": float("nan")}}, ["A"])
+
+
+class TestCompleteTopology(unittest.TestCase):
+    def test_from_graph_and_round_trip(self):
+        graph = Graph([Node("B", 1), Node("A", 2), Node("B", 3)], [(1, 2), (2, 3)])
+        self.assertFalse(graph.is_complete())
+        with self.assertRaises(ValueError):
+            CompleteTopology.from_graph(graph)
+
+        graph.add_edge(1, 3)
+        topology = CompleteTopology.from_graph(graph)
+        self.assertEqual(topology.genotypes.tolist(), [1, 0, 1])
+        self.assertEqual(topology.neighbors(1).tolist(), [0, 2])
+        rebuilt = topology.to_graph()
+        self.assertTrue(rebuilt.is_complete())
+        self.assertEqual(rebuilt.genotype_valuecounts, {"A": 1, "B": 2})
+
+    def test_from_genotype_counts(self):
+        topology = CompleteTopology.from_genotype_counts({"B": 2, "A": 3})
+        self.assertEqual(topology.genotype_labels, ["A", "B"])
+        self.assertEqual(topology.genotypes.tolist(), [0, 0, 0, 1, 1])
+        self.assertEqual(topology.node_ids.tolist(), [1, 2, 3, 4, 5])
+        self.assertEqual(topology.degrees.tolist(), [4] * 5)
+
+
+class TestMoranEngine(unittest.TestCase):
+    def test_payoffs_match_recomputation_after_steps(self):
+        graph = Graph.generate_random_graph(
+            n_nodes=20, n_genotypes=4, edge_probability=0.3, rng=0
+        )
+        compiled = CompiledGraph.from_graph(graph)
+        payoff_matrix = np.random.default_rng(0).uniform(size=(4, 4))
+        engine = MoranEngine(
+            compiled,
+            payoff_matrix,
+            selection_intensity=0.5,
+            rng=np.random.default_rng(1),
+        )
+        for _ in range(300):
+            engine.step()
+            for index in range(compiled.n_nodes):
+                neighbor_genotypes = engine.genotypes[compiled.neighbors(index)]
+                expected = payoff_matrix[engine.genotypes[index], neighbor_genotypes]
+                self.assertAlmostEqual(engine.payoffs[index], expected.sum())
+        self.assertEqual(
+            engine.genotype_counts.tolist(),
+            np.bincount(engine.genotypes, minlength=4).tolist(),
+        )
+        self.assertEqual(
+            engine.n_alive_genotypes, np.count_nonzero(engine.genotype_counts)
+        )
+        heterogeneous = sum(
+            int(np.sum(engine.genotypes[compiled.neighbors(i)] != engine.genotypes[i]))
+            for i in range(compiled.n_nodes)
+        )
+        self.assertEqual(engine.n_heterogeneous_edges, heterogeneous // 2)
+        self.assertEqual(
+            engine.same_genotype_neighbors.tolist(),
+            [
+                int(
+                    np.sum(
+                        engine.genotypes[compiled.neighbors(i)] == engine.genotypes[i]
+                    )
+                )
+                for i in range(compiled.n_nodes)
+            ],
+        )
+        counts = engine.neighbor_genotype_counts.toarray()
+        for index in range(compiled.n_nodes):
+            self.assertEqual(
+                counts[index].tolist(),
+                np.bincount(
+                    engine.genotypes[compiled.neighbors(index)], minlength=4
+                ).tolist(),
+            )
+
+    def test_zero_fitness_survives_rounding(self):
+        # at s = 1 the C node's patched payoff 0.7 + 0.1 - 0.7 - 0.1 rounds to slightly below 0
+        graph = Graph(
+            [Node("A", 1), Node("C", 2), Node("B", 3), Node("D", 4)],
+            [(1, 2), (2, 3), (3, 4)],
+        )
+        compiled = CompiledGraph.from_graph(graph)
+        payoff_matrix = np.array(
+            [[1, 1, 0, 1], [1, 1, 0, 1], [0.7, 0.1, 0, 0], [1, 1, 1, 1]], dtype=float
+        )
+        for engine_class in (MoranEngine, ActiveInterfaceEngine):
+            engine = engine_class(compiled, payoff_matrix, 1, rng=0)
+            engine.replace(0, 3)
+            engine.replace(2, 3)
+            self.assertAlmostEqual(engine.payoffs[1], 0)
+            engine.step()
+
+
+class TestPayoffFunctions(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.left = rng.uniform(size=(50, 3))
+        self.right = rng.uniform(size=(50, 3))
+        self.dense = self.left @ self.right.T
+
+    def test_low_rank_payoff_matches_dense(self):
+        payoff = LowRankPayoff(self.left, self.right)
+        genotypes = np.array([[0], [7], [49]])
+        opponents = np.array([[1, 2, 3]])
+        self.assertTrue(
+            np.allclose(payoff[genotypes, opponents], self.dense[genotypes, opponents])
+        )
+        self.assertAlmostEqual(payoff[4, 5], self.dense[4, 5])
+        self.assertAlmostEqual(payoff.min(), self.dense.min())
+        self.assertAlmostEqual(payoff.max(), self.dense.max())
+
+    def test_subclass_without_pairs_cannot_be_constructed(self):
+        class IncompletePayoff(PayoffFunction):
+            pass
+
+        with self.assertRaises(TypeError):
+            IncompletePayoff(3)
+
+    def test_callable_payoff(self):
+        payoff = CallablePayoff(lambda a, b: self.dense[a, b], 50)
+        self.assertEqual(payoff.shape, (50, 50))
+        self.assertAlmostEqual(payoff.max(), self.dense.max())
+        with self.assertRaises(ValueError):
+            compile_payoff_matrix(payoff, ["A", "B"])
+
+    def test_engine_with_thousands_of_genotypes(self):
+        n_genotypes = 3000
+        graph = Graph.generate_random_graph(
+            n_nodes=300, n_genotypes=n_genotypes, edge_probability=0.05, rng=0
+        )
+        compiled = CompiledGraph.from_graph(graph)
+        labels = compiled.genotype_labels
+        rng = np.random.default_rng(1)
+        payoff = LowRankPayoff(
+            rng.uniform(size=(len(labels), 2)), rng.uniform(size=(len(labels), 2))
+        )
+        engine = MoranEngine(compiled, payoff, selection_intensity=0.1)
+        for _ in range(500):
+            engine.step()
+        for index in range(compiled.n_nodes):
+            neighbor_genotypes = engine.genotypes[compiled.neighbors(index)]
+            self.assertAlmostEqual(
+                engine.payoffs[index],
+                payoff[engine.genotypes[index], neighbor_genotypes].sum(),
+            )
+        self.assertTrue(
+            np.allclose(
+                population_payoffs(compiled.adjacency, engine.genotypes, payoff),
+                engine.payoffs,
+            )
+        )
+
+
+class TestVectorisedFitness(unittest.TestCase):
+    def test_population_payoffs_match_per_node_sums(self):
+        graph = Graph.generate_random_graph(
+            n_nodes=25, n_genotypes=3, edge_probability=0.3, rng=2
+        )
+        compiled = CompiledGraph.from_graph(graph)
+        payoff_matrix = np.random.default_rng(0).uniform(size=(3, 3))
+        payoffs = population_payoffs(
+            compiled.adjacency, compiled.genotypes, payoff_matrix
+        )
+        for index in range(compiled.n_nodes):
+            neighbor_genotypes = compiled.genotypes[compiled.neighbors(index)]
+            expected = payoff_matrix[compiled.genotypes[index], neighbor_genotypes]
+            self.assertAlmostEqual(payoffs[index], expected.sum())
+
+        totals = genotype_payoffs(payoffs, compiled.genotypes, 3)
+        for code in range(3):
+            self.assertAlmostEqual(
+                totals[code], payoffs[compiled.genotypes == code].sum()
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,205 @@
+import statistics
+import tracemalloc
+import unittest
+import numpy as np
+from evographs.compiled import CompiledGraph, GraphBatch, compile_payoff_matrix
+from evographs.ensemble import BatchEngine, EnsembleEngine, run_batch, run_replicates
+from evographs.graph import Graph, Node
+from evographs.lattice import Lattice
+from evographs.moran_model import MoranModel
+from evographs.parallel import run_ensemble
+from evographs.results import StopReason
+
+
+class TestEnsembleEngine(unittest.TestCase):
+    def setUp(self):
+        self.graph = Graph.generate_random_graph(
+            n_nodes=15, n_genotypes=3, edge_probability=0.25, rng=3
+        )
+        self.payoff_matrix = MoranModel._generate_random_payoff_matrix(self.graph, 0)
+
+    def test_state_matches_recomputation(self):
+        compiled = CompiledGraph.from_graph(self.graph)
+        payoff_matrix = compile_payoff_matrix(
+            self.payoff_matrix, compiled.genotype_labels
+        )
+        engine = EnsembleEngine(compiled, payoff_matrix, 0.5, n_replicates=20, rng=1)
+        for _ in range(100):
+            engine.step()
+
+        genotypes = engine.genotypes
+        payoffs = engine._payoffs.reshape(20, compiled.n_nodes)
+        for replicate in range(20):
+            row = genotypes[replicate]
+            heterogeneous = 0
+            for index in range(compiled.n_nodes):
+                neighbors = compiled.neighbors(index)
+                self.assertAlmostEqual(
+                    payoffs[replicate, index],
+                    payoff_matrix[row[index], row[neighbors]].sum(),
+                )
+                heterogeneous += int((row[neighbors] != row[index]).sum())
+            self.assertEqual(
+                engine.genotype_counts[replicate].tolist(),
+                np.bincount(row, minlength=3).tolist(),
+            )
+            self.assertEqual(
+                engine.n_heterogeneous_edges[replicate], heterogeneous // 2
+            )
+
+    def test_fixation_matches_single_runs(self):
+        replicates = run_replicates(self.graph, self.payoff_matrix, 600, rng=0)
+        single = run_ensemble(
+            self.graph, self.payoff_matrix, 600, seed=0, engine="incremental"
+        )
+        self.assertTrue(all(result.fixated for result in replicates))
+        self.assertAlmostEqual(
+            statistics.mean(result.generation for result in replicates),
+            statistics.mean(result.generation for result in single),
+            delta=0.15 * statistics.mean(result.generation for result in single),
+        )
+        for genotype in ("A", "B", "C"):
+            self.assertAlmostEqual(
+                statistics.mean(r.fixed_genotype == genotype for r in replicates),
+                statistics.mean(r.fixed_genotype == genotype for r in single),
+                delta=0.08,
+            )
+
+    def test_absorbing_and_generation_limit(self):
+        graph = Graph([Node("A", 1), Node("A", 2), Node("B", 3)], [(1, 2)])
+        results = run_replicates(graph, self.payoff_matrix, 3)
+        self.assertEqual(
+            [result.stop_reason for result in results], [StopReason.ABSORBING] * 3
+        )
+
+        results = run_replicates(
+            self.graph, self.payoff_matrix, 4, num_generations=2, rng=0
+        )
+        for result in results:
+            self.assertIs(result.stop_reason, StopReason.MAX_GENERATIONS)
+            self.assertEqual(result.generation, 2)
+
+    def test_memory_proportional_to_edges_on_a_star(self):
+        star = Graph(
+            [Node("A" if i % 3 else "B", i) for i in range(1, 1001)],
+            [(1, i) for i in range(2, 1001)],
+        )
+        compiled = CompiledGraph.from_graph(star)
+        tracemalloc.start()
+        try:
+            engine = EnsembleEngine(compiled, np.eye(2), 0.5, n_replicates=50, rng=0)
+            for _ in range(20):
+                engine.step()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertLess(peak, 256 * (50 * compiled.n_nodes + len(compiled.indices)))
+
+    def test_lattice_replicates(self):
+        lattice = Lattice.generate_random_lattice(4, 4, n_genotypes=2, rng=0)
+        payoff_matrix = {"A": {"A": 1, "B": 1}, "B": {"A": 1, "B": 1}}
+        results = run_replicates(lattice, payoff_matrix, 50, rng=0)
+        self.assertTrue(all(result.fixated for result in results))
+
+
+class TestGraphBatch(unittest.TestCase):
+    def setUp(self):
+        self.graphs = [
+            Graph([Node("A", 1), Node("B", 2), Node("A", 3)], [(1, 2), (2, 3)]),
+            Graph([Node("C", 1), Node("B", 2)], [(1, 2)]),
+            Graph.generate_random_graph(
+                n_nodes=12, n_genotypes=3, edge_probability=0.3, rng=1
+            ),
+        ]
+        self.payoff_matrix = {
+            genotype: {opponent: 1 + 0.1 * i * j for j, opponent in enumerate("ABC")}
+            for i, genotype in enumerate("ABC")
+        }
+
+    def test_block_diagonal_layout(self):
+        batch = GraphBatch.from_graphs(self.graphs)
+        self.assertEqual(batch.n_graphs, 3)
+        self.assertEqual(batch.offsets.tolist()[:3], [0, 3, 5])
+        self.assertEqual(batch.genotype_labels, ["A", "B", "C"])
+        self.assertEqual(batch.genotypes[:5].tolist(), [0, 1, 0, 2, 1])
+        self.assertEqual(batch.indices[batch.indptr[3] : batch.indptr[4]].tolist(), [4])
+        for k, graph in enumerate(self.graphs):
+            member = batch.member(k).to_graph()
+            self.assertEqual(
+                [node.genotype for node in member.nodes],
+                [node.genotype for node in graph.nodes],
+            )
+            self.assertEqual(
+                [sorted(n.node_id for n in adj) for adj in member.nodes.values()],
+                [sorted(n.node_id for n in adj) for adj in graph.nodes.values()],
+            )
+
+    def test_state_matches_recomputation(self):
+        batch = GraphBatch.from_graphs(self.graphs)
+        engine = BatchEngine(
+            batch,
+            compile_payoff_matrix(self.payoff_matrix, batch.genotype_labels),
+            selection_intensity=0.5,
+            rng=0,
+        )
+        for _ in range(50):
+            engine.step()
+        genotypes = engine.genotypes
+        for index in range(batch.n_nodes):
+            neighbors = batch.indices[batch.indptr[index] : batch.indptr[index + 1]]
+            self.assertAlmostEqual(
+                engine._payoffs[index],
+                engine.payoff_matrix[genotypes[index], genotypes[neighbors]].sum(),
+            )
+        for k in range(3):
+            graph = engine.to_graph(k)
+            self.assertEqual(
+                [graph.genotype_valuecounts.get(label, 0) for label in "ABC"],
+                engine.genotype_counts[k].tolist(),
+            )
+
+    def test_hub_graph_does_not_inflate_the_batch(self):
+        hub = Graph(
+            [Node("A" if i % 3 else "B", i) for i in range(1, 1001)],
+            [(1, i) for i in range(2, 1001)],
+        )
+        batch = GraphBatch.from_graphs([hub] + self.graphs[:2] * 50)
+        payoff_matrix = compile_payoff_matrix(self.payoff_matrix, batch.genotype_labels)
+        tracemalloc.start()
+        try:
+            engine = BatchEngine(batch, payoff_matrix, 0.5, rng=0)
+            for _ in range(50):
+                engine.step()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertLess(peak, 256 * (batch.n_nodes + len(batch.indices)))
+
+        genotypes = engine.genotypes
+        for index in range(batch.n_nodes):
+            neighbors = batch.indices[batch.indptr[index] : batch.indptr[index + 1]]
+            self.assertAlmostEqual(
+                engine._payoffs[index],
+                payoff_matrix[genotypes[index], genotypes[neighbors]].sum(),
+            )
+
+    def test_results_per_graph(self):
+        graph = self.graphs[2]
+        results = run_batch([graph] * 400, self.payoff_matrix, rng=0)
+        single = run_ensemble(
+            graph, self.payoff_matrix, 400, seed=0, engine="incremental"
+        )
+        self.assertEqual(len(results), 400)
+        self.assertTrue(all(result.fixated for result in results))
+        self.assertAlmostEqual(
+            statistics.mean(result.generation for result in results),
+            statistics.mean(result.generation for result in single),
+            delta=0.15 * statistics.mean(result.generation for result in single),
+        )
+
+    def test_empty_batch(self):
+        self.assertEqual(run_batch([], self.payoff_matrix, rng=0), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
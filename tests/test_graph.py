@@ -1,4 +1,5 @@
 import unittest
+import numpy as np
 from evographs.graph import Graph, Node, NodeNotInGraphError
 
 
@@ -47,10 +48,82 @@ class TestGraphMethods(unittest.TestCase):
         with self.assertRaises(ValueError):
             g.add_edge(1, 1)
 
+    def test_node_ids_are_assigned_per_graph(self):
+        first = Graph([Node("A"), Node("B")], [(1, 2)])
+        node = Node("C")
+        self.assertIsNone(node.node_id)
+        second = Graph([Node("A", 5), node], [])
+        self.assertEqual(sorted(first.node_ids), [1, 2])
+        self.assertEqual(node.node_id, 6)
+        first.add_node(Node("C"))
+        self.assertEqual(sorted(first.node_ids), [1, 2, 3])
+        self.assertEqual(sorted(second.node_ids), [5, 6])
+
+    def test_add_duplicate_edge(self):
+        g = Graph([Node("A", 1), Node("B", 2), Node("C", 3)], [(1, 2)])
+        with self.assertRaises(ValueError):
+            g.add_edge(2, 1)
+        g.add_edge(3, 2)
+        self.assertEqual(
+            sorted(node.node_id for node in g.nodes[g.node_id_to_node[2]]), [1, 3]
+        )
+
+    def test_non_consecutive_node_ids(self):
+        g = Graph([Node("A", 10), Node("B", 3), Node("C", 7)], [(10, 7)])
+        self.assertEqual(g.node_ids, {3, 7, 10})
+        self.assertNotIn(4, g.node_ids)
+        self.assertEqual(g.node_id_to_node[7].genotype, "C")
+        self.assertEqual([node.node_id for node in g.nodes], [10, 3, 7])
+
+    def test_numpy_integer_node_ids(self):
+        g = Graph([Node("A", 0), Node("B", 1), Node("C", 2)], [])
+        g.add_edge(np.int64(1), np.int64(2))
+        self.assertIn(np.int64(2), g.node_ids)
+        self.assertNotIn(np.int64(3), g.node_ids)
+        self.assertEqual(g.node_id_to_node[np.int64(2)].genotype, "C")
+        self.assertEqual([node.node_id for node in g.nodes[g.node_id_to_node[1]]], [2])
+
+    def test_nodes_are_lightweight_views(self):
+        g = Graph.generate_random_graph(n_nodes=20, n_genotypes=2, edge_probability=1)
+        node = g.node_id_to_node[1]
+        self.assertFalse(hasattr(node, "__dict__"))
+        self.assertIs(next(iter(g.nodes)), node)
+        node.genotype = "C"
+        self.assertEqual(g.topology.neighbors(0).tolist(), list(range(1, 20)))
+        g.add_node(Node("A", 21))
+        g.add_edge(1, 21)
+        self.assertEqual(len(g.nodes[node]), 20)
+        self.assertEqual(node.genotype, "C")
+
     def test_generate_random_graph(self):
         g = Graph.generate_random_graph(n_nodes=3, n_genotypes=2, edge_probability=0.5)
         self.assertEqual(len(g.nodes), 3)
 
+    def test_large_sparse_random_graph(self):
+        # 5 * 10^9 candidate pairs, only the drawn edges are materialised
+        g = Graph.generate_random_graph(
+            n_nodes=100_000,
+            n_genotypes=2,
+            edge_probability=1e-5,
+            is_complete=False,
+            rng=0,
+        )
+        n_edges = int(g.topology.csr()[0][-1]) // 2
+        self.assertAlmostEqual(n_edges, 50_000, delta=1_500)
+
+    def test_add_node_of_another_graph(self):
+        g1 = Graph([Node("A", 1), Node("B", 2)], [(1, 2)])
+        nodes = list(g1.nodes)
+        g2 = Graph(nodes, [(1, 2)])
+
+        self.assertEqual([node.node_id for node in g2.nodes[nodes[0]]], [2])
+        nodes[0].genotype = "B"
+        self.assertEqual([node.genotype for node in g2.nodes], ["B", "B"])
+        node = g1.node_id_to_node[1]
+        self.assertIsNot(node, nodes[0])
+        self.assertEqual(node.genotype, "A")
+        self.assertEqual([node.node_id for node in g1.nodes[node]], [2])
+
     def test_copy(self):
         node_A = Node("A", 1)
         node_B = Node("B", 2)
@@ -95,6 +168,41 @@ class TestGraphMethods(unittest.TestCase):
                 f"Node ID mismatch for Node ID {node_id}",
             )
 
+    def test_copy_on_write(self):
+        g1 = Graph([Node("A", i) for i in range(1, 5)], [(1, 2), (2, 3), (3, 4)])
+        g2 = g1.copy()
+        self.assertIs(g1.topology, g2.topology)
+        self.assertTrue(g1.topology.frozen)
+
+        g2.node_id_to_node[1].genotype = "B"
+        g1.node_id_to_node[4].genotype = "C"
+        self.assertEqual([node.genotype for node in g1.nodes], ["A", "A", "A", "C"])
+        self.assertEqual([node.genotype for node in g2.nodes], ["B", "A", "A", "A"])
+
+        g3 = g2.copy()
+        g3.add_edge(1, 4)
+        self.assertIsNot(g3.topology, g2.topology)
+        self.assertEqual(len(g2.nodes[g2.node_id_to_node[1]]), 1)
+        self.assertEqual(len(g3.nodes[g3.node_id_to_node[1]]), 2)
+        self.assertEqual([node.genotype for node in g3.nodes], ["B", "A", "A", "A"])
+
+    def test_many_changes_after_copy(self):
+        g1 = Graph([Node("A", i) for i in range(1, 101)], [])
+        g2 = g1.copy()
+        for node in list(g2.nodes)[::2]:
+            node.genotype = "B"
+        self.assertEqual([node.genotype for node in g1.nodes], ["A"] * 100)
+        self.assertEqual([node.genotype for node in g2.nodes], ["B", "A"] * 50)
+
+    def test_added_nodes_are_views(self):
+        node_A = Node("A", 1)
+        g = Graph([node_A, Node("B", 2)], [(1, 2)])
+        node_A.genotype = "B"
+        self.assertIs(g.node_id_to_node[1], node_A)
+        self.assertEqual(g.copy().node_id_to_node[1].genotype, "B")
+        with self.assertRaises(KeyError):
+            g.nodes[Node("A", 1)]
+
     def test_genotype_valuecounts_initialization(self):
         node_A = Node("A", 1)
         node_B = Node("B", 2)
@@ -108,6 +216,20 @@ class TestGraphMethods(unittest.TestCase):
         g._update_genotype_valuecounts("A", 1)
         self.assertEqual(g.genotype_valuecounts["A"], 2)
 
+    def test_genotype_has_fixated(self):
+        g = Graph([Node("A", 1), Node("B", 2)], [(1, 2)])
+        self.assertFalse(g._genotype_has_fixated())
+        g._update_genotype_valuecounts("B", -1)
+        self.assertTrue(g._genotype_has_fixated())
+        g._update_genotype_valuecounts("C", 1)
+        self.assertFalse(g._genotype_has_fixated())
+
+    def test_label_more_than_26_genotypes(self):
+        labels = Graph._label_n_genotypes(30)
+        self.assertEqual(labels[:2], ["A", "B"])
+        self.assertEqual(labels[25:], ["Z", "AA", "AB", "AC", "AD"])
+        self.assertEqual(len(set(Graph._label_n_genotypes(800))), 800)
+
 
 if __name__ == "__main__":
     unittest.main()
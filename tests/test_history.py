@@ -0,0 +1,180 @@
+import unittest
+import numpy as np
+from evographs.graph import Graph
+from evographs.compiled import CompiledGraph
+from evographs.graph import Node
+from evographs.history import EventLog, PopulationHistory
+from evographs.moran_model import MoranModel
+
+
+class TestEventLog(unittest.TestCase):
+    def test_genotypes_at(self):
+        log = EventLog(np.array([0, 1, 1], dtype=np.uint8), n_genotypes=2)
+        log.append(step=2, parent=0, replaced=1, old_genotype=1, new_genotype=0)
+        log.append(step=5, parent=2, replaced=1, old_genotype=0, new_genotype=1)
+        log.append(step=6, parent=1, replaced=0, old_genotype=0, new_genotype=1)
+
+        self.assertEqual(log.genotypes_at(0).tolist(), [0, 1, 1])
+        self.assertEqual(log.genotypes_at(2).tolist(), [0, 1, 1])
+        self.assertEqual(log.genotypes_at(3).tolist(), [0, 0, 1])
+        self.assertEqual(log.genotypes_at(6).tolist(), [0, 1, 1])
+        self.assertEqual(log.genotypes_at(100).tolist(), [1, 1, 1])
+
+    def test_empty_log(self):
+        log = EventLog(np.array([0, 1], dtype=np.uint8), n_genotypes=2)
+        self.assertEqual(len(log), 0)
+        self.assertEqual(log.genotypes_at(10).tolist(), [0, 1])
+
+    def test_keyframes(self):
+        rng = np.random.default_rng(0)
+        log = EventLog(np.zeros(20, dtype=np.uint8), n_genotypes=3, keyframe_interval=7)
+        genotypes = np.zeros(20, dtype=np.uint8)
+        states = [genotypes.copy()]
+        for step in range(100):
+            replaced = int(rng.integers(20))
+            new = int(rng.integers(3))
+            log.append(step, 0, replaced, int(genotypes[replaced]), new)
+            genotypes[replaced] = new
+            states.append(genotypes.copy())
+
+        self.assertEqual(len(log.keyframes), 100 // 7 + 1)
+        for generation, state in enumerate(states):
+            self.assertEqual(log.genotypes_at(generation).tolist(), state.tolist())
+            self.assertEqual(
+                log.genotype_counts_at(generation).tolist(),
+                np.bincount(state, minlength=3).tolist(),
+            )
+
+    def test_extend_matches_append(self):
+        rng = np.random.default_rng(1)
+        appended = EventLog(
+            np.zeros(10, dtype=np.uint8), n_genotypes=3, keyframe_interval=4
+        )
+        extended = EventLog(
+            np.zeros(10, dtype=np.uint8), n_genotypes=3, keyframe_interval=4
+        )
+        for step in range(30):
+            appended.append(step, 0, int(rng.integers(10)), 0, int(rng.integers(3)))
+
+        extended.extend(
+            **{name: column[:13] for name, column in appended.columns.items()}
+        )
+        extended.extend(
+            **{name: column[13:] for name, column in appended.columns.items()}
+        )
+        self.assertEqual(extended.columns, appended.columns)
+        self.assertEqual(
+            [keyframe.tolist() for keyframe in extended.keyframes],
+            [keyframe.tolist() for keyframe in appended.keyframes],
+        )
+
+    def test_compact_columns(self):
+        log = EventLog(np.zeros(300, dtype=np.uint8), n_genotypes=3)
+        self.assertEqual(log.parents.itemsize, 2)
+        self.assertEqual(log.new_genotypes.itemsize, 1)
+
+
+class TestPopulationHistory(unittest.TestCase):
+    def setUp(self):
+        graph = Graph([Node("A", 1), Node("B", 2), Node("B", 3)], [(1, 2), (2, 3)])
+        self.compiled = CompiledGraph.from_graph(graph)
+        self.log = EventLog(self.compiled.genotypes, n_genotypes=2)
+        self.log.append(step=1, parent=0, replaced=1, old_genotype=1, new_genotype=0)
+        self.log.append(step=3, parent=1, replaced=2, old_genotype=1, new_genotype=0)
+        self.history = PopulationHistory(self.log, self.compiled, n_generations=5)
+
+    @staticmethod
+    def _genotypes(graph):
+        return [node.genotype for node in graph.nodes]
+
+    def test_indexing(self):
+        self.assertEqual(len(self.history), 5)
+        self.assertEqual(self._genotypes(self.history[0]), ["A", "B", "B"])
+        self.assertEqual(self._genotypes(self.history[2]), ["A", "A", "B"])
+        self.assertEqual(self._genotypes(self.history[-1]), ["A", "A", "A"])
+        self.assertEqual(len(self.history[1:3]), 2)
+        with self.assertRaises(IndexError):
+            self.history[5]
+
+    def test_iteration_matches_indexing(self):
+        iterated = [self._genotypes(graph) for graph in self.history]
+        indexed = [self._genotypes(self.history[i]) for i in range(5)]
+        self.assertEqual(iterated, indexed)
+
+    def test_iterated_graphs_are_independent_snapshots(self):
+        graphs = list(self.history)
+        self.assertEqual(
+            [self._genotypes(graph) for graph in graphs],
+            [self._genotypes(self.history[i]) for i in range(5)],
+        )
+        self.assertEqual(
+            [graph.genotype_valuecounts for graph in graphs],
+            [self.history.genotype_counts(i) for i in range(5)],
+        )
+        self.assertTrue(all(graph.topology is graphs[0].topology for graph in graphs))
+
+    def test_reverse_replay(self):
+        forward = [self._genotypes(graph) for graph in self.history]
+        backward = [self._genotypes(graph) for graph in reversed(self.history)]
+        self.assertEqual(backward, forward[::-1])
+        scrubbed = [
+            self._genotypes(graph) for graph in self.history.replay(3, reverse=True)
+        ]
+        self.assertEqual(scrubbed, forward[3::-1])
+
+    def test_genotype_counts(self):
+        self.assertEqual(self.history.genotype_counts(0), {"A": 1, "B": 2})
+        self.assertEqual(self.history.genotype_counts(-1), {"A": 3, "B": 0})
+
+
+class TestModelHistory(unittest.TestCase):
+    def test_history_matches_simulated_states(self):
+        for engine in ("naive", "incremental"):
+            graph = Graph.generate_random_graph(
+                n_nodes=12, n_genotypes=3, edge_probability=0.3, rng=0
+            )
+            model = MoranModel(
+                graph,
+                selection_intensity=0.5,
+                engine=engine,
+                rng=np.random.default_rng(1),
+            )
+            states = []
+            for _ in range(50):
+                states.append(
+                    {node.node_id: node.genotype for node in model.graph.nodes}
+                )
+                model.run_simulation(num_generations=1)
+
+            # the population may fixate before 50 generations have been simulated
+            history = model.population_history
+            self.assertEqual(len(history), min(50, model.generation + 1))
+            for state, generation in zip(states, history):
+                self.assertEqual(
+                    state, {node.node_id: node.genotype for node in generation.nodes}
+                )
+            # only events that changed a genotype are logged
+            self.assertTrue(
+                all(
+                    old != new
+                    for old, new in zip(
+                        model.history.old_genotypes, model.history.new_genotypes
+                    )
+                )
+            )
+
+    def test_initial_graph_is_not_modified(self):
+        graph = Graph.generate_random_graph(
+            n_nodes=10, n_genotypes=2, edge_probability=1, rng=0
+        )
+        genotypes = {node.node_id: node.genotype for node in graph.nodes}
+        MoranModel(
+            graph, selection_intensity=1, rng=np.random.default_rng(1)
+        ).run_simulation()
+        self.assertEqual(
+            genotypes, {node.node_id: node.genotype for node in graph.nodes}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+import numpy as np
+from evographs.lattice import LATTICE_KINDS, Lattice
+from evographs.moran_model import MoranModel
+
+
+class TestLattice(unittest.TestCase):
+    def _lattices(self):
+        for kind in LATTICE_KINDS:
+            for periodic in (True, False):
+                yield Lattice.generate_random_lattice(
+                    6, 8, n_genotypes=3, kind=kind, periodic=periodic, rng=0
+                )
+
+    def test_neighbors_are_symmetric_and_unique(self):
+        for lattice in self._lattices():
+            for index in range(lattice.n_nodes):
+                neighbors = lattice.neighbors(index).tolist()
+                self.assertEqual(len(set(neighbors)), len(neighbors))
+                self.assertNotIn(index, neighbors)
+                for neighbor in neighbors:
+                    self.assertIn(index, lattice.neighbors(neighbor).tolist())
+
+    def test_degrees(self):
+        expected = {"square": 4, "triangular": 6, "hexagonal": 3}
+        for lattice in self._lattices():
+            degrees = lattice.degrees
+            self.assertEqual(
+                degrees.tolist(),
+                [len(lattice.neighbors(i)) for i in range(lattice.n_nodes)],
+            )
+            if lattice.periodic:
+                self.assertTrue((degrees == expected[lattice.kind]).all())
+            else:
+                self.assertLess(degrees.min(), expected[lattice.kind])
+
+    def test_square_neighbors(self):
+        lattice = Lattice(3, 4, np.zeros(12, dtype=np.uint8), ["A"])
+        self.assertEqual(sorted(lattice.neighbors(0).tolist()), [1, 3, 4, 8])
+        bounded = Lattice(3, 4, np.zeros(12, dtype=np.uint8), ["A"], periodic=False)
+        self.assertEqual(sorted(bounded.neighbors(0).tolist()), [1, 4])
+
+    def test_neighbor_pairs_and_adjacency(self):
+        for lattice in self._lattices():
+            pairs = sorted(
+                (node, neighbor)
+                for nodes, neighbors in lattice.neighbor_pairs()
+                for node, neighbor in zip(nodes.tolist(), neighbors.tolist())
+            )
+            self.assertEqual(
+                pairs,
+                sorted(
+                    (index, neighbor)
+                    for index in range(lattice.n_nodes)
+                    for neighbor in lattice.neighbors(index).tolist()
+                ),
+            )
+            adjacency = lattice.adjacency.toarray()
+            self.assertTrue((adjacency == adjacency.T).all())
+            self.assertEqual(
+                sorted(zip(*np.nonzero(adjacency))),
+                [(int(i), int(j)) for i, j in pairs],
+            )
+
+    def test_invalid_lattices(self):
+        with self.assertRaises(ValueError):
+            Lattice(2, 4, np.zeros(8, dtype=np.uint8), ["A"])
+        with self.assertRaises(ValueError):
+            Lattice(4, 5, np.zeros(20, dtype=np.uint8), ["A"], kind="hexagonal")
+        with self.assertRaises(ValueError):
+            Lattice(4, 4, np.zeros(20, dtype=np.uint8), ["A"])
+
+
+class TestLatticeSimulation(unittest.TestCase):
+    def test_engine_runs_on_lattice(self):
+        for kind in LATTICE_KINDS:
+            lattice = Lattice.generate_random_lattice(
+                8, 8, n_genotypes=2, kind=kind, periodic=kind != "square", rng=1
+            )
+            for engine in ("incremental", "rejection_free", "continuous"):
+                model = MoranModel(lattice, engine=engine, rng=2).step(300)
+                fitness = model._engine.fitness
+                expected = list(model._calculate_fitness_per_node().values())
+                self.assertTrue(np.allclose(fitness, expected))
+                self.assertEqual(
+                    model._engine.genotypes.tolist(),
+                    model.history.genotypes_at(model.generation).tolist(),
+                )
+
+    def test_naive_engine_requires_graph(self):
+        lattice = Lattice.generate_random_lattice(4, 4, n_genotypes=2, rng=0)
+        with self.assertRaises(ValueError):
+            MoranModel(lattice)
+        self.assertEqual(MoranModel(lattice, engine="auto").engine, "incremental")
+
+
+if __name__ == "__main__":
+    unittest.main()
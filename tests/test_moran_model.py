@@ -0,0 +1,476 @@
+import statistics
+import unittest
+from unittest import mock
+import numpy as np
+from evographs.compiled import CompleteTopology
+from evographs.fitness import LowRankPayoff
+from evographs.graph import Graph, Node
+from evographs.moran_model import MoranModel
+from evographs.results import StopReason
+
+
+class TestIncrementalEngine(unittest.TestCase):
+    def test_incremental_fitness_matches_full_recomputation(self):
+        graph = Graph.generate_random_graph(
+            n_nodes=15, n_genotypes=3, edge_probability=0.4
+        )
+        model = MoranModel(graph, selection_intensity=0.7, engine="incremental")
+        for _ in range(200):
+            model._next_generation()
+            expected = {
+                node.node_id: fitness
+                for node, fitness in model._calculate_fitness_per_node().items()
+            }
+            fitness = model._engine.fitness
+            for index, node_id in enumerate(model._engine.graph.node_ids.tolist()):
+                self.assertAlmostEqual(fitness[index], expected[node_id])
+                self.assertAlmostEqual(
+                    model._engine.sampler.weight(index), expected[node_id]
+                )
+
+    def test_incremental_simulation_fixates(self):
+        graph = Graph.generate_random_graph(
+            n_nodes=10, n_genotypes=2, edge_probability=1
+        )
+        model = MoranModel(graph, selection_intensity=1, engine="incremental")
+        model.run_simulation()
+        self.assertTrue(model.population_history[-1]._genotype_has_fixated())
+
+    def test_rejection_sampler_simulation_fixates(self):
+        graph = Graph.generate_random_graph(
+            n_nodes=10, n_genotypes=2, edge_probability=0.5
+        )
+        model = MoranModel(
+            graph, selection_intensity=0.05, engine="incremental", sampler="rejection"
+        )
+        model.run_simulation()
+        self.assertTrue(model.population_history[-1]._genotype_has_fixated())
+
+    def test_invalid_engine(self):
+        graph = Graph.generate_random_graph(
+            n_nodes=3, n_genotypes=2, edge_probability=1
+        )
+        with self.assertRaises(ValueError):
+            MoranModel(graph, engine="unknown")
+
+    def test_incomplete_payoff_matrix_is_rejected_up_front(self):
+        graph = Graph([Node("A", 1), Node("B", 2)], [(1, 2)])
+        for engine in ("naive", "incremental"):
+            with self.assertRaises(ValueError):
+                MoranModel(graph, {"A": {"A": 1, "B": 1}, "B": {"A": 1}}, engine=engine)
+
+    def test_payoff_function_on_every_engine(self):
+        graph = Graph.generate_random_graph(
+            n_nodes=12, n_genotypes=5, edge_probability=1, rng=0
+        )
+        n_genotypes = len(graph.genotype_valuecounts)
+        rng = np.random.default_rng(0)
+        payoff = LowRankPayoff(
+            rng.uniform(size=(n_genotypes, 2)), rng.uniform(size=(n_genotypes, 2))
+        )
+        for engine in ("naive", "incremental", "rejection_free", "well_mixed"):
+            model = MoranModel(graph, payoff, engine=engine, rng=0).step(50)
+            expected = [
+                1
+                - 0.5
+                + 0.5 * payoff[code, np.delete(model._genotype_codes(), i)].sum()
+                for i, code in enumerate(model._genotype_codes().tolist())
+            ]
+            self.assertTrue(
+                np.allclose(
+                    list(model._calculate_fitness_per_node().values()), expected
+                )
+            )
+        model = MoranModel(graph, payoff, engine="incremental", sampler="rejection")
+        self.assertTrue(model.run_simulation().result.fixated)
+
+    def test_code_indexed_payoffs_follow_genotype_labels(self):
+        graph = Graph.generate_random_graph(
+            n_nodes=300, n_genotypes=30, edge_probability=0.05, rng=0
+        )
+        code_of = {
+            label: code for code, label in enumerate(Graph._label_n_genotypes(30))
+        }
+        payoff = np.diag(np.arange(30.0))
+        for engine in ("naive", "incremental"):
+            fitness = {
+                node.node_id: value
+                for node, value in MoranModel(graph, payoff, engine=engine)
+                ._calculate_fitness_per_node()
+                .items()
+            }
+            for node, neighbors in graph.nodes.items():
+                n_same = sum(
+                    neighbor.genotype == node.genotype for neighbor in neighbors
+                )
+                expected = 0.5 + 0.5 * n_same * code_of[node.genotype]
+                self.assertAlmostEqual(fitness[node.node_id], expected)
+
+    def test_payoff_function_may_cover_absent_genotypes(self):
+        graph = Graph.generate_random_graph(
+            n_nodes=17, n_genotypes=40, edge_probability=1, rng=0
+        )
+        self.assertLess(len(graph.genotype_valuecounts), 40)
+        code_of = {
+            label: code for code, label in enumerate(Graph._label_n_genotypes(40))
+        }
+        rng = np.random.default_rng(0)
+        payoff = LowRankPayoff(rng.uniform(size=(40, 2)), rng.uniform(size=(40, 2)))
+        model = MoranModel(graph, payoff, engine="incremental")
+        fitness = {
+            node.node_id: value
+            for node, value in model._calculate_fitness_per_node().items()
+        }
+        for node, neighbors in graph.nodes.items():
+            codes = [code_of[neighbor.genotype] for neighbor in neighbors]
+            expected = 0.5 + 0.5 * payoff[code_of[node.genotype], codes].sum()
+            self.assertAlmostEqual(fitness[node.node_id], expected)
+
+    def test_explicit_genotype_labels(self):
+        graph = Graph([Node("x", 1), Node("y", 2)], [(1, 2)])
+        payoff = np.array([[0.0, 3.0], [1.0, 0.0]])
+        model = MoranModel(graph, payoff, genotype_labels=["y", "x"])
+        # x is code 1, so it gets payoff[1, 0] against y
+        self.assertEqual(
+            {
+                node.genotype: value
+                for node, value in model._calculate_fitness_per_node().items()
+            },
+            {"x": 1.0, "y": 2.0},
+        )
+        with self.assertRaises(ValueError):
+            MoranModel(graph, payoff, genotype_labels=["y", "z"])
+        with self.assertRaises(ValueError):
+            MoranModel(graph, payoff)
+
+    def test_many_genotypes(self):
+        graph = Graph.generate_random_graph(
+            n_nodes=60, n_genotypes=40, edge_probability=0.2, rng=0
+        )
+        model = MoranModel(graph, engine="incremental", rng=0).step(200)
+        n_genotypes = len(graph.genotype_valuecounts)
+        self.assertGreater(n_genotypes, 26)
+        self.assertEqual(model._engine.payoff_matrix.shape, (n_genotypes, n_genotypes))
+
+
+class TestSimulationResult(unittest.TestCase):
+    def test_fixation_result(self):
+        for engine in ("naive", "incremental", "rejection_free", "continuous"):
+            graph = Graph.generate_random_graph(
+                n_nodes=8, n_genotypes=2, edge_probability=0.5, rng=0
+            )
+            model = MoranModel(
+                graph, engine=engine, rng=np.random.default_rng(1)
+            ).run_simulation()
+            result = model.result
+            self.assertTrue(result.fixated)
+            self.assertEqual(result.fixation_generation, model.generation)
+            self.assertEqual(result.n_events, len(model.history))
+            self.assertEqual(model.graph.genotype_valuecounts[result.fixed_genotype], 8)
+            self.assertEqual(result.fixation_time is not None, engine == "continuous")
+
+    def test_absorbing_state_without_fixation(self):
+        graph = Graph([Node("A", 1), Node("A", 2), Node("B", 3)], [(1, 2)])
+        result = MoranModel(graph, engine="incremental").run_simulation().result
+        self.assertIs(result.stop_reason, StopReason.ABSORBING)
+        self.assertEqual(result.generation, 0)
+        self.assertIsNone(result.fixed_genotype)
+
+    def test_generation_limit_result(self):
+        graph = Graph([Node("A", 1), Node("B", 2)], [(1, 2)])
+        model = MoranModel(graph, {"A": {"A": 0, "B": 0}, "B": {"A": 0, "B": 0}})
+        result = model.run_simulation(num_generations=0).result
+        self.assertIs(result.stop_reason, StopReason.MAX_GENERATIONS)
+
+
+class TestBudgets(unittest.TestCase):
+    def setUp(self):
+        self.graph = Graph.generate_random_graph(
+            n_nodes=60, n_genotypes=3, edge_probability=0.2, rng=3
+        )
+
+    def _model(self) -> MoranModel:
+        return MoranModel(self.graph, engine="incremental", rng=5)
+
+    def test_event_budget(self):
+        model = self._model().run_simulation(max_events=40)
+        self.assertIs(model.result.stop_reason, StopReason.MAX_EVENTS)
+        self.assertEqual(model.generation, 40)
+        self.assertEqual(len(model.population_history), 40)
+
+    def test_wall_time_budget(self):
+        model = self._model().run_simulation(max_wall_time=0, budget_check_interval=16)
+        self.assertIs(model.result.stop_reason, StopReason.MAX_WALL_TIME)
+        self.assertEqual(model.generation, 16)
+
+    def test_history_budget(self):
+        model = self._model()
+        limit = model.history.nbytes + 50
+        model.run_simulation(max_history_bytes=limit, budget_check_interval=1)
+        self.assertIs(model.result.stop_reason, StopReason.MAX_HISTORY_BYTES)
+        self.assertGreater(model.history.nbytes, limit)
+        self.assertEqual(model.result.n_events, len(model.history))
+
+    def test_budgets_do_not_change_the_run(self):
+        expected = self._model().run_simulation(300)
+
+        model = self._model()
+        model.run_simulation(300, max_events=70, max_history_bytes=10**9)
+        while model.result.stop_reason is StopReason.MAX_EVENTS:
+            model.run_simulation(
+                300 - model.generation, max_events=70, budget_check_interval=3
+            )
+        self.assertEqual(model.result, expected.result)
+        self.assertEqual(model.history.columns, expected.history.columns)
+
+    def test_invalid_check_interval(self):
+        with self.assertRaises(ValueError):
+            self._model().run_simulation(budget_check_interval=0)
+
+
+class TestStep(unittest.TestCase):
+    def test_bulk_step_matches_single_steps(self):
+        graph = Graph.generate_random_graph(
+            n_nodes=30, n_genotypes=3, edge_probability=0.2
+        )
+        payoff_matrix = MoranModel._generate_random_payoff_matrix(graph)
+        for engine in ("incremental", "rejection_free", "continuous"):
+            bulk = MoranModel(
+                graph, payoff_matrix, engine=engine, rng=np.random.default_rng(7)
+            ).step(500)
+            single = MoranModel(
+                graph, payoff_matrix, engine=engine, rng=np.random.default_rng(7)
+            )
+            for _ in range(500):
+                single.step()
+
+            self.assertEqual(bulk.generation, single.generation)
+            self.assertEqual(bulk.time, single.time)
+            self.assertEqual(list(bulk.history.replaced), list(single.history.replaced))
+            self.assertEqual(
+                bulk._engine.genotypes.tolist(), single._engine.genotypes.tolist()
+            )
+
+    def test_step_stops_at_absorption(self):
+        graph = Graph([Node("A", 1), Node("B", 2)], [(1, 2)])
+        model = MoranModel(graph, engine="incremental").step(10)
+        self.assertEqual(model.generation, 1)
+        self.assertTrue(model.result.fixated)
+        self.assertEqual(len(model.population_history), 2)
+
+
+class TestRejectionFreeEngine(unittest.TestCase):
+    def setUp(self):
+        self.nodes = [Node("A" if i < 3 else "B", i) for i in range(1, 7)]
+        self.edges = [(i, i + 1) for i in range(1, 6)]
+        self.payoff_matrix = {"A": {"A": 1, "B": 0.2}, "B": {"A": 0.6, "B": 0.9}}
+
+    def _fixation_generations(self, engine: str, n_runs: int) -> list[int]:
+        rng = np.random.default_rng(0)
+        generations = []
+        for _ in range(n_runs):
+            model = MoranModel(
+                Graph(self.nodes, self.edges),
+                self.payoff_matrix,
+                selection_intensity=0.5,
+                engine=engine,
+                rng=rng,
+            ).run_simulation()
+            generations.append(model.generation)
+        return generations
+
+    def test_only_genotype_changing_events_are_sampled(self):
+        model = MoranModel(
+            Graph(self.nodes, self.edges),
+            self.payoff_matrix,
+            engine="rejection_free",
+        ).run_simulation()
+        self.assertTrue(model.graph._genotype_has_fixated())
+        self.assertEqual(len(model.population_history), model.generation + 1)
+        self.assertLessEqual(len(model.history), model.generation)
+
+    def test_generation_counts_match_incremental_engine(self):
+        incremental = self._fixation_generations("incremental", 500)
+        rejection_free = self._fixation_generations("rejection_free", 500)
+        self.assertAlmostEqual(
+            statistics.mean(rejection_free),
+            statistics.mean(incremental),
+            delta=0.15 * statistics.mean(incremental),
+        )
+
+    def test_stops_at_generation_limit(self):
+        # every event changes one genotype, so fixation takes at least 4 events
+        nodes = [Node("A" if i <= 4 else "B", i) for i in range(1, 9)]
+        edges = [(i, i + 1) for i in range(1, 8)]
+        model = MoranModel(
+            Graph(nodes, edges),
+            self.payoff_matrix,
+            engine="rejection_free",
+            rng=np.random.default_rng(4),
+        ).run_simulation(num_generations=3)
+        self.assertEqual(model.generation, 3)
+        self.assertEqual(len(model.population_history), model.generation)
+
+
+class TestWellMixedEngine(unittest.TestCase):
+    def setUp(self):
+        self.graph = Graph.generate_random_graph(
+            n_nodes=8, n_genotypes=2, edge_probability=1, rng=0
+        )
+        self.payoff_matrix = {"A": {"A": 1, "B": 0.2}, "B": {"A": 0.6, "B": 0.9}}
+
+    def test_auto_detects_complete_graphs(self):
+        self.assertEqual(MoranModel(self.graph, engine="auto").engine, "well_mixed")
+        sparse_graph = Graph([Node("A", 1), Node("B", 2), Node("A", 3)], [(1, 2)])
+        self.assertEqual(MoranModel(sparse_graph, engine="auto").engine, "incremental")
+        with self.assertRaises(ValueError):
+            MoranModel(sparse_graph, engine="well_mixed")
+
+    def test_fitness_matches_full_recomputation(self):
+        model = MoranModel(self.graph, engine="well_mixed", rng=1)
+        for _ in range(100):
+            model.step()
+            expected = list(model._calculate_fitness_per_node().values())
+            self.assertEqual(
+                np.round(model._engine.fitness, 9).tolist(),
+                np.round(expected, 9).tolist(),
+            )
+
+    def test_fixation_matches_incremental_engine(self):
+        rng = np.random.default_rng(0)
+        results = {}
+        for engine in ("incremental", "well_mixed"):
+            runs = [
+                MoranModel(
+                    self.graph, self.payoff_matrix, engine=engine, rng=rng
+                ).run_simulation()
+                for _ in range(400)
+            ]
+            results[engine] = (
+                statistics.mean(model.generation for model in runs),
+                statistics.mean(model.result.fixed_genotype == "A" for model in runs),
+            )
+        self.assertAlmostEqual(
+            results["well_mixed"][0],
+            results["incremental"][0],
+            delta=0.15 * results["incremental"][0],
+        )
+        self.assertAlmostEqual(
+            results["well_mixed"][1], results["incremental"][1], delta=0.1
+        )
+
+    def test_large_population_without_graph(self):
+        topology = CompleteTopology.from_genotype_counts({"A": 60_000, "B": 40_000})
+        model = MoranModel(topology, engine="well_mixed", rng=0).step(1000)
+        counts = model.population_history.genotype_counts(-1)
+        self.assertEqual(sum(counts.values()), 100_000)
+        self.assertEqual(counts["A"], int(model._engine.genotype_counts[0]))
+
+    def test_draw_at_the_top_end_skips_absent_genotypes(self):
+        topology = CompleteTopology.from_genotype_counts({"A": 3, "B": 2, "C": 0})
+        payoff_matrix = {g: {h: 1 for h in "ABC"} for g in "ABC"}
+        engine = MoranModel(topology, payoff_matrix, engine="well_mixed")._engine
+        # a uniform that rounds the scaled draw up to the total weight
+        engine.rng = mock.Mock(random=mock.Mock(return_value=1.0))
+        parent, _, _, new_genotype = engine.step()
+        self.assertEqual(new_genotype, 1)
+        self.assertEqual(engine.genotypes[parent], 1)
+
+
+class TestUpdateRules(unittest.TestCase):
+    rules = ("death_birth", "imitation", "fermi")
+
+    def test_fitness_matches_full_recomputation(self):
+        graph = Graph.generate_random_graph(
+            n_nodes=15, n_genotypes=3, edge_probability=0.4, rng=2
+        )
+        for rule in self.rules:
+            model = MoranModel(graph, engine="auto", update_rule=rule, rng=3)
+            self.assertEqual(model.engine, "incremental")
+            for _ in range(100):
+                model.step()
+                expected = list(model._calculate_fitness_per_node().values())
+                self.assertTrue(np.allclose(model._engine.fitness, expected))
+            self.assertEqual(
+                model.graph.genotype_valuecounts,
+                model.get_generation(model.generation).genotype_valuecounts,
+            )
+
+    def test_neutral_fixation_probability_on_a_cycle(self):
+        # without selection every rule is a voter model, a single mutant fixates with
+        # probability 1 / N on a regular graph
+        nodes = [Node("B" if i == 1 else "A", i) for i in range(1, 7)]
+        edges = [(i, i % 6 + 1) for i in range(1, 7)]
+        rng = np.random.default_rng(0)
+        for rule in self.rules:
+            fixed = [
+                MoranModel(
+                    Graph(nodes, edges),
+                    selection_intensity=0,
+                    engine="incremental",
+                    update_rule=rule,
+                    rng=rng,
+                )
+                .run_simulation()
+                .result.fixed_genotype
+                for _ in range(600)
+            ]
+            self.assertAlmostEqual(fixed.count("B") / 600, 1 / 6, delta=0.05)
+
+    def test_fermi_rule_follows_the_fitter_neighbour(self):
+        graph = Graph([Node("A", 1), Node("B", 2)], [(1, 2)])
+        payoff_matrix = {"A": {"A": 1, "B": 1}, "B": {"A": 0, "B": 0}}
+        for seed in range(20):
+            model = MoranModel(
+                graph,
+                payoff_matrix,
+                selection_intensity=1,
+                engine="incremental",
+                update_rule="fermi",
+                fermi_beta=50,
+                rng=seed,
+            ).run_simulation()
+            self.assertEqual(model.result.fixed_genotype, "A")
+            self.assertEqual(model.result.n_events, 1)
+
+    def test_unsupported_engine(self):
+        graph = Graph([Node("A", 1), Node("B", 2)], [(1, 2)])
+        with self.assertRaises(ValueError):
+            MoranModel(graph, engine="rejection_free", update_rule="death_birth")
+        with self.assertRaises(ValueError):
+            MoranModel(graph, engine="incremental", update_rule="unknown")
+
+
+class TestContinuousEngine(unittest.TestCase):
+    def test_event_times_are_recorded(self):
+        graph = Graph.generate_random_graph(
+            n_nodes=12, n_genotypes=3, edge_probability=0.4, rng=0
+        )
+        model = MoranModel(
+            graph, engine="continuous", rng=np.random.default_rng(1)
+        ).run_simulation()
+        times = list(model.history.times)
+        self.assertEqual(len(times), len(model.history))
+        self.assertEqual(times, sorted(times))
+        self.assertGreater(model.time, 0)
+        self.assertLessEqual(times[-1], model.time)
+
+    def test_mean_waiting_time_is_inverse_total_fitness(self):
+        graph = Graph.generate_random_graph(
+            n_nodes=10, n_genotypes=1, edge_probability=1
+        )
+        engine = MoranModel(
+            graph,
+            {"A": {"A": 1.0}},
+            selection_intensity=0.5,
+            engine="continuous",
+            rng=np.random.default_rng(1),
+        )._engine
+        for _ in range(20_000):
+            engine.step()
+        # each of the 10 nodes has fitness 1 - 0.5 + 0.5 * 9
+        self.assertAlmostEqual(engine.time / 20_000, 1 / 50, delta=0.001)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+from evographs.graph import Graph
+from evographs.moran_model import MoranModel
+from evographs.parallel import run_ensemble
+
+
+class TestSeeding(unittest.TestCase):
+    def test_same_seed_gives_same_graph(self):
+        first = Graph.generate_random_graph(
+            n_nodes=20, n_genotypes=3, edge_probability=0.3, rng=5
+        )
+        second = Graph.generate_random_graph(
+            n_nodes=20, n_genotypes=3, edge_probability=0.3, rng=5
+        )
+        self.assertEqual(
+            [node.genotype for node in first.nodes],
+            [node.genotype for node in second.nodes],
+        )
+        self.assertEqual(
+            [[n.node_id for n in adj] for adj in first.nodes.values()],
+            [[n.node_id for n in adj] for adj in second.nodes.values()],
+        )
+
+    def test_same_seed_gives_same_simulation(self):
+        graph = Graph.generate_random_graph(
+            n_nodes=12, n_genotypes=3, edge_probability=0.4, rng=1
+        )
+        for engine in ("naive", "incremental", "rejection_free", "continuous"):
+            first = MoranModel(graph, engine=engine, rng=3).run_simulation()
+            second = MoranModel(graph, engine=engine, rng=3).run_simulation()
+            self.assertEqual(first.payoff_matrix, second.payoff_matrix)
+            self.assertEqual(first.result, second.result)
+            self.assertEqual(
+                list(first.history.replaced), list(second.history.replaced)
+            )
+
+
+class TestRunEnsemble(unittest.TestCase):
+    def setUp(self):
+        self.graph = Graph.generate_random_graph(
+            n_nodes=10, n_genotypes=2, edge_probability=0.5, rng=0
+        )
+        self.payoff_matrix = MoranModel._generate_random_payoff_matrix(self.graph, 0)
+
+    def test_parallel_matches_serial(self):
+        serial = run_ensemble(
+            self.graph, self.payoff_matrix, 8, seed=42, engine="incremental"
+        )
+        parallel = run_ensemble(
+            self.graph,
+            self.payoff_matrix,
+            8,
+            seed=42,
+            n_workers=2,
+            engine="incremental",
+        )
+        self.assertEqual(serial, parallel)
+        self.assertTrue(all(result.fixated for result in serial))
+
+    def test_threads_match_serial(self):
+        for engine in ("naive", "incremental"):
+            serial = run_ensemble(
+                self.graph, self.payoff_matrix, 16, seed=7, engine=engine
+            )
+            threaded = run_ensemble(
+                self.graph,
+                self.payoff_matrix,
+                16,
+                seed=7,
+                n_workers=4,
+                executor="thread",
+                engine=engine,
+            )
+            self.assertEqual(serial, threaded)
+
+    def test_runs_use_independent_streams(self):
+        results = run_ensemble(self.graph, self.payoff_matrix, 8, seed=42)
+        self.assertGreater(len({result.generation for result in results}), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
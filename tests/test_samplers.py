@@ -0,0 +1,67 @@
+import random
+import unittest
+from collections import Counter
+from evographs.samplers import RejectionSampler, SumTreeSampler
+
+
+class TestSumTreeSampler(unittest.TestCase):
+    def test_total_tracks_updates(self):
+        sampler = SumTreeSampler([1.0, 2.0, 3.0])
+        self.assertEqual(sampler.total, 6.0)
+        sampler.update(1, 5.0)
+        self.assertEqual(sampler.total, 9.0)
+        self.assertEqual(sampler.weight(1), 5.0)
+
+    def test_zero_weight_never_sampled(self):
+        sampler = SumTreeSampler([1.0, 0.0, 1.0, 0.0, 1.0])
+        rng = random.Random(0)
+        samples = {sampler.sample(rng) for _ in range(1000)}
+        self.assertEqual(samples, {0, 2, 4})
+
+    def test_sample_frequencies_follow_weights(self):
+        sampler = SumTreeSampler([1.0, 1.0, 1.0])
+        sampler.update(2, 2.0)
+        rng = random.Random(1)
+        counts = Counter(sampler.sample(rng) for _ in range(20_000))
+        self.assertAlmostEqual(counts[2] / 20_000, 0.5, delta=0.02)
+        self.assertAlmostEqual(counts[0] / 20_000, 0.25, delta=0.02)
+
+    def test_invalid_weights(self):
+        with self.assertRaises(ValueError):
+            SumTreeSampler([])
+        with self.assertRaises(ValueError):
+            SumTreeSampler([1.0, -1.0])
+        with self.assertRaises(IndexError):
+            SumTreeSampler([1.0]).update(1, 1.0)
+
+
+class TestRejectionSampler(unittest.TestCase):
+    def test_equal_weights_draw_uniformly_without_rejection(self):
+        sampler = RejectionSampler([1.0] * 4, upper_bound=1.0)
+        rng = random.Random(0)
+        counts = Counter(sampler.sample(rng) for _ in range(20_000))
+        self.assertEqual(set(counts), {0, 1, 2, 3})
+        self.assertEqual(sampler._accepted, sampler._trials)
+        self.assertIsNone(sampler.fallback)
+
+    def test_sample_frequencies_follow_weights(self):
+        sampler = RejectionSampler([1.0, 1.0, 2.0], upper_bound=2.0)
+        rng = random.Random(1)
+        counts = Counter(sampler.sample(rng) for _ in range(20_000))
+        self.assertAlmostEqual(counts[2] / 20_000, 0.5, delta=0.02)
+
+    def test_falls_back_to_tree_on_low_acceptance(self):
+        sampler = RejectionSampler([0.01] * 10, upper_bound=1.0, window=100)
+        rng = random.Random(2)
+        sampler.sample(rng)
+        self.assertIsInstance(sampler.fallback, SumTreeSampler)
+        sampler.update(3, 0.5)
+        self.assertAlmostEqual(sampler.total, 0.59)
+
+    def test_weight_above_bound(self):
+        with self.assertRaises(ValueError):
+            RejectionSampler([1.0, 3.0], upper_bound=2.0)
+
+
+if __name__ == "__main__":
+    unittest.main()